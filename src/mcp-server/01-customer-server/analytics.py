@@ -0,0 +1,259 @@
+import threading
+
+import numpy as np
+
+from data_functions import DataLayer, Order, OrderChange
+from data_functions import CustomerRevenue, LocationStock, CustomerDiscountExposure
+
+# Orders in these states do not count towards revenue.
+NON_REVENUE_STATUSES = frozenset({"Cancelled"})
+
+class _Codes:
+    # Assigns dense integer codes to string keys, so aggregates can use np.bincount.
+    def __init__(self):
+        self.code_by_key: dict[str, int] = {}
+        self.keys: list[str] = []
+
+    def code(self, key: str) -> int:
+        code = self.code_by_key.get(key)
+        if code is None:
+            code = self.code_by_key[key] = len(self.keys)
+            self.keys.append(key)
+        return code
+
+class OrderAnalytics:
+    """
+    Columnar aggregates over the orders, inventory and customer discounts of a DataLayer.
+
+    Each collection is copied once into NumPy columns (integer codes for keys, floats and ints
+    for amounts) on first use, and aggregates are computed with vectorized reductions. Order
+    columns are kept current from the order change feed and inventory volumes are set in place
+    by update_inventory_volumes; all columns are rebuilt after invalidate().
+    """
+
+    def __init__(self, data_layer: DataLayer):
+        self.data_layer = data_layer
+        self._lock = threading.Lock()
+        # Order changes since the order columns were built; writers only take _pending_lock.
+        self._pending_lock = threading.Lock()
+        self._pending: list[OrderChange] = []
+        self._tracking = False
+        self._orders = None
+        self._inventory = None
+        self._discounts = None
+        data_layer.add_order_listener(self._on_order_change)
+
+    def invalidate(self):
+        """
+        Drops all columns, so they are rebuilt from the DataLayer on next use.
+        Call this after reloading collections.
+        """
+        with self._lock:
+            self._orders = self._inventory = self._discounts = None
+            self._tracking = False
+            with self._pending_lock:
+                self._pending = []
+
+    def update_inventory_volumes(self, data_layer: DataLayer, volumes: dict[int, int]):
+        """
+        Sets the volumes of inventory rows in place, e.g. after stock was reserved or released.
+        Updates for another DataLayer than the current one are ignored.
+        :param data_layer (DataLayer): The data layer the volumes were written to.
+        :param volumes (dict[int, int]): Inventory list position -> new volume.
+        """
+        with self._lock:
+            if self._inventory is None or data_layer is not self.data_layer:
+                return
+            column = self._inventory["volume"]
+            for pos, volume in volumes.items():
+                column[pos] = volume
+
+    def warm(self):
+        """
+        Builds all columns ahead of the first query.
+        """
+        with self._lock:
+            self._order_columns()
+            self._inventory_columns()
+            self._discount_columns()
+
+    def _on_order_change(self, change: OrderChange):
+        # Called on the writer's thread; changes are folded in by the next query.
+        if self._tracking:
+            with self._pending_lock:
+                self._pending.append(change)
+
+    @staticmethod
+    def _order_values(order: Order) -> tuple[float, bool]:
+        revenue = sum(item.list_price for item in order.order_items or [])
+        return revenue, order.order_status not in NON_REVENUE_STATUSES
+
+    def _build_orders(self, data_layer: DataLayer) -> dict:
+        customers = _Codes()
+        row_by_order_id = {}
+        customer_codes, revenues, counted = [], [], []
+        for order in data_layer.iter_collection("orders"):
+            row_by_order_id.setdefault(order.order_id, len(customer_codes))
+            revenue, is_counted = self._order_values(order)
+            customer_codes.append(customers.code(order.customer_id))
+            revenues.append(revenue)
+            counted.append(is_counted)
+        return {"customers": customers, "row_by_order_id": row_by_order_id,
+                "customer": np.array(customer_codes, dtype=np.int32),
+                "revenue": np.array(revenues, dtype=np.float64),
+                "counted": np.array(counted, dtype=bool)}
+
+    def _order_columns(self) -> dict:
+        # The caller holds _lock.
+        if self._orders is None:
+            # Track changes from before the build starts; re-applying one the build already saw is harmless.
+            self._tracking = True
+            self._orders = self._build_orders(self.data_layer)
+        columns = self._orders
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        for change in pending:
+            order = self.data_layer.get_order_by_id(change.new_order_id)
+            row = columns["row_by_order_id"].get(change.order_id)
+            if order is None or row is None:
+                continue
+            if change.new_order_id != change.order_id:
+                del columns["row_by_order_id"][change.order_id]
+                columns["row_by_order_id"].setdefault(change.new_order_id, row)
+            revenue, is_counted = self._order_values(order)
+            columns["customer"][row] = columns["customers"].code(order.customer_id)
+            columns["revenue"][row] = revenue
+            columns["counted"][row] = is_counted
+        return columns
+
+    @staticmethod
+    def _build_inventory(data_layer: DataLayer) -> dict:
+        locations = _Codes()
+        products = _Codes()
+        location_codes, product_codes, volumes = [], [], []
+        for item in data_layer.iter_collection("inventory"):
+            location_codes.append(locations.code(item.location))
+            product_codes.append(products.code(item.product_id))
+            volumes.append(item.volume)
+        return {"locations": locations,
+                "products": products,
+                "location": np.array(location_codes, dtype=np.int32),
+                "product": np.array(product_codes, dtype=np.int32),
+                "volume": np.array(volumes, dtype=np.int64)}
+
+    @staticmethod
+    def _build_discounts(data_layer: DataLayer) -> dict:
+        list_price = {}
+        for product in data_layer.get_all_products():
+            list_price.setdefault(product.product_id, product.list_price)
+        customers = _Codes()
+        customer_codes, exposures = [], []
+        for customer in data_layer.iter_collection("customers"):
+            code = customers.code(customer.customer_id)
+            for discount in customer.customer_discount or []:
+                price = list_price.get(discount.product_id, discount.discount_price)
+                customer_codes.append(code)
+                exposures.append(max(price - discount.discount_price, 0.0) * discount.discount_volume)
+        return {"customers": customers,
+                "customer": np.array(customer_codes, dtype=np.int32),
+                "exposure": np.array(exposures, dtype=np.float64)}
+
+    def _inventory_columns(self) -> dict:
+        if self._inventory is None:
+            self._inventory = self._build_inventory(self.data_layer)
+        return self._inventory
+
+    def _discount_columns(self) -> dict:
+        if self._discounts is None:
+            self._discounts = self._build_discounts(self.data_layer)
+        return self._discounts
+
+    def prepare(self, data_layer: DataLayer) -> tuple[dict, dict, dict]:
+        """
+        Builds the columns of a DataLayer that is about to replace the current one, without
+        blocking queries against the current one.
+        :param data_layer (DataLayer): The reloaded data layer.
+        :return: The columns to pass to attach.
+        :rtype: tuple[dict, dict, dict]
+        """
+        return self._build_orders(data_layer), self._build_inventory(data_layer), self._build_discounts(data_layer)
+
+    def attach(self, data_layer: DataLayer, columns: tuple[dict, dict, dict]):
+        """
+        Switches to a reloaded DataLayer and the columns prepared for it. The DataLayer must
+        already deliver its order changes to this instance (see DataLayer.adopt_order_feed).
+        """
+        with self._lock:
+            self.data_layer = data_layer
+            self._orders, self._inventory, self._discounts = columns
+            self._tracking = True
+            with self._pending_lock:
+                self._pending = []
+
+    def revenue_by_customer(self, top_k: int = 10, customer_id: str = None) -> list[CustomerRevenue]:
+        """
+        Sums the list prices of the order items per customer, skipping cancelled orders.
+
+        :param top_k (int): The number of customers with the highest revenue to return.
+        :param customer_id (str): Optional customer to report instead of the top customers.
+        :return: Revenue and order count per customer, highest revenue first.
+        :rtype: list[CustomerRevenue]
+        """
+        with self._lock:
+            columns = self._order_columns()
+            customers = columns["customers"]
+            counted = columns["counted"]
+            size = len(customers.keys)
+            revenue = np.bincount(columns["customer"], weights=np.where(counted, columns["revenue"], 0.0), minlength=size)
+            orders = np.bincount(columns["customer"], weights=counted, minlength=size)
+            if customer_id is not None:
+                code = customers.code_by_key.get(customer_id)
+                selected = np.array([] if code is None else [code], dtype=np.int64)
+            else:
+                selected = _top_k(revenue, top_k)
+            return [CustomerRevenue(customer_id=customers.keys[i], orders=int(orders[i]), revenue=round(float(revenue[i]), 2))
+                    for i in selected]
+
+    def stock_by_location(self) -> list[LocationStock]:
+        """
+        Sums the inventory volume and counts the distinct products per location.
+
+        :return: Stock per location, highest volume first.
+        :rtype: list[LocationStock]
+        """
+        with self._lock:
+            columns = self._inventory_columns()
+            size = len(columns["locations"].keys)
+            volume = np.bincount(columns["location"], weights=columns["volume"], minlength=size)
+            # Distinct (location, product) pairs, encoded as one integer each.
+            product_count = max(len(columns["products"].keys), 1)
+            pairs = np.unique(columns["location"].astype(np.int64) * product_count + columns["product"])
+            products = np.bincount(pairs // product_count, minlength=size)
+            return [LocationStock(location=columns["locations"].keys[i], products=int(products[i]), volume=int(volume[i]))
+                    for i in np.argsort(-volume, kind="stable")]
+
+    def discount_exposure(self, top_k: int = 10) -> list[CustomerDiscountExposure]:
+        """
+        Estimates the revenue given away through customer discounts: for every customer discount,
+        the difference between list and discount price times the discount volume.
+
+        :param top_k (int): The number of customers with the highest exposure to return.
+        :return: Discount count and exposure per customer, highest exposure first.
+        :rtype: list[CustomerDiscountExposure]
+        """
+        with self._lock:
+            columns = self._discount_columns()
+            size = len(columns["customers"].keys)
+            exposure = np.bincount(columns["customer"], weights=columns["exposure"], minlength=size)
+            discounts = np.bincount(columns["customer"], minlength=size)
+            return [CustomerDiscountExposure(customer_id=columns["customers"].keys[i], discounts=int(discounts[i]),
+                                             exposure=round(float(exposure[i]), 2))
+                    for i in _top_k(exposure, top_k)]
+
+def _top_k(values: np.ndarray, top_k: int) -> np.ndarray:
+    # Indexes of the top_k largest values, largest first, without sorting the whole array.
+    top_k = max(0, min(top_k, len(values)))
+    if top_k == 0:
+        return np.array([], dtype=np.int64)
+    candidates = np.argpartition(-values, top_k - 1)[:top_k]
+    return candidates[np.argsort(-values[candidates], kind="stable")]
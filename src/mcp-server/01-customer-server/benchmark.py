@@ -0,0 +1,348 @@
+import argparse
+import asyncio
+import glob
+import importlib.util
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import httpx
+import uvicorn
+from fastmcp import Client
+
+from data_functions import DataLayer
+from generate_data import generate_dataset
+from snapshot import load_data_layer, write_snapshot
+from sqlite_storage import SqliteDataLayer
+
+# Dataset sizes are given as order counts; the other collections are scaled from them.
+DEFAULT_SIZES = [10_000, 100_000]
+DEFAULT_SAMPLES = 1_000
+RESULTS_FORMAT_VERSION = 1
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+def latency_stats(samples: list[float]) -> dict:
+    """
+    Summarizes per-call latencies (in seconds) as nearest-rank percentiles in milliseconds.
+    """
+    ordered = sorted(samples)
+    def percentile(p):
+        return round(ordered[max(0, -(-len(ordered) * p // 100) - 1)] * 1000, 4)
+    return {"p50_ms": percentile(50), "p95_ms": percentile(95), "p99_ms": percentile(99)}
+
+def result(group: str, name: str, size: int, count: int, seconds: float, samples: list[float] = None) -> dict:
+    record = {"group": group, "name": name, "size": size, "count": count,
+              "seconds": round(seconds, 6), "ops_per_sec": round(count / seconds, 2) if seconds else None}
+    if samples:
+        record.update(latency_stats(samples))
+    print(f"{group:9} {name:40} size={size:<9} count={count:<9} {record['ops_per_sec']} ops/s "
+          + " ".join(f"{key}={record[key]}" for key in ("p50_ms", "p95_ms", "p99_ms") if key in record))
+    return record
+
+def time_calls(group: str, name: str, size: int, fn, args: list) -> dict:
+    samples = []
+    for arg in args:
+        start = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - start)
+    return result(group, name, size, len(samples), sum(samples), samples)
+
+def time_once(group: str, name: str, size: int, count: int, fn) -> dict:
+    start = time.perf_counter()
+    fn()
+    return result(group, name, size, count, time.perf_counter() - start)
+
+def prepare_dataset(data_dir: str, size: int, seed: int) -> str:
+    """
+    Generates the dataset for a size, reusing it when it already exists in data_dir.
+    """
+    path = os.path.join(data_dir, f"orders-{size}-seed-{seed}")
+    if not os.path.exists(os.path.join(path, "inventory.json")):
+        generate_dataset(path, customers=max(100, size // 10), orders=size,
+                         suppliers=max(10, size // 1000), seed=seed)
+    return path
+
+def load_json(path: str) -> DataLayer:
+    data_layer = DataLayer()
+    data_layer.load_order_from_json(os.path.join(path, "orders.json"))
+    data_layer.load_supplier_from_json(os.path.join(path, "suppliers.json"))
+    data_layer.load_customer_from_json(os.path.join(path, "customers.json"))
+    data_layer.load_inventory_from_json(os.path.join(path, "inventory.json"))
+    return data_layer
+
+def record_count(data_layer: DataLayer) -> int:
+    return sum(len(getattr(data_layer, name)) for name in ("orders", "suppliers", "customers", "inventory"))
+
+def bench_data_layer(path: str, size: int, samples: int, rng: random.Random) -> list[dict]:
+    """
+    Benchmarks loading, lookups, the product catalog, order updates and saving on one dataset.
+    """
+    results = []
+    start = time.perf_counter()
+    data_layer = load_json(path)
+    results.append(result("datalayer", "load_json", size, record_count(data_layer), time.perf_counter() - start))
+    results.append(time_once("datalayer", "write_snapshot", size, record_count(data_layer),
+                             lambda: write_snapshot(data_layer, path)))
+    results.append(time_once("datalayer", "load_snapshot", size, record_count(data_layer),
+                             lambda: load_data_layer(path)))
+
+    customers = rng.choices(data_layer.customers, k=samples)
+    orders = rng.choices(data_layer.orders, k=samples)
+    suppliers = rng.choices(data_layer.suppliers, k=samples)
+    inventory = rng.choices(data_layer.inventory, k=samples)
+    results.append(time_calls("datalayer", "get_supplier_by_id", size, data_layer.get_supplier_by_id,
+                              [supplier.supplier_id for supplier in suppliers]))
+    results.append(time_calls("datalayer", "get_customer_by_id", size, data_layer.get_customer_by_id,
+                              [customer.customer_id for customer in customers]))
+    results.append(time_calls("datalayer", "get_customer_by_name", size, data_layer.get_customer_by_name,
+                              [customer.customer_name for customer in customers]))
+    results.append(time_calls("datalayer", "search_customers_by_name", size, data_layer.search_customers_by_name,
+                              [customer.customer_name[:-1] for customer in customers]))
+    results.append(time_calls("datalayer", "get_closest_inventory_location", size,
+                              data_layer.get_closest_inventory_location,
+                              [customer.customer_name for customer in customers]))
+    results.append(time_calls("datalayer", "get_order_by_id", size, data_layer.get_order_by_id,
+                              [order.order_id for order in orders]))
+    results.append(time_calls("datalayer", "get_orders_by_customer_id", size, data_layer.get_orders_by_customer_id,
+                              [order.customer_id for order in orders]))
+    results.append(time_calls("datalayer", "get_inventory_by_product_id", size, data_layer.get_inventory_by_product_id,
+                              [item.product_id for item in inventory]))
+
+    def all_products_cold(_):
+        data_layer.invalidate_catalog()
+        data_layer.get_all_products()
+    iterations = range(max(1, samples // 100))
+    results.append(time_calls("datalayer", "get_all_products_cold", size, all_products_cold, iterations))
+    results.append(time_calls("datalayer", "get_all_products", size, lambda _: data_layer.get_all_products(), iterations))
+
+    updates = [order.model_copy(update={"order_status": "Shipped"}) for order in orders]
+    results.append(time_calls("datalayer", "update_order", size,
+                              lambda order: data_layer.update_order(order.order_id, order), updates))
+
+    with tempfile.TemporaryDirectory() as out:
+        results.append(time_once("datalayer", "save_order_to_json", size, len(data_layer.orders),
+                                 lambda: data_layer.save_order_to_json(os.path.join(out, "orders.json"))))
+        results.append(time_once("datalayer", "save_customer_to_json", size, len(data_layer.customers),
+                                 lambda: data_layer.save_customer_to_json(os.path.join(out, "customers.json"))))
+        results.append(time_once("datalayer", "save_supplier_to_json", size, len(data_layer.suppliers),
+                                 lambda: data_layer.save_supplier_to_json(os.path.join(out, "suppliers.json"))))
+        for order in updates:
+            data_layer.update_order(order.order_id, order)
+        results.append(time_once("datalayer", "save_order_delta", size, len(updates),
+                                 lambda: data_layer.save_order_to_json(os.path.join(out, "orders.json"), delta=True)))
+    return results
+
+def load_server(path: str):
+    # The server module loads its data at import time from DATA_PATH.
+    os.environ["DATA_PATH"] = path
+    spec = importlib.util.spec_from_file_location(f"customer_server_{abs(hash(path))}",
+                                                  os.path.join(script_dir, "server-mcp-sse-customers.py"))
+    server = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(server)
+    # Keep per-request logging of the server, MCP and HTTP client out of the measurements.
+    logging.getLogger().setLevel(logging.WARNING)
+    if server.order_log is not None:
+        # Compaction would rewrite orders.json of the reusable dataset.
+        server.order_log.compact_every = 0
+    return server
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def bench_mcp(server, size: int, samples: int, rng: random.Random) -> list[dict]:
+    """
+    Serves streamable_http_app on a local port in this process and measures the latency of
+    every resource and tool through an MCP client, and of the REST routes through an HTTP client.
+    """
+    data_layer = server.data_layer
+    # The SQLite backend keeps the collection fields empty, so the samples are drawn from iter_collection.
+    all_customers = list(data_layer.iter_collection("customers"))
+    customers = rng.choices(all_customers, k=samples)
+    orders = rng.choices(list(data_layer.iter_collection("orders")), k=samples)
+    inventory = rng.choices(list(data_layer.iter_collection("inventory")), k=samples)
+    discounted = rng.choices([c for c in all_customers if c.customer_discount] or all_customers, k=samples)
+    few = max(1, samples // 10)
+    resources = {
+        "customers/{customer_id}/customer": [f"resource://customers/{c.customer_id}/customer" for c in customers],
+        "customers/{customer_name}/customer": [f"resource://customers/{c.customer_name}/customer" for c in customers],
+        "customers/{customer_name}/matches": [f"resource://customers/{c.customer_name[:-1]}/matches" for c in customers],
+        "orders/{order_id}/order": [f"resource://orders/{o.order_id}/order" for o in orders],
+        "orders/{order_id}/discounts": [f"resource://orders/{o.order_id}/discounts" for o in orders],
+        "orders/range": [f"resource://orders/range?date_from={o.order_date}&date_to={o.order_date}&limit=50" for o in orders],
+        "orders/status/{status}": [f"resource://orders/status/{o.order_status}?limit=50" for o in orders],
+        "orders/statuses": ["resource://orders/statuses"] * few,
+        "orders/changes": ["resource://orders/changes"] * few,
+        "inventory/{product_id}/productinventory": [f"resource://inventory/{i.product_id}/productinventory" for i in inventory],
+        "inventory/{customer_name}/location": [f"resource://inventory/{c.customer_name}/location" for c in customers],
+        "inventory/{customer_name}/locations": [f"resource://inventory/{c.customer_name}/locations" for c in customers],
+        "products/page": ["resource://products/page?limit=50"] * samples,
+        "products/products": ["resource://products/products"] * few,
+        "discounts/discount": ["resource://discounts/discount"] * few,
+        "discounts/page": ["resource://discounts/page?limit=50"] * samples,
+        "discounts/{customer_id}/{product_id}/best": [
+            f"resource://discounts/{c.customer_id}/{(c.customer_discount[0].product_id if c.customer_discount else i.product_id)}/best"
+            for c, i in zip(discounted, inventory)],
+    }
+    # Order updates come last, so that the read-only tools run against the loaded data.
+    tools = {
+        "search_products": [{"query": i.product_name} for i in inventory],
+        "get_stock_by_location": [{}] * few,
+        "get_revenue_by_customer": [{"customer_id": c.customer_id} for c in customers],
+        "get_discount_exposure": [{}] * few,
+        "update_orders": [{"updates": [{"order_id": o.order_id, "order": o.model_dump(exclude_none=True)}
+                                       for o in orders[start:start + 10]]} for start in range(0, len(orders), 10)],
+    }
+    routes = {
+        "/customers/id/{customer_id}": [f"/customers/id/{c.customer_id}" for c in customers],
+        "/customers/batch": [f"/customers/batch?customer_ids={','.join(c.customer_id for c in customers[start:start + 10])}"
+                             for start in range(0, len(customers), 10)],
+        "/orders/id/{order_id}": [f"/orders/id/{o.order_id}" for o in orders],
+        "/orders/batch": [f"/orders/batch?order_ids={','.join(o.order_id for o in orders[start:start + 10])}"
+                          for start in range(0, len(orders), 10)],
+        "/inventory/{product_id}": [f"/inventory/{i.product_id}" for i in inventory],
+        "/products/all": ["/products/all"] * few,
+        "/stream/orders": ["/stream/orders"] * max(1, samples // 100),
+    }
+
+    port = free_port()
+    http_server = uvicorn.Server(uvicorn.Config(server.streamable_http_app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=http_server.run, name="benchmark-server", daemon=True)
+    thread.start()
+    while not http_server.started:
+        await asyncio.sleep(0.05)
+
+    results = []
+    try:
+        async with Client(f"http://127.0.0.1:{port}/mcp") as client:
+            for name, uris in resources.items():
+                await client.read_resource(uris[0])  # warm up
+                latencies = []
+                for uri in uris:
+                    start = time.perf_counter()
+                    await client.read_resource(uri)
+                    latencies.append(time.perf_counter() - start)
+                results.append(result("mcp", name, size, len(latencies), sum(latencies), latencies))
+            for name, calls in tools.items():
+                latencies = []
+                for arguments in calls:
+                    start = time.perf_counter()
+                    await client.call_tool(name, arguments)
+                    latencies.append(time.perf_counter() - start)
+                results.append(result("mcp", f"tool:{name}", size, len(latencies), sum(latencies), latencies))
+            latencies = []
+            for order in orders[:few]:
+                start = time.perf_counter()
+                await client.call_tool("reserve_order_inventory", {"order_id": order.order_id})
+                await client.call_tool("release_order_inventory", {"order_id": order.order_id})
+                latencies.append(time.perf_counter() - start)
+            results.append(result("mcp", "tool:reserve_and_release", size, len(latencies), sum(latencies), latencies))
+            latencies = []
+            for order in orders:
+                order = order.model_copy(update={"order_status": "Delivered"})
+                start = time.perf_counter()
+                await client.call_tool("update_order", {"order_id": order.order_id,
+                                                        "order": order.model_dump(exclude_none=True)})
+                latencies.append(time.perf_counter() - start)
+            results.append(result("mcp", "tool:update_order", size, len(latencies), sum(latencies), latencies))
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as http:
+            for name, paths in routes.items():
+                (await http.get(paths[0])).raise_for_status()  # warm up
+                latencies = []
+                for path in paths:
+                    start = time.perf_counter()
+                    response = await http.get(path)
+                    await response.aread()
+                    latencies.append(time.perf_counter() - start)
+                results.append(result("rest", name, size, len(latencies), sum(latencies), latencies))
+    finally:
+        http_server.should_exit = True
+        thread.join()
+        if server.data_reloader is not None:
+            server.data_reloader.close()
+        if server.order_log is not None:
+            server.order_log.close()
+        if isinstance(data_layer, SqliteDataLayer):
+            data_layer.close()
+    return results
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=script_dir, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "commit": commit,
+            "data_backend": os.getenv("DATA_BACKEND", "memory")}
+
+def compare(baseline: dict, current: dict):
+    """
+    Prints the change of throughput and p50/p99 latency against a previous results file.
+    """
+    previous = {(r["group"], r["name"], r["size"]): r for r in baseline["results"]}
+    print(f"\nCompared with {baseline['started_at']} ({baseline['environment'].get('commit')}):")
+    for r in current["results"]:
+        before = previous.get((r["group"], r["name"], r["size"]))
+        if before is None:
+            continue
+        changes = []
+        for key in ("ops_per_sec", "p50_ms", "p99_ms"):
+            if r.get(key) and before.get(key):
+                changes.append(f"{key} {100 * (r[key] - before[key]) / before[key]:+.1f}%")
+        print(f"{r['group']:9} {r['name']:40} size={r['size']:<9} {', '.join(changes)}")
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="customer-benchmark-")
+    report = {"format_version": RESULTS_FORMAT_VERSION,
+              "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+              "environment": environment(),
+              "parameters": {"sizes": args.sizes, "samples": args.samples, "seed": args.seed},
+              "results": []}
+    try:
+        for size in args.sizes:
+            path = prepare_dataset(data_dir, size, args.seed)
+            if not args.skip_datalayer:
+                report["results"].extend(bench_data_layer(path, size, args.samples, rng))
+            if not args.skip_mcp:
+                report["results"].extend(await bench_mcp(load_server(path), size, args.samples, rng))
+            # Runs must not see each other's order updates.
+            for pattern in ("orders.log", "datalayer.snapshot", "datalayer.sqlite*", "*.json.patch"):
+                for leftover in glob.glob(os.path.join(path, pattern)):
+                    os.remove(leftover)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the customer DataLayer and MCP resource latency.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Dataset sizes as order counts")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES, help="Calls per lookup and resource")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", help="Keep generated datasets here and reuse them across runs")
+    parser.add_argument("--output", default="benchmark-results.json", help="Machine-readable results file")
+    parser.add_argument("--baseline", help="Results file of a previous run to compare against")
+    parser.add_argument("--skip-datalayer", action="store_true", help="Only measure the MCP resources")
+    parser.add_argument("--skip-mcp", action="store_true", help="Only measure the DataLayer")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("Wrote benchmark results:", args.output)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(json.load(f), report)
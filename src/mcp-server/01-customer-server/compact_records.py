@@ -0,0 +1,214 @@
+from array import array
+from collections.abc import MutableSequence
+from typing import Iterable
+from pydantic import BaseModel
+
+class _PooledColumn:
+    # Repeated strings (statuses, dates, locations, customer ids) are stored once and referenced
+    # by a 4-byte index per record. Index 0 is None.
+    def __init__(self):
+        self.codes = array("I")
+        self.values = [None]
+        self.index = {None: 0}
+
+    def append(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def get(self, i: int):
+        return self.values[self.codes[i]]
+
+    def copy(self) -> "_PooledColumn":
+        # The pool only grows, so copies can share it.
+        column = _PooledColumn.__new__(_PooledColumn)
+        column.codes = array("I", self.codes)
+        column.values = self.values
+        column.index = self.index
+        return column
+
+class _TextColumn:
+    # Strings that are unique per record, such as order ids.
+    def __init__(self):
+        self.values = []
+
+    def append(self, value):
+        self.values.append(value)
+
+    def get(self, i: int):
+        return self.values[i]
+
+    def copy(self) -> "_TextColumn":
+        column = _TextColumn()
+        column.values = list(self.values)
+        return column
+
+class _IntegerColumn:
+    def __init__(self):
+        self.values = array("q")
+
+    def append(self, value):
+        self.values.append(value)
+
+    def get(self, i: int):
+        return self.values[i]
+
+    def copy(self) -> "_IntegerColumn":
+        column = _IntegerColumn()
+        column.values = array("q", self.values)
+        return column
+
+def _freeze(value):
+    return tuple(value) if isinstance(value, list) else value
+
+class _ModelListColumn:
+    # Lists of nested models, such as order items. Each distinct model is stored once; records
+    # hold a slice of model indexes. None lists are kept in a set, as they are rare.
+    def __init__(self):
+        self.offsets = array("I", [0])
+        self.items = array("I")
+        self.models = []
+        self.index = {}
+        self.nones = set()
+
+    def append(self, value):
+        if value is None:
+            self.nones.add(len(self.offsets) - 1)
+        for model in value or []:
+            key = (type(model), *(_freeze(v) for v in model.__dict__.values()))
+            code = self.index.get(key)
+            if code is None:
+                code = self.index[key] = len(self.models)
+                self.models.append(model)
+            self.items.append(code)
+        self.offsets.append(len(self.items))
+
+    def get(self, i: int):
+        if i in self.nones:
+            return None
+        return [self.models[code] for code in self.items[self.offsets[i]:self.offsets[i + 1]]]
+
+    def copy(self) -> "_ModelListColumn":
+        column = _ModelListColumn.__new__(_ModelListColumn)
+        column.offsets = array("I", self.offsets)
+        column.items = array("I", self.items)
+        column.models = self.models
+        column.index = self.index
+        column.nones = set(self.nones)
+        return column
+
+# Column type per field of the models that can be stored compactly, by model name.
+COMPACT_LAYOUTS = {
+    "Order": {
+        "customer_id": _PooledColumn,
+        "order_id": _TextColumn,
+        "order_date": _PooledColumn,
+        "order_status": _PooledColumn,
+        "fill_date": _PooledColumn,
+        "fill_strategy": _PooledColumn,
+        "order_items": _ModelListColumn,
+    },
+    "ProductInventory": {
+        "product_id": _PooledColumn,
+        "product_name": _PooledColumn,
+        "volume": _IntegerColumn,
+        "location": _PooledColumn,
+    },
+}
+
+class CompactRecords(MutableSequence):
+    """
+    A list-like, struct-of-arrays store for high-cardinality collections.
+
+    Every field is kept in its own column: repeated strings are interned into a pool and
+    referenced by index, integers live in typed arrays, and nested models such as order items
+    are stored once and shared. Records are materialized as pydantic models on access and not
+    kept, so only the models handed out exist at any time. Assigned records are kept as
+    overrides, which readers see atomically.
+    """
+
+    def __init__(self, model: type[BaseModel]):
+        self._model = model
+        self._columns = {field: column() for field, column in COMPACT_LAYOUTS[model.__name__].items()}
+        self._overrides: dict[int, BaseModel] = {}
+        self._length = 0
+
+    @classmethod
+    def from_records(cls, model: type[BaseModel], records: Iterable[BaseModel]) -> "CompactRecords":
+        """
+        Builds the compact store from records of a model listed in COMPACT_LAYOUTS.
+        """
+        compact = cls(model)
+        compact.extend_records(records)
+        return compact
+
+    def extend_records(self, records: Iterable[BaseModel]):
+        """
+        Appends records, e.g. one validated batch at a time while loading.
+        """
+        columns = self._columns.items()
+        for record in records:
+            for field, column in columns:
+                column.append(getattr(record, field))
+            self._length += 1
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("CompactRecords index out of range")
+        record = self._overrides.get(index)
+        if record is None:
+            # The columns hold validated data, so construct without validating again.
+            record = self._model.model_construct(**{field: column.get(index) for field, column in self._columns.items()})
+        return record
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            raise TypeError("CompactRecords does not support slice assignment")
+        if index < 0:
+            index += self._length
+        self._overrides[index] = value
+
+    def __delitem__(self, index):
+        raise TypeError("CompactRecords does not support deletion")
+
+    def insert(self, index, value):
+        raise TypeError("CompactRecords does not support insertion")
+
+    def copy(self) -> "CompactRecords":
+        """
+        Returns a copy; assignments to either copy do not affect the other.
+        """
+        records = CompactRecords.__new__(CompactRecords)
+        records._model = self._model
+        records._columns = {field: column.copy() for field, column in self._columns.items()}
+        records._overrides = dict(self._overrides)
+        records._length = self._length
+        return records
+
+    def iter_uncached(self):
+        """
+        Iterates over the records; provided for parity with snapshot-backed collections.
+        """
+        return iter(self)
+
+    def key_rows(self, *fields):
+        """
+        Yields the requested fields per record straight from the columns.
+        """
+        columns = [self._columns[field] for field in fields]
+        overrides = self._overrides
+        for i in range(self._length):
+            record = overrides.get(i)
+            if record is None:
+                yield tuple(column.get(i) for column in columns)
+            else:
+                yield tuple(getattr(record, field) for field in fields)
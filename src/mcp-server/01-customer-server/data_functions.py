@@ -1,5 +1,60 @@
+import base64
+import binascii
+import codecs
+import heapq
 import json
-from pydantic import BaseModel, Field
+import os
+import threading
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, deque
+from collections.abc import Sequence
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+from itertools import chain
+from operator import itemgetter
+from typing import Any, Callable, Iterable, Iterator
+from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter
+
+from compact_records import COMPACT_LAYOUTS, CompactRecords
+from delta_patches import append_patch, patch_lock, read_patch, remove_patch
+from discounts import DiscountResolver
+from product_search import ProductSearchIndex
+from regions import DEFAULT_WAREHOUSE, WAREHOUSE_COORDINATES, address_region, distance_km, region_coordinates
+
+# Streaming loader settings: bytes read from disk per chunk and records validated per batch.
+STREAM_CHUNK_SIZE = 1 << 20
+VALIDATE_BATCH_SIZE = 10_000
+
+# progress(records_loaded, bytes_read, total_bytes)
+ProgressCallback = Callable[[int, int, int], None]
+
+# Number of striped write locks shared by all orders.
+ORDER_LOCK_STRIPES = 64
+
+# Fuzzy customer name search: posting lists are counted rarest first, in full while they fit in
+# this many entries and beyond that only up to a position shared by the remaining lists; at most
+# this many candidates per result are scored exactly.
+MAX_TRIGRAM_POSTINGS = 3_000
+FUZZY_CANDIDATES_PER_RESULT = 20
+
+# Number of recent order changes kept for get_order_changes.
+ORDER_CHANGE_HISTORY = 1_000
+
+# Maximum number of results of the product search.
+MAX_SEARCH_RESULTS = 50
+
+# Order fields that can be queried by date range; dates are ISO strings (YYYY-MM-DD), so they sort as text.
+ORDER_DATE_FIELDS = ("order_date", "fill_date")
+
+# Replaced orders are kept as overrides of an OrderVersion until there are this many, then
+# folded into a copy of the stored orders.
+ORDER_VERSION_FOLD_SIZE = 1_024
+
+# Page size limits for the paginated catalog and order resources.
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
 
 class Discount(BaseModel):
     discount_id: str
@@ -54,47 +109,886 @@ class Order(BaseModel):
     fill_strategy: str = None
     order_items: list[Product] = None
 
+class OrderUpdate(BaseModel):
+    order_id: str
+    order: Order
+
+class OrderUpdateResult(BaseModel):
+    order_id: str
+    success: bool
+    error: str | None = None
+
+class CustomerMatch(BaseModel):
+    customer_id: str
+    customer_name: str
+    score: float
+
+class ProductMatch(BaseModel):
+    product: Product
+    supplier_id: str
+    score: float
+
+class CustomerRevenue(BaseModel):
+    customer_id: str
+    orders: int
+    revenue: float
+
+class LocationStock(BaseModel):
+    location: str
+    products: int
+    volume: int
+
+class CustomerDiscountExposure(BaseModel):
+    customer_id: str
+    discounts: int
+    exposure: float
+
+class WarehouseDistance(BaseModel):
+    location: str
+    distance_km: float | None = None
+
+class OrderChange(BaseModel):
+    sequence: int
+    order_id: str
+    new_order_id: str
+    order_status: str
+
+class ResolvedDiscount(BaseModel):
+    customer_id: str
+    product_id: str
+    quantity: int
+    list_price: float | None = None
+    unit_price: float | None = None
+    discount_id: str | None = None
+    discount_name: str | None = None
+    # "customer" for a CustomerDiscount, "supplier" for a Discount every customer gets.
+    discount_source: str | None = None
+    next_discount_volume: int | None = None
+    next_discount_price: float | None = None
+
+class ReservationLine(BaseModel):
+    product_id: str
+    quantity: int
+
+class ReservationAllocation(BaseModel):
+    product_id: str
+    location: str
+    quantity: int
+    # Position of the inventory row the stock was taken from; a location can hold several rows of a product.
+    position: int | None = None
+
+class Reservation(BaseModel):
+    order_id: str
+    fill_strategy: str
+    success: bool
+    allocations: list[ReservationAllocation] = []
+    backorders: list[ReservationLine] = []
+    error: str | None = None
+
 class Message(BaseModel):
     message: str
 
+class Page(BaseModel):
+    items: list[dict]
+    next_cursor: str | None = None
+    total: int
+
+def encode_cursor(kind: str, offset: int) -> str:
+    """
+    Encodes an opaque page cursor for a catalog kind and offset.
+    """
+    return base64.urlsafe_b64encode(f"{kind}:{offset}".encode()).decode().rstrip("=")
+
+def decode_cursor(kind: str, cursor: str) -> int:
+    """
+    Decodes a page cursor produced by encode_cursor and returns its offset.
+    An empty cursor starts at the first page.
+    """
+    if not cursor:
+        return 0
+    try:
+        cursor_kind, _, offset = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().partition(":")
+        if cursor_kind == kind and int(offset) >= 0:
+            return int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        pass
+    raise ValueError(f"Invalid {kind} cursor: {cursor}")
+
+def name_trigrams(name: str) -> set[str]:
+    """
+    Returns the set of character trigrams of a case-folded, whitespace-normalized name,
+    padded so that word starts and ends form trigrams of their own.
+    """
+    padded = "  " + " ".join(name.casefold().split()) + " "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _projection(model: type[BaseModel], fields: list[str]) -> set[str]:
+    if not fields:
+        return None
+    unknown = set(fields) - set(model.model_fields)
+    if unknown:
+        raise ValueError(f"Unknown {model.__name__} fields: {', '.join(sorted(unknown))}")
+    return set(fields)
+
+class _ChunkedJsonReader:
+    """
+    Minimal pull parser over a binary file that keeps only the unconsumed tail of the
+    current chunk in memory. Values are decoded with json.JSONDecoder.raw_decode.
+    """
+
+    def __init__(self, f, chunk_size: int):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.bytes_read = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self._f.read(self._chunk_size)
+        self.bytes_read += len(chunk)
+        self.eof = not chunk
+        self.buf = self.buf[self.pos:] + self._utf8.decode(chunk, final=self.eof)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self._json.raw_decode(self.buf, self.pos)
+                # A value ending exactly at the buffer edge may be truncated (e.g. a number).
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+def _iter_json_array(file_name: str, key: str, chunk_size: int) -> Iterator[tuple[dict, int]]:
+    with open(file_name, 'rb') as f:
+        reader = _ChunkedJsonReader(f, chunk_size)
+        reader.expect("{")
+        while reader.peek() != "}":
+            name = reader.value()
+            reader.expect(":")
+            if name != key:
+                reader.value()
+            else:
+                reader.expect("[")
+                if reader.peek() == "]":
+                    return
+                while True:
+                    yield reader.value(), reader.bytes_read
+                    if reader.peek() != ",":
+                        reader.expect("]")
+                        return
+                    reader.pos += 1
+            if reader.peek() == ",":
+                reader.pos += 1
+        raise KeyError(key)
+
+def iter_json_array(file_name: str, key: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Incrementally yields the records of the top-level array `key` in a file shaped like {"key": [...]}.
+    Memory use is bounded by the chunk size and the largest single record, not by the file size.
+    :param file_name (str): The name of the file to read.
+    :param key (str): The top-level key holding the array.
+    :param chunk_size (int): Number of bytes read from disk at a time.
+    """
+    for record, _ in _iter_json_array(file_name, key, chunk_size):
+        yield record
+
+@lru_cache(maxsize=None)
+def _type_adapter(value_type) -> TypeAdapter:
+    return TypeAdapter(value_type)
+
+def _list_adapter(model: type[BaseModel]) -> TypeAdapter:
+    return _type_adapter(list[model])
+
+def dump_json(value, value_type) -> bytes:
+    """
+    Serializes a value with the compiled pydantic serializer for its declared type, which is
+    cached per type and avoids the per-call type inference of a generic serializer.
+    :param value: The value to serialize, e.g. an Order or a list of Products.
+    :param value_type: The declared type of the value, e.g. Order or list[Product].
+    :return: The JSON encoding of the value.
+    :rtype: bytes
+    """
+    return _type_adapter(value_type).dump_json(value)
+
+def write_json_collection(file_name: str, key: str, model: type[BaseModel], records):
+    """
+    Writes records to a file shaped like {"key": [...]}, serializing them in batches with the
+    compiled pydantic serializer. Unset optional fields are omitted so the file loads back.
+    :param file_name (str): The name of the file to write.
+    :param key (str): The top-level key holding the array.
+    :param model (type[BaseModel]): The model of the records.
+    :param records: The records to write.
+    """
+    adapter = _list_adapter(model)
+    with open(file_name, 'wb') as f:
+        f.write(b'{"' + key.encode() + b'": [')
+        for start in range(0, len(records), VALIDATE_BATCH_SIZE):
+            batch = adapter.dump_json(list(records[start:start + VALIDATE_BATCH_SIZE]), exclude_none=True)
+            if start:
+                f.write(b",")
+            # Strip the brackets so that the batches join into a single array.
+            f.write(batch[1:-1])
+        f.write(b"]}\n")
+
+def stream_models_from_json(file_name: str, key: str, model: type[BaseModel],
+                            batch_size: int = VALIDATE_BATCH_SIZE,
+                            progress: ProgressCallback = None, patched: dict[int, dict] = None) -> Iterator[list[BaseModel]]:
+    """
+    Streams the records of the top-level array `key` and yields them as validated model batches.
+    :param file_name (str): The name of the file to read.
+    :param key (str): The top-level key holding the array.
+    :param model (type[BaseModel]): The pydantic model each record is validated against.
+    :param batch_size (int): Number of records validated together.
+    :param progress (ProgressCallback): Optional callback invoked after each batch with
+        (records_loaded, bytes_read, total_bytes).
+    :param patched (dict[int, dict]): Optional records that replace the ones at their positions, see read_patch.
+    """
+    adapter = _list_adapter(model)
+    total_bytes = os.path.getsize(file_name)
+    loaded = 0
+    batch = []
+    bytes_read = 0
+    for record, bytes_read in _iter_json_array(file_name, key, STREAM_CHUNK_SIZE):
+        batch.append(patched.get(loaded + len(batch), record) if patched else record)
+        if len(batch) >= batch_size:
+            loaded += len(batch)
+            yield adapter.validate_python(batch)
+            batch = []
+            if progress:
+                progress(loaded, bytes_read, total_bytes)
+    if batch:
+        loaded += len(batch)
+        yield adapter.validate_python(batch)
+    if progress:
+        progress(loaded, total_bytes, total_bytes)
+
+# Fields each DataLayer collection is indexed by; snapshots store these as key columns.
+INDEX_KEYS = {
+    "suppliers": ("supplier_id",),
+    "customers": ("customer_id", "customer_name", "customer_address"),
+    "orders": ("order_id", "customer_id", "order_date", "fill_date", "order_status"),
+    "inventory": ("product_id", "location"),
+}
+
+def iter_key_rows(records, *fields) -> Iterator[tuple]:
+    """
+    Yields a tuple of the given fields per record. Snapshot-backed collections expose their
+    key columns so that indexing does not materialize records.
+    """
+    if records is None:
+        return iter(())
+    key_rows = getattr(records, "key_rows", None)
+    if key_rows is not None:
+        return key_rows(*fields)
+    return (tuple(getattr(record, field) for field in fields) for record in records)
+
+def _contains(positions: array, pos: int) -> bool:
+    # Whether a sorted position array holds pos.
+    i = bisect_left(positions, pos)
+    return i < len(positions) and positions[i] == pos
+
+def _move_position(overlay: dict[str, list[int]], positions_of: Callable[[str, dict], list[int]],
+                   old_key: str, new_key: str, pos: int):
+    # Moves pos from the sorted positions of old_key to those of new_key in an index overlay.
+    overlay[old_key] = [p for p in positions_of(old_key, overlay) if p != pos]
+    positions = list(positions_of(new_key, overlay))
+    insort(positions, pos)
+    overlay[new_key] = positions
+
+def _moved_positions(index: dict[str, array], moves: list[tuple[int, str, str]]) -> dict[str, array]:
+    # Returns a copy of a key -> sorted positions index with the (position, old key, new key)
+    # moves applied. Only the buckets of the keys involved are rebuilt.
+    if not moves:
+        return index
+    removed, added = {}, {}
+    for pos, old_key, new_key in moves:
+        removed.setdefault(old_key, set()).add(pos)
+        added.setdefault(new_key, []).append(pos)
+    index = dict(index)
+    for key in removed.keys() | added.keys():
+        dropped = removed.get(key, ())
+        bucket = array("I", heapq.merge((pos for pos in index.get(key, ()) if pos not in dropped), sorted(added.get(key, ()))))
+        if bucket:
+            index[key] = bucket
+        else:
+            index.pop(key, None)
+    return index
+
+def _fold_records(records, overrides: dict[int, BaseModel]):
+    # Returns a copy of a collection with the overridden records assigned.
+    if not overrides:
+        return records
+    records = records.copy()
+    for pos, record in overrides.items():
+        records[pos] = record
+    return records
+
+class OrderVersion(Sequence):
+    """
+    An immutable version of the orders and their lookup indexes.
+
+    DataLayer.orders always holds the current version. A reader takes it with one attribute
+    read and can then make any number of lookups that all see the same state, without locks.
+    Writers never modify a published version: with_orders builds a new one that shares the
+    stored records and their indexes, and keeps the replaced orders in a small overrides map.
+    Id and customer changes go to small overlays of those indexes, and status and date changes
+    are read from the overrides, so a write costs the same whatever the number of orders. The
+    DataLayer publishes the new version with a single assignment. Once there are more than
+    ORDER_VERSION_FOLD_SIZE overrides, they are folded into copies of the stored records and
+    indexes.
+    """
+
+    def __init__(self, records, overrides: dict[int, Order], pos_by_id: dict[str, int], dup_pos_by_id: dict[str, list[int]],
+                 pos_by_customer_id: dict[str, list[int]], pos_by_status: dict[str, array], status_by_pos: list[str],
+                 dates: dict[str, tuple[list[str], dict[str, array]]], date_by_pos: dict[str, list[str]],
+                 id_overlay: dict[str, list[int]] = None, customer_overlay: dict[str, list[int]] = None):
+        self.records = records
+        self._overrides = overrides
+        # The indexes below describe the stored records. Order id -> first position, and the
+        # sorted positions of the ids that occur more than once.
+        self._pos_by_id = pos_by_id
+        self._dup_pos_by_id = dup_pos_by_id
+        self._pos_by_customer_id = pos_by_customer_id
+        # Order filters: status -> sorted positions, and per date field the sorted distinct dates
+        # and date -> sorted positions. The status and dates per position of the stored records
+        # let find_positions intersect filters by scanning only the smallest candidate list.
+        self._pos_by_status = pos_by_status
+        self._status_by_pos = status_by_pos
+        self._dates = dates
+        self._date_by_pos = date_by_pos
+        # Order id / customer id -> all its sorted positions, for the keys changed by the overrides.
+        self._id_overlay = id_overlay or {}
+        self._customer_overlay = customer_overlay or {}
+
+    @classmethod
+    def build(cls, records) -> "OrderVersion":
+        """
+        Indexes a collection of orders. The collection must not be modified afterwards.
+        """
+        records = [] if records is None else records
+        pos_by_id = {}
+        dup_pos_by_id = {}
+        pos_by_customer_id = {}
+        pos_by_status = {}
+        status_by_pos = []
+        date_by_pos = {field: [] for field in ORDER_DATE_FIELDS}
+        for i, (order_id, customer_id, order_date, fill_date, status) in enumerate(iter_key_rows(records, *INDEX_KEYS["orders"])):
+            first = pos_by_id.setdefault(order_id, i)
+            if first != i:
+                dup_pos_by_id.setdefault(order_id, [first]).append(i)
+            pos_by_customer_id.setdefault(customer_id, []).append(i)
+            pos_by_status.setdefault(status, array("I")).append(i)
+            status_by_pos.append(status)
+            date_by_pos["order_date"].append(order_date)
+            date_by_pos["fill_date"].append(fill_date)
+        dates = {}
+        for field, values in date_by_pos.items():
+            pos_by_date = {}
+            for i, date in enumerate(values):
+                pos_by_date.setdefault(date, array("I")).append(i)
+            dates[field] = (sorted(pos_by_date), pos_by_date)
+        return cls(records, {}, pos_by_id, dup_pos_by_id, pos_by_customer_id, pos_by_status, status_by_pos, dates, date_by_pos)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self.records)
+        record = self._overrides.get(index)
+        return self.records[index] if record is None else record
+
+    def copy(self) -> "OrderVersion":
+        # Versions are immutable, so they can be shared instead of copied.
+        return self
+
+    def iter_uncached(self):
+        """
+        Iterates over the orders without caching snapshot-backed records.
+        """
+        records = getattr(self.records, "iter_uncached", None)
+        for i, record in enumerate(records() if records is not None else self.records):
+            yield self._overrides.get(i, record)
+
+    def key_rows(self, *fields):
+        """
+        Yields the requested fields per order, from the key columns of the stored records where
+        they have them.
+        """
+        overrides = self._overrides
+        for i, row in enumerate(iter_key_rows(self.records, *fields)):
+            record = overrides.get(i)
+            yield row if record is None else tuple(getattr(record, field) for field in fields)
+
+    def raw(self, index: int) -> bytes:
+        """
+        Returns the compact JSON of an order, reusing the stored bytes of snapshot-backed records.
+        """
+        raw = getattr(self.records, "raw", None)
+        if raw is not None and index not in self._overrides:
+            return raw(index)
+        return self[index].model_dump_json(exclude_none=True).encode()
+
+    def _id_positions(self, order_id: str, overlay: dict[str, list[int]]) -> list[int]:
+        positions = overlay.get(order_id)
+        if positions is not None:
+            return positions
+        positions = self._dup_pos_by_id.get(order_id)
+        if positions is not None:
+            return positions
+        pos = self._pos_by_id.get(order_id)
+        return [] if pos is None else [pos]
+
+    def _customer_positions(self, customer_id: str, overlay: dict[str, list[int]]) -> list[int]:
+        positions = overlay.get(customer_id)
+        return self._pos_by_customer_id.get(customer_id, []) if positions is None else positions
+
+    def position(self, order_id: str) -> int:
+        if self._id_overlay:
+            positions = self._id_overlay.get(order_id)
+            if positions is not None:
+                return positions[0] if positions else None
+        return self._pos_by_id.get(order_id)
+
+    def get_order_by_id(self, order_id: str) -> Order:
+        pos = self.position(order_id)
+        return None if pos is None else self[pos]
+
+    def get_orders_by_customer_id(self, customer_id: str) -> list[Order]:
+        return [self[pos] for pos in self._customer_positions(customer_id, self._customer_overlay)]
+
+    def status_counts(self) -> dict[str, int]:
+        counts = {status: len(positions) for status, positions in self._pos_by_status.items()}
+        for pos, record in self._overrides.items():
+            status = self._status_by_pos[pos]
+            if status != record.order_status:
+                counts[status] -= 1
+                counts[record.order_status] = counts.get(record.order_status, 0) + 1
+        return {status: count for status, count in counts.items() if count}
+
+    def _status(self, pos: int) -> str:
+        record = self._overrides.get(pos)
+        return self._status_by_pos[pos] if record is None else record.order_status
+
+    def _date(self, date_field: str, pos: int) -> str:
+        record = self._overrides.get(pos)
+        return self._date_by_pos[date_field][pos] if record is None else getattr(record, date_field)
+
+    def find_positions(self, status: str, date_from: str, date_to: str, date_field: str) -> Sequence[int]:
+        """
+        Finds the positions of the orders matching all given filters: sorted by date when a date
+        range is given, otherwise by position.
+        """
+        has_range = date_from is not None or date_to is not None
+        if status is None and not has_range:
+            return range(len(self))
+        # (candidate count, candidates, whether they are in date order)
+        candidates = []
+        if status is not None:
+            by_status = self._pos_by_status.get(status, array("I"))
+            candidates.append((len(by_status), by_status, False))
+        if has_range:
+            dates, by_date = self._dates[date_field]
+            in_range = dates[bisect_left(dates, date_from) if date_from is not None else 0:
+                             bisect_right(dates, date_to) if date_to is not None else len(dates)]
+            buckets = [by_date.get(date, ()) for date in in_range]
+            candidates.append((sum(len(bucket) for bucket in buckets), chain.from_iterable(buckets), True))
+        _, scan, date_order = min(candidates, key=lambda candidate: candidate[0])
+
+        def matches(pos: int) -> bool:
+            return ((status is None or self._status(pos) == status)
+                    and (date_from is None or self._date(date_field, pos) >= date_from)
+                    and (date_to is None or self._date(date_field, pos) <= date_to))
+
+        # The indexes cover the stored records only, so the overrides are matched on their own.
+        overrides = self._overrides
+        positions = [pos for pos in scan if pos not in overrides and matches(pos)]
+        changed = sorted(pos for pos in overrides if matches(pos))
+        if changed:
+            date_key = lambda pos: (self._date(date_field, pos), pos)
+            if date_order:
+                changed.sort(key=date_key)
+            positions = list(heapq.merge(positions, changed, key=date_key if date_order else None))
+        if has_range and not date_order:
+            positions.sort(key=lambda pos: (self._date(date_field, pos), pos))
+        return positions
+
+    def with_orders(self, replacements: list[tuple[int, Order]]) -> "OrderVersion":
+        """
+        Builds the version that results from replacing the orders at the given positions.
+        Only the overrides and the overlays of changed keys are copied; this version is left as
+        it is.
+        """
+        overrides = dict(self._overrides)
+        id_overlay = customer_overlay = None
+        for pos, order in replacements:
+            old = overrides.get(pos)
+            if old is None:
+                old = self.records[pos]
+            overrides[pos] = order
+            if old.order_id != order.order_id:
+                # The next position of the old id, if any, becomes its first match.
+                if id_overlay is None:
+                    id_overlay = dict(self._id_overlay)
+                _move_position(id_overlay, self._id_positions, old.order_id, order.order_id, pos)
+            if old.customer_id != order.customer_id:
+                if customer_overlay is None:
+                    customer_overlay = dict(self._customer_overlay)
+                _move_position(customer_overlay, self._customer_positions, old.customer_id, order.customer_id, pos)
+        version = OrderVersion(self.records, overrides, self._pos_by_id, self._dup_pos_by_id, self._pos_by_customer_id,
+                               self._pos_by_status, self._status_by_pos, self._dates, self._date_by_pos,
+                               self._id_overlay if id_overlay is None else id_overlay,
+                               self._customer_overlay if customer_overlay is None else customer_overlay)
+        return version._folded() if len(overrides) > ORDER_VERSION_FOLD_SIZE else version
+
+    def folded_records(self):
+        """
+        Returns the stored records with the replaced orders assigned, copied if there are any.
+        """
+        return _fold_records(self.records, self._overrides)
+
+    def _folded(self) -> "OrderVersion":
+        # Moves the overrides and overlays into copies of the stored records and indexes.
+        status_by_pos = list(self._status_by_pos)
+        date_by_pos = {field: list(values) for field, values in self._date_by_pos.items()}
+        status_moves = []
+        date_moves = {field: [] for field in ORDER_DATE_FIELDS}
+        for pos, record in self._overrides.items():
+            if status_by_pos[pos] != record.order_status:
+                status_moves.append((pos, status_by_pos[pos], record.order_status))
+                status_by_pos[pos] = record.order_status
+            for field in ORDER_DATE_FIELDS:
+                date = getattr(record, field)
+                if date_by_pos[field][pos] != date:
+                    date_moves[field].append((pos, date_by_pos[field][pos], date))
+                    date_by_pos[field][pos] = date
+        dates = {}
+        for field, (sorted_dates, by_date) in self._dates.items():
+            if date_moves[field]:
+                by_date = _moved_positions(by_date, date_moves[field])
+                sorted_dates = sorted(by_date)
+            dates[field] = (sorted_dates, by_date)
+
+        pos_by_id, dup_pos_by_id = self._pos_by_id, self._dup_pos_by_id
+        if self._id_overlay:
+            pos_by_id, dup_pos_by_id = dict(pos_by_id), dict(dup_pos_by_id)
+            for order_id, positions in self._id_overlay.items():
+                if positions:
+                    pos_by_id[order_id] = positions[0]
+                else:
+                    pos_by_id.pop(order_id, None)
+                if len(positions) > 1:
+                    dup_pos_by_id[order_id] = positions
+                else:
+                    dup_pos_by_id.pop(order_id, None)
+        pos_by_customer_id = self._pos_by_customer_id
+        if self._customer_overlay:
+            pos_by_customer_id = dict(pos_by_customer_id)
+            for customer_id, positions in self._customer_overlay.items():
+                if positions:
+                    pos_by_customer_id[customer_id] = positions
+                else:
+                    pos_by_customer_id.pop(customer_id, None)
+        return OrderVersion(self.folded_records(), {}, pos_by_id, dup_pos_by_id, pos_by_customer_id,
+                            _moved_positions(self._pos_by_status, status_moves), status_by_pos, dates, date_by_pos)
+
 class DataLayer(BaseModel):
     suppliers: list[Supplier] = Field(None)
     customers: list[Customer] = Field(None)
     orders: list[Order] = Field(None)
     inventory: list[ProductInventory] = Field(None)
 
+    # Lookup indexes, rebuilt whenever a collection is (re)loaded. They hold list positions
+    # rather than objects so they can be built from snapshot key columns without
+    # materializing records, and so update_order can replace an order in place.
+    _supplier_pos_by_id: dict[str, int] = PrivateAttr(default_factory=dict)
+    _customer_pos_by_id: dict[str, int] = PrivateAttr(default_factory=dict)
+    _customer_pos_by_name: dict[str, int] = PrivateAttr(default_factory=dict)
+    _inventory_pos_by_product_id: dict[str, list[int]] = PrivateAttr(default_factory=dict)
+    # The orders and their indexes, published as a whole (see OrderVersion). Also held in orders.
+    _order_version: OrderVersion = PrivateAttr(default_factory=lambda: OrderVersion.build(None))
+    # Fuzzy name search: trigram -> customer positions, plus the id and name and the number of
+    # distinct trigrams of the name per position.
+    _customer_trigrams: dict[str, array] = PrivateAttr(default_factory=dict)
+    _customer_keys: list[tuple[str, str]] = PrivateAttr(default_factory=list)
+    _customer_trigram_counts: array = PrivateAttr(default_factory=lambda: array("I"))
+    # Inventory routing: customer name -> region key, distinct warehouses, and per-region rankings.
+    _customer_region_by_name: dict[str, str] = PrivateAttr(default_factory=dict)
+    _warehouses: list[str] = PrivateAttr(default_factory=list)
+    _warehouse_rankings: dict[str, list[WarehouseDistance]] = PrivateAttr(default_factory=dict)
+    # Materialized product/discount catalog: kind -> (items, JSON bytes, JSON text).
+    _catalog_cache: dict[str, tuple[list, bytes, str]] = PrivateAttr(default_factory=dict)
+    _catalog_generation: int = PrivateAttr(0)
+    # Full-text product search, built while suppliers are loaded or on the first search.
+    _product_index: ProductSearchIndex = PrivateAttr(None)
+    _product_index_lock: Any = PrivateAttr(default_factory=threading.Lock)
+    # Best discount per customer, product and quantity, built from suppliers and customers on
+    # first use; dropped whenever either is reloaded or a supplier is updated.
+    _discount_resolver: DiscountResolver = PrivateAttr(None)
+    _discount_resolver_lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _discount_generation: int = PrivateAttr(0)
+    # Order writers take striped locks (see lock_orders) and build a new OrderVersion, then take _order_index_lock
+    # just to publish it if it is still based on the current one (see _replace_orders).
+    _order_locks: list = PrivateAttr(default_factory=lambda: [threading.RLock() for _ in range(ORDER_LOCK_STRIPES)])
+    _order_index_lock: Any = PrivateAttr(default_factory=threading.RLock)
+    # Whether high-cardinality collections are loaded into CompactRecords (see use_compact_records).
+    _compact: bool = PrivateAttr(False)
+    # Order change feed: listeners called for every applied order update, and the recent changes.
+    _order_listeners: list[Callable[[OrderChange], None]] = PrivateAttr(default_factory=list)
+    _order_changes: deque = PrivateAttr(default_factory=lambda: deque(maxlen=ORDER_CHANGE_HISTORY))
+    _order_change_sequence: int = PrivateAttr(0)
+    _order_change_lock: Any = PrivateAttr(default_factory=threading.Lock)
+    # Positions updated since the collection was last saved, written by delta saves.
+    _dirty: dict[str, set[int]] = PrivateAttr(default_factory=lambda: {"suppliers": set(), "customers": set(), "orders": set()})
+    _dirty_lock: Any = PrivateAttr(default_factory=threading.Lock)
+    # Change counter per collection, and a token telling DataLayers apart (see collection_version).
+    _versions: Counter = PrivateAttr(default_factory=Counter)
+    _version_token: str = PrivateAttr(default_factory=lambda: uuid.uuid4().hex[:12])
+    _version_lock: Any = PrivateAttr(default_factory=threading.Lock)
+
     def fill_data(self):
         self.suppliers = self.generate_supplier_data()
         self.customers = self.generate_customer_data()
         self.orders = self.generate_order_data()
         self.inventory = self.generate_inventory_data()
+        self.build_indexes()
+
+    def build_indexes(self):
+        """
+        Rebuilds all lookup indexes from the current collections.
+        Call this after assigning to suppliers, customers, orders or inventory directly.
+        """
+        self._index_suppliers()
+        self._index_customers()
+        self._index_orders()
+        self._index_inventory()
+        # Indexing product text needs the supplier records, so it waits for the first search.
+        self._product_index = None
+
+    # Each index is built into fresh dicts and then published with a single assignment,
+    # so lock-free readers see either the old or the new index, never a partial one.
+    def _index_suppliers(self):
+        self.invalidate_catalog()
+        supplier_pos_by_id = {}
+        for i, (supplier_id,) in enumerate(iter_key_rows(self.suppliers, *INDEX_KEYS["suppliers"])):
+            supplier_pos_by_id.setdefault(supplier_id, i)
+        self._supplier_pos_by_id = supplier_pos_by_id
+        self._changed("suppliers")
+
+    def _index_customers(self):
+        self.invalidate_discounts()
+        customer_pos_by_id = {}
+        customer_pos_by_name = {}
+        key_rows = list(iter_key_rows(self.customers, *INDEX_KEYS["customers"]))
+        for i, (customer_id, customer_name, _) in enumerate(key_rows):
+            customer_pos_by_id.setdefault(customer_id, i)
+            customer_pos_by_name.setdefault(customer_name, i)
+        self._customer_pos_by_id = customer_pos_by_id
+        self._customer_pos_by_name = customer_pos_by_name
+        self._index_customer_names((customer_id, customer_name) for customer_id, customer_name, _ in key_rows)
+        self._index_customer_regions((customer_name, address) for _, customer_name, address in key_rows)
+        self._changed("customers")
+
+    def _index_customer_regions(self, key_rows: Iterable[tuple[str, str]]):
+        region_by_name = {}
+        for customer_name, address in key_rows:
+            region_by_name.setdefault(customer_name, address_region(address))
+        self._customer_region_by_name = region_by_name
+
+    def _index_customer_names(self, key_rows: Iterable[tuple[str, str]]):
+        customer_keys = []
+        trigram_counts = array("I")
+        postings = {}
+        for i, (customer_id, customer_name) in enumerate(key_rows):
+            customer_keys.append((customer_id, customer_name))
+            trigrams = name_trigrams(customer_name)
+            trigram_counts.append(len(trigrams))
+            for trigram in trigrams:
+                postings.setdefault(trigram, []).append(i)
+        self._customer_trigrams = {trigram: array("I", positions) for trigram, positions in postings.items()}
+        self._customer_keys = customer_keys
+        self._customer_trigram_counts = trigram_counts
+
+    def _index_orders(self):
+        with self._order_index_lock:
+            records = self.orders
+            if isinstance(records, OrderVersion):
+                records = records.folded_records()
+            self._publish_orders(OrderVersion.build(records))
+
+    def _publish_orders(self, version: OrderVersion):
+        # Getters read _order_version; orders is kept in step for code that reads it directly.
+        self._order_version = version
+        self.orders = version
+        self._changed("orders")
+
+    def _index_inventory(self):
+        inventory_pos_by_product_id = {}
+        locations = []
+        for i, (product_id, location) in enumerate(iter_key_rows(self.inventory, *INDEX_KEYS["inventory"])):
+            inventory_pos_by_product_id.setdefault(product_id, []).append(i)
+            locations.append(location)
+        self._inventory_pos_by_product_id = inventory_pos_by_product_id
+        self._index_warehouses(locations)
+        self._changed("inventory")
+
+    def _index_warehouses(self, locations: Iterable[str]):
+        # Distinct inventory locations in first-seen order; rankings per region are rebuilt lazily.
+        self._warehouses = list(dict.fromkeys(locations))
+        self._warehouse_rankings = {}
+
+    @contextmanager
+    def lock_orders(self, order_ids: Iterable[str]):
+        """
+        Holds the write locks of the given orders. Orders hash onto ORDER_LOCK_STRIPES striped
+        locks that are taken in a fixed order, so writers to different orders rarely contend and
+        never deadlock. The locks are reentrant; readers never take them.
+        :param order_ids (Iterable[str]): The IDs of the orders to lock.
+        """
+        stripes = sorted({hash(order_id) % ORDER_LOCK_STRIPES for order_id in order_ids})
+        with ExitStack() as stack:
+            for stripe in stripes:
+                stack.enter_context(self._order_locks[stripe])
+            yield
+
+    @contextmanager
+    def lock_all_orders(self):
+        """
+        Holds every order write lock, pausing all order writers.
+        """
+        with ExitStack() as stack:
+            for lock in self._order_locks:
+                stack.enter_context(lock)
+            yield
+
+    def _changed(self, name: str):
+        # Called after the new data is in place, so a version never describes older data.
+        with self._version_lock:
+            self._versions[name] += 1
+
+    def collection_version(self, name: str) -> str:
+        """
+        Returns a token that changes whenever a collection is loaded or updated, e.g. for HTTP
+        ETags. Read it before the data it describes: the data may then be newer than the token,
+        but never older.
+        :param name (str): The collection: suppliers, customers, orders or inventory.
+        :return: The version token, distinct between DataLayers.
+        :rtype: str
+        """
+        return f"{self._version_token}-{self._versions[name]}"
+
+    def use_compact_records(self):
+        """
+        Stores orders and inventory as CompactRecords: columns with interned strings and shared
+        order items instead of one pydantic model per record. Records are materialized when they
+        are read, so lookups return the same models as before. Collections loaded afterwards
+        are streamed into the compact form directly.
+        """
+        self._compact = True
+        for name, model in (("orders", Order), ("inventory", ProductInventory)):
+            records = getattr(self, name)
+            stored = records.records if isinstance(records, OrderVersion) else records
+            if stored is not None and not isinstance(stored, CompactRecords):
+                setattr(self, name, CompactRecords.from_records(model, self.iter_collection(name)))
+                if name == "orders":
+                    self._index_orders()
 
-    def load_supplier_from_json(self, file_name: str):
+    def _stream_collection(self, file_name: str, key: str, model: type[BaseModel],
+                           progress: ProgressCallback = None, on_batch: Callable[[int, list], None] = None) -> list:
+        compact = self._compact and model.__name__ in COMPACT_LAYOUTS
+        items = CompactRecords(model) if compact else []
+        # Held so that a patch merge cannot replace the file between reading it and its patch.
+        with patch_lock(file_name):
+            patched, _ = read_patch(file_name)
+            for batch in stream_models_from_json(file_name, key, model, progress=progress, patched=patched):
+                if on_batch:
+                    on_batch(len(items), batch)
+                if compact:
+                    items.extend_records(batch)
+                else:
+                    items.extend(batch)
+        return items
+
+    def _mark_dirty(self, name: str, positions: Iterable[int]):
+        with self._dirty_lock:
+            self._dirty[name].update(positions)
+
+    def _save_collection(self, name: str, file_name: str, model: type[BaseModel], delta: bool) -> int:
+        with patch_lock(file_name):
+            with self._dirty_lock:
+                dirty, self._dirty[name] = self._dirty[name], set()
+            records = getattr(self, name)
+            try:
+                if delta:
+                    return append_patch(file_name, ((pos, records[pos].model_dump_json(exclude_none=True).encode())
+                                                    for pos in sorted(dirty)))
+                write_json_collection(file_name, name, model, records)
+                remove_patch(file_name)
+                return len(records)
+            except IOError as e:
+                self._mark_dirty(name, dirty)
+                raise ValueError(f"Error saving to file: {e}")
+
+    def load_supplier_from_json(self, file_name: str, progress: ProgressCallback = None):
         """
         Loads supplier data from a JSON file.
         :param file_name (str): The name of the file to load the data from.
+        :param progress (ProgressCallback): Optional callback reporting (records_loaded, bytes_read, total_bytes).
         """
         try:
-            with open(file_name, 'r') as f:
-                data = json.load(f)
-                self.suppliers = [Supplier(**supplier) for supplier in data["suppliers"]]
+            product_index = ProductSearchIndex()
+            def index_products(start: int, batch: list[Supplier]):
+                for pos, supplier in enumerate(batch, start):
+                    product_index.add_supplier(pos, supplier)
+            self.suppliers = self._stream_collection(file_name, "suppliers", Supplier, progress, index_products)
+            self._index_suppliers()
+            self._product_index = product_index
             print("Loaded suppliers:", len(self.suppliers))
         except IOError as e:
             raise ValueError(f"Error loading file: {e}")
         except json.JSONDecodeError as e:
             raise ValueError(f"Error decoding JSON: {e}")
         
-    def save_supplier_to_json(self, file_name: str):
+    def save_supplier_to_json(self, file_name: str, delta: bool = False) -> int:
         """
         Saves supplier data to a JSON file.
+        A delta save only appends the suppliers updated since the last save to the patch file next
+        to it (see delta_patches), which loading applies on top of the file.
         :param file_name (str): The name of the file to save the data to.
+        :param delta (bool): Whether to save only the updated suppliers. The file must be the one
+            the suppliers were loaded from or last saved to.
+        :return: The number of saved suppliers.
+        :rtype: int
         """
-        try:
-            print(self.suppliers)
-            with open(file_name, 'w') as f:
-                json.dump({"suppliers": [supplier.dict() for supplier in self.suppliers]}, f, indent=4)
-        except IOError as e:
-            raise ValueError(f"Error saving to file: {e}")
+        return self._save_collection("suppliers", file_name, Supplier, delta)
     
     def generate_customer_data(self) -> list[Customer]:
         """
@@ -123,26 +1017,28 @@ class DataLayer(BaseModel):
             ) for i in range(10)
         ]
 
-    def save_customer_to_json(self, file_name: str):
+    def save_customer_to_json(self, file_name: str, delta: bool = False) -> int:
         """
         Saves customer data to a JSON file.
+        A delta save only appends the customers updated since the last save to the patch file next
+        to it (see delta_patches), which loading applies on top of the file.
         :param file_name (str): The name of the file to save the data to.
+        :param delta (bool): Whether to save only the updated customers. The file must be the one
+            the customers were loaded from or last saved to.
+        :return: The number of saved customers.
+        :rtype: int
         """
-        try:
-            with open(file_name, 'w') as f:
-                json.dump({"customers": [customer.dict() for customer in self.customers]}, f, indent=4)
-        except IOError as e:
-            raise ValueError(f"Error saving to file: {e}")
+        return self._save_collection("customers", file_name, Customer, delta)
         
-    def load_customer_from_json(self, file_name: str):  
+    def load_customer_from_json(self, file_name: str, progress: ProgressCallback = None):  
         """
         Loads customer data from a JSON file.
         :param file_name (str): The name of the file to load the data from.
+        :param progress (ProgressCallback): Optional callback reporting (records_loaded, bytes_read, total_bytes).
         """
         try:
-            with open(file_name, 'r') as f:
-                data = json.load(f)
-                self.customers = [Customer(**customer) for customer in data["customers"]]
+            self.customers = self._stream_collection(file_name, "customers", Customer, progress)
+            self._index_customers()
             print("Loaded customers:", len(self.customers))
         except IOError as e:
             raise ValueError(f"Error loading file: {e}")
@@ -176,31 +1072,33 @@ class DataLayer(BaseModel):
             ) for i in range(10)
         ]
 
-    def load_order_from_json(self, file_name: str):
+    def load_order_from_json(self, file_name: str, progress: ProgressCallback = None):
         """
         Loads order data from a JSON file.
         :param file_name (str): The name of the file to load the data from.
+        :param progress (ProgressCallback): Optional callback reporting (records_loaded, bytes_read, total_bytes).
         """
         try:
-            with open(file_name, 'r') as f:
-                data = json.load(f)
-                self.orders = [Order(**order) for order in data["orders"]]
+            self.orders = self._stream_collection(file_name, "orders", Order, progress)
+            self._index_orders()
             print("Loaded orders:", len(self.orders))
         except IOError as e:
             raise ValueError(f"Error loading file: {e}")
         except json.JSONDecodeError as e:
             raise ValueError(f"Error decoding JSON: {e}")
     
-    def save_order_to_json(self, file_name: str):   
+    def save_order_to_json(self, file_name: str, delta: bool = False) -> int:
         """
         Saves order data to a JSON file.
+        A delta save only appends the orders updated since the last save to the patch file next
+        to it (see delta_patches), which loading applies on top of the file.
         :param file_name (str): The name of the file to save the data to.
+        :param delta (bool): Whether to save only the updated orders. The file must be the one
+            the orders were loaded from or last saved to.
+        :return: The number of saved orders.
+        :rtype: int
         """
-        try:
-            with open(file_name, 'w') as f:
-                json.dump({"orders": [order.dict() for order in self.orders]}, f, indent=4)
-        except IOError as e:
-            raise ValueError(f"Error saving to file: {e}")
+        return self._save_collection("orders", file_name, Order, delta)
 
     def generate_supplier_data(self) -> list[Supplier]:
         """
@@ -260,10 +1158,8 @@ class DataLayer(BaseModel):
         :return: The supplier object.
         :rtype: Supplier
         """
-        for supplier in self.suppliers:
-            if supplier.supplier_id == supplier_id:
-                return supplier
-        return None
+        pos = self._supplier_pos_by_id.get(supplier_id)
+        return None if pos is None else self.suppliers[pos]
     
     def get_customer_by_id(self, customer_id: str) -> Customer:
         """
@@ -273,24 +1169,116 @@ class DataLayer(BaseModel):
         :return: The customer object.
         :rtype: Customer
         """
-        for customer in self.customers:
-            if customer.customer_id == customer_id:
-                return customer
-        return None
+        pos = self._customer_pos_by_id.get(customer_id)
+        return None if pos is None else self.customers[pos]
     
     def get_customer_by_name(self, customer_name: str) -> Customer:
         """
-        Fetches a customer by its ID.
+        Fetches a customer by its name.
 
-        :param customer_id (str): The ID of the customer to fetch.
+        :param customer_name (str): The name of the customer to fetch.
         :return: The customer object.
         :rtype: Customer
         """
-        for customer in self.customers:
-            if customer.customer_name == customer_name:
-                return customer
-        return None
+        pos = self._customer_pos_by_name.get(customer_name)
+        return None if pos is None else self.customers[pos]
     
+    def search_customers_by_name(self, customer_name: str, top_k: int = 5, min_score: float = 0.3) -> list[CustomerMatch]:
+        """
+        Finds the customers whose names best match a possibly misspelled name, using the trigram index.
+        Candidates are gathered from the query's rarest trigrams first, at most
+        MAX_TRIGRAM_POSTINGS postings per query, and ranked by the Dice coefficient of their
+        trigram sets.
+
+        :param customer_name (str): The (approximate) name to search for.
+        :param top_k (int): The maximum number of matches to return.
+        :param min_score (float): The minimum similarity between 0 and 1 for a match.
+        :return: The best matches, highest score first.
+        :rtype: list[CustomerMatch]
+        """
+        query = name_trigrams(customer_name)
+        trigrams, customer_keys, trigram_counts = self._customer_trigrams, self._customer_keys, self._customer_trigram_counts
+        # Ties are broken by trigram, so that the lists that get cut do not depend on set order.
+        postings = [trigrams[t] for t in sorted((t for t in query if t in trigrams), key=lambda t: (len(trigrams[t]), t))]
+        # Lists are counted in full while they fit in the budget. The first one that does not, even
+        # the rarest, and all after it are counted up to the same position, which splits
+        # the rest of the budget among them: hit counts are exact before that position and cover
+        # the fully counted lists after it.
+        hits = Counter()
+        budget = MAX_TRIGRAM_POSTINGS
+        end = None
+        cut = []
+        for i, positions in enumerate(postings):
+            if end is None and len(positions) > budget:
+                share = budget // (len(postings) - i)
+                end = min(rest[share] for rest in postings[i:] if len(rest) > share)
+            stop = len(positions) if end is None else bisect_left(positions, end)
+            hits.update(positions[:stop])
+            budget -= stop
+            if stop < len(positions):
+                cut.append(positions)
+        candidates = heapq.nlargest(max(top_k, 1) * FUZZY_CANDIDATES_PER_RESULT, hits.items(), key=itemgetter(1))
+        # Bounded heap of the best (score, -rank) pairs; ties keep the candidate order.
+        best = []
+        for rank, (pos, shared) in enumerate(candidates):
+            size = len(query) + trigram_counts[pos]
+            if end is not None and pos >= end:
+                # Complete the count with the lists that were cut before this position, unless
+                # even a match in all of them would not make the results.
+                floor = best[0][0] if best and len(best) == top_k else min_score
+                if 2 * (shared + len(cut)) / size < floor:
+                    continue
+                shared += sum(1 for positions in cut if _contains(positions, pos))
+            score = 2 * shared / size
+            if score >= min_score:
+                heapq.heappush(best, (score, -rank, pos))
+                if len(best) > top_k:
+                    heapq.heappop(best)
+        return [CustomerMatch(customer_id=customer_keys[pos][0], customer_name=customer_keys[pos][1], score=round(score, 4))
+                for score, _, pos in sorted(best, reverse=True)]
+
+    def get_warehouses_by_distance(self, customer_name: str) -> list[WarehouseDistance]:
+        """
+        Ranks the inventory locations by distance from a customer, using the region derived from
+        the customer address at load time. Locations without known coordinates come last.
+
+        :param customer_name (str): The name of the customer.
+        :return: The inventory locations, closest first, or None if the customer is unknown.
+        :rtype: list[WarehouseDistance]
+        """
+        if customer_name not in self._customer_region_by_name:
+            return None
+        region = self._customer_region_by_name[customer_name]
+        rankings = self._warehouse_rankings
+        ranking = rankings.get(region)
+        if ranking is None:
+            origin = region_coordinates(region)
+            ranking = []
+            for location in self._warehouses:
+                target = WAREHOUSE_COORDINATES.get(location)
+                distance = round(distance_km(origin, target), 1) if origin and target else None
+                ranking.append(WarehouseDistance(location=location, distance_km=distance))
+            if origin is None:
+                # Unplaceable address: prefer the default warehouse, as the server always has.
+                ranking.sort(key=lambda warehouse: warehouse.location != DEFAULT_WAREHOUSE)
+            else:
+                ranking.sort(key=lambda warehouse: (warehouse.distance_km is None, warehouse.distance_km or 0.0))
+            rankings[region] = ranking
+        return ranking
+
+    def get_closest_inventory_location(self, customer_name: str) -> str:
+        """
+        Fetches the inventory location closest to a customer.
+
+        :param customer_name (str): The name of the customer.
+        :return: The closest inventory location, or None if the customer is unknown.
+        :rtype: str
+        """
+        ranking = self.get_warehouses_by_distance(customer_name)
+        if ranking is None:
+            return None
+        return ranking[0].location if ranking else DEFAULT_WAREHOUSE
+
     def get_order_by_id(self, order_id: str) -> Order:
         """
         Fetches an order by its ID.
@@ -299,11 +1287,19 @@ class DataLayer(BaseModel):
         :return: The order object.
         :rtype: Order
         """
-        for order in self.orders:
-            if order.order_id == order_id:
-                return order
-        return None
+        return self._order_version.get_order_by_id(order_id)
     
+    def get_orders_by_ids(self, order_ids: list[str]) -> list[Order]:
+        """
+        Fetches several orders by ID at once, all from the same version of the orders.
+
+        :param order_ids (list[str]): The IDs of the orders to fetch.
+        :return: The orders in the order of the IDs, with None for unknown IDs.
+        :rtype: list[Order]
+        """
+        version = self._order_version
+        return [version.get_order_by_id(order_id) for order_id in order_ids]
+
     def get_orders_by_customer_id(self, customer_id: str) -> list[Order]:
         """
         Fetches all orders for a given customer ID.
@@ -312,32 +1308,236 @@ class DataLayer(BaseModel):
         :return: List of order objects.
         :rtype: list[Order]
         """
-        return [order for order in self.orders if order.customer_id == customer_id]
+        return self._order_version.get_orders_by_customer_id(customer_id)
 
     def get_all_products(self) -> list[Product]:
         """
         Fetches all products from all suppliers.
+        The list is shared between calls and must not be modified.
 
         :return: List of product objects.
         :rtype: list[Product]
         """
-        products = []
-        for supplier in self.suppliers:
-            products.extend(supplier.products)
-        return products
+        return self._catalog("products", Product)[0]
+
+    def get_all_products_json(self) -> str:
+        """
+        Fetches all products from all suppliers, pre-serialized as a JSON array.
+
+        :return: JSON array of products.
+        :rtype: str
+        """
+        return self._catalog("products", Product)[2]
 
     def get_all_discounts(self) -> list[Discount]:
         """
         Fetches all discounts from all suppliers.
+        The list is shared between calls and must not be modified.
 
         :return: List of discount objects.
         :rtype: list[Discount]
         """
-        discounts = []
-        for supplier in self.suppliers:
-            discounts.extend(supplier.discounts)
-        return discounts
+        return self._catalog("discounts", Discount)[0]
+
+    def get_all_discounts_json(self) -> str:
+        """
+        Fetches all discounts from all suppliers, pre-serialized as a JSON array.
+
+        :return: JSON array of discounts.
+        :rtype: str
+        """
+        return self._catalog("discounts", Discount)[2]
+
+    def search_products(self, query: str, top_k: int = 10) -> list[ProductMatch]:
+        """
+        Searches product names, descriptions and features with the full-text index.
+        Results are ranked with BM25, weighting matches in the name above features and description.
+
+        :param query (str): The search text.
+        :param top_k (int): The maximum number of results, capped at MAX_SEARCH_RESULTS.
+        :return: The best matching products, highest score first.
+        :rtype: list[ProductMatch]
+        """
+        top_k = max(1, min(top_k, MAX_SEARCH_RESULTS))
+        return [ProductMatch(product=product, supplier_id=supplier_id, score=round(score, 4))
+                for product, supplier_id, score in self._search_index().search(query, top_k)]
+
+    def warm_up(self):
+        """
+        Builds the indexes that are otherwise built on first use, e.g. before a reloaded
+        DataLayer is swapped in.
+        """
+        self._search_index()
+        self._discounts()
+
+    def _search_index(self) -> ProductSearchIndex:
+        product_index = self._product_index
+        if product_index is None:
+            with self._product_index_lock:
+                product_index = self._product_index
+                if product_index is None:
+                    product_index = ProductSearchIndex()
+                    for pos, supplier in enumerate(self._iter_suppliers()):
+                        product_index.add_supplier(pos, supplier)
+                    self._product_index = product_index
+        return product_index
+
+    def _reindex_supplier_products(self, pos: int, supplier: Supplier):
+        # Keeps an existing search index current; a missing one is built from scratch on demand.
+        with self._product_index_lock:
+            if self._product_index is not None:
+                self._product_index.add_supplier(pos, supplier)
+
+    def invalidate_catalog(self):
+        """
+        Drops the materialized product and discount catalog so that it is rebuilt on next access.
+        Called whenever supplier data is reloaded or updated.
+        """
+        self._catalog_generation += 1
+        self._catalog_cache = {}
+        self.invalidate_discounts()
+
+    def invalidate_discounts(self):
+        """
+        Drops the precomputed discount table so that it is rebuilt on next use.
+        Called whenever supplier or customer data is reloaded or updated.
+        """
+        self._discount_generation += 1
+        self._discount_resolver = None
+
+    def _discounts(self) -> DiscountResolver:
+        resolver = self._discount_resolver
+        if resolver is None:
+            with self._discount_resolver_lock:
+                resolver = self._discount_resolver
+                if resolver is None:
+                    generation = self._discount_generation
+                    resolver = DiscountResolver(self._iter_suppliers(), self.iter_collection("customers"))
+                    # Do not publish a table built from data that was replaced in the meantime.
+                    if generation == self._discount_generation:
+                        self._discount_resolver = resolver
+        return resolver
+
+    def resolve_discount(self, customer_id: str, product_id: str, quantity: int = 1) -> ResolvedDiscount:
+        """
+        Finds the best discount a customer gets when ordering a quantity of a product, from the
+        supplier discounts and the customer's own discounts. A discount applies once the
+        quantity reaches its discount_volume.
+
+        :param customer_id (str): The ID of the customer.
+        :param product_id (str): The ID of the product.
+        :param quantity (int): The ordered quantity.
+        :return: The best discount and unit price, and the next better discount at a higher volume.
+        :rtype: ResolvedDiscount
+        """
+        if quantity < 1:
+            raise ValueError("Quantity must be at least 1")
+        resolver = self._discounts()
+        list_price = resolver.list_price(product_id)
+        offer, next_offer = resolver.resolve(customer_id, product_id, quantity)
+        resolved = ResolvedDiscount(customer_id=customer_id, product_id=product_id, quantity=quantity,
+                                    list_price=list_price, unit_price=list_price)
+        if offer is not None:
+            _, resolved.unit_price, resolved.discount_id, resolved.discount_name, resolved.discount_source = offer
+        if next_offer is not None:
+            resolved.next_discount_volume, resolved.next_discount_price = next_offer[0], next_offer[1]
+        return resolved
+
+    def resolve_order_discounts(self, order_id: str) -> list[ResolvedDiscount]:
+        """
+        Finds the best discount for every product of an order, counting one unit per order item.
+
+        :param order_id (str): The ID of the order.
+        :return: One result per product of the order, or None if the order does not exist.
+        :rtype: list[ResolvedDiscount]
+        """
+        order = self.get_order_by_id(order_id)
+        if order is None:
+            return None
+        quantities = Counter(item.product_id for item in order.order_items or [])
+        return [self.resolve_discount(order.customer_id, product_id, quantity) for product_id, quantity in quantities.items()]
+
+    def _iter_suppliers(self) -> Iterator[Supplier]:
+        return self.iter_collection("suppliers")
+
+    def iter_collection(self, name: str) -> Iterator[BaseModel]:
+        """
+        Iterates over the records of a collection in list order.
+
+        :param name (str): The collection: suppliers, customers, orders or inventory.
+        :return: An iterator over the records.
+        :rtype: Iterator[BaseModel]
+        """
+        records = getattr(self, name) or []
+        # Snapshot-backed collections can be scanned without materializing every record for good.
+        iter_uncached = getattr(records, "iter_uncached", None)
+        return iter_uncached() if iter_uncached is not None else iter(records)
+
+    def _catalog(self, attr: str, model: type[BaseModel]) -> tuple[list, bytes, str]:
+        cached = self._catalog_cache.get(attr)
+        if cached is None:
+            generation = self._catalog_generation
+            items = []
+            for supplier in self._iter_suppliers():
+                items.extend(getattr(supplier, attr) or [])
+            data = _list_adapter(model).dump_json(items)
+            cached = (items, data, data.decode())
+            # Do not publish a view built from suppliers that were replaced in the meantime.
+            if generation == self._catalog_generation:
+                self._catalog_cache[attr] = cached
+        return cached
+
+    def _catalog_page(self, attr: str, model: type[BaseModel], cursor: str, limit: int, fields: list[str]) -> Page:
+        start = decode_cursor(attr, cursor)
+        limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+        include = _projection(model, fields)
+        catalog = self._catalog(attr, model)[0]
+        items = [entry.model_dump(include=include) for entry in catalog[start:start + limit]]
+        end = start + len(items)
+        return Page(items=items, next_cursor=encode_cursor(attr, end) if end < len(catalog) else None, total=len(catalog))
+
+    def get_products_page(self, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, fields: list[str] = None) -> Page:
+        """
+        Fetches one page of products from all suppliers.
+
+        :param cursor (str): The next_cursor of the previous page, or None for the first page.
+        :param limit (int): The page size, capped at MAX_PAGE_SIZE.
+        :param fields (list[str]): Optional Product fields to include in each item.
+        :return: The page of products and the cursor of the following page.
+        :rtype: Page
+        """
+        return self._catalog_page("products", Product, cursor, limit, fields)
+
+    def get_discounts_page(self, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, fields: list[str] = None) -> Page:
+        """
+        Fetches one page of discounts from all suppliers.
+
+        :param cursor (str): The next_cursor of the previous page, or None for the first page.
+        :param limit (int): The page size, capped at MAX_PAGE_SIZE.
+        :param fields (list[str]): Optional Discount fields to include in each item.
+        :return: The page of discounts and the cursor of the following page.
+        :rtype: Page
+        """
+        return self._catalog_page("discounts", Discount, cursor, limit, fields)
     
+    def update_supplier(self, supplier_id: str, supplier_data: Supplier) -> bool:
+        """
+        Updates an existing supplier with new data.
+
+        :param supplier_id (str): The ID of the supplier to update.
+        :param supplier_data (Supplier): The new supplier data.
+        :return: True if the supplier was updated successfully, False otherwise.
+        :rtype: bool
+        """
+        pos = self._supplier_pos_by_id.get(supplier_id)
+        if pos is None:
+            return False
+        self.suppliers[pos] = supplier_data
+        self._mark_dirty("suppliers", (pos,))
+        self._index_suppliers()
+        self._reindex_supplier_products(pos, supplier_data)
+        return True
+
     def update_order(self, order_id: str, order_data: Order) -> bool:
         """
         Updates an existing order with new data.
@@ -347,21 +1547,180 @@ class DataLayer(BaseModel):
         :return: True if the order was updated successfully, False otherwise.
         :rtype: bool
         """
-        for i, order in enumerate(self.orders):
-            if order.order_id == order_id:
-                self.orders[i] = order_data
-                return True
-        return False
+        with self.lock_orders((order_id, order_data.order_id)):
+            if not self._replace_orders([(order_id, order_data)]):
+                return False
+            self._publish_order_change(order_id, order_data)
+            return True
+
+    def _replace_orders(self, replacements: list[tuple[str, Order]]) -> bool:
+        # Publishes the version with the orders of the given IDs replaced. The caller holds their
+        # write locks. The version is built without _order_index_lock, which is only held to
+        # publish it if no other writer published meanwhile (compare-and-set); otherwise it is
+        # rebuilt on top of the newer version. Writers of different orders thus only serialize
+        # on the publish itself.
+        while True:
+            version = self._order_version
+            positions = [version.position(order_id) for order_id, _ in replacements]
+            if None in positions:
+                return False
+            new_version = version.with_orders([(pos, order) for pos, (_, order) in zip(positions, replacements)])
+            with self._order_index_lock:
+                if self._order_version is version:
+                    self._publish_orders(new_version)
+                    self._mark_dirty("orders", positions)
+                    return True
+
+    def find_orders(self, status: str = None, date_from: str = None, date_to: str = None, date_field: str = "order_date",
+                    cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, fields: list[str] = None) -> Page:
+        """
+        Fetches one page of the orders in a status and/or with a date in a range, using the
+        status and date indexes instead of scanning all orders.
+
+        :param status (str): Optional order status to match exactly, e.g. "Pending".
+        :param date_from (str): Optional first date of the range (YYYY-MM-DD), inclusive.
+        :param date_to (str): Optional last date of the range (YYYY-MM-DD), inclusive.
+        :param date_field (str): The date the range applies to: order_date or fill_date.
+        :param cursor (str): The next_cursor of the previous page, or None for the first page.
+        :param limit (int): The page size, capped at MAX_PAGE_SIZE.
+        :param fields (list[str]): Optional Order fields to include in each item.
+        :return: The page of orders, oldest first when a date range is given and in stored
+            order otherwise, and the cursor of the following page.
+        :rtype: Page
+        """
+        if date_field not in ORDER_DATE_FIELDS:
+            raise ValueError(f"Unknown date field: {date_field}")
+        start = decode_cursor("orders", cursor)
+        limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+        include = _projection(Order, fields)
+        # One version for the count and the page, so they agree even while orders are updated.
+        version = self._order_version
+        positions = version.find_positions(status, date_from, date_to, date_field)
+        items = [version[pos].model_dump(include=include) for pos in positions[start:start + limit]]
+        end = start + len(items)
+        return Page(items=items, next_cursor=encode_cursor("orders", end) if end < len(positions) else None, total=len(positions))
+
+    def get_order_status_counts(self) -> dict[str, int]:
+        """
+        Counts the orders per status.
+
+        :return: Order status -> number of orders.
+        :rtype: dict[str, int]
+        """
+        return self._order_version.status_counts()
+
+    def validate_order_updates(self, updates: list[OrderUpdate]) -> list[OrderUpdateResult]:
+        """
+        Checks a batch of order updates in a single pass without applying it.
+        An update fails if its order does not exist or if the batch updates the same order twice.
+
+        :param updates (list[OrderUpdate]): The order updates to check.
+        :return: One result per update, in the same order.
+        :rtype: list[OrderUpdateResult]
+        """
+        version = self._order_version
+        results = []
+        seen = set()
+        for update in updates:
+            if update.order_id in seen:
+                results.append(OrderUpdateResult(order_id=update.order_id, success=False, error="Duplicate order in batch"))
+            elif version.position(update.order_id) is None:
+                results.append(OrderUpdateResult(order_id=update.order_id, success=False, error="Order not found"))
+            else:
+                results.append(OrderUpdateResult(order_id=update.order_id, success=True))
+            seen.add(update.order_id)
+        return results
+
+    def update_orders(self, updates: list[OrderUpdate]) -> list[OrderUpdateResult]:
+        """
+        Updates a batch of existing orders atomically: either every update is applied or none is,
+        and readers see the orders of the batch either all before or all after the update.
+
+        :param updates (list[OrderUpdate]): The order updates to apply.
+        :return: One result per update. If any update fails validation, the others are reported
+            as not applied.
+        :rtype: list[OrderUpdateResult]
+        """
+        order_ids = [update.order_id for update in updates] + [update.order.order_id for update in updates]
+        with self.lock_orders(order_ids):
+            results = self.validate_order_updates(updates)
+            if not all(result.success for result in results):
+                for result in results:
+                    if result.success:
+                        result.success = False
+                        result.error = "Not applied: batch rejected"
+                return results
+            # Published as one version, so readers see either none or all of the batch.
+            if not self._replace_orders([(update.order_id, update.order) for update in updates]):
+                for result in results:
+                    result.success = False
+                    result.error = "Not applied: orders were reloaded"
+                return results
+            for update in updates:
+                self._publish_order_change(update.order_id, update.order)
+            return results
+
+    def add_order_listener(self, listener: Callable[[OrderChange], None]):
+        """
+        Registers a listener that is called with an OrderChange for every applied order update.
+        Listeners run on the writer's thread while it holds the order's write lock, so they see
+        the changes of each order in order and must return quickly.
+        :param listener (Callable[[OrderChange], None]): The listener to register.
+        """
+        # Copy-on-write, so publishing never iterates a list that is being modified.
+        self._order_listeners = self._order_listeners + [listener]
+
+    def remove_order_listener(self, listener: Callable[[OrderChange], None]):
+        """
+        Unregisters a listener added with add_order_listener.
+        """
+        self._order_listeners = [registered for registered in self._order_listeners if registered is not listener]
+
+    def adopt_order_feed(self, previous: "DataLayer"):
+        """
+        Takes over the order change feed of the DataLayer this one replaces: its listeners, its
+        recent changes and its sequence numbers, so subscribers carry on across a reload.
+        :param previous (DataLayer): The data layer being replaced.
+        """
+        with previous._order_change_lock, self._order_change_lock:
+            self._order_change_sequence = previous._order_change_sequence
+            self._order_changes = deque(previous._order_changes, maxlen=ORDER_CHANGE_HISTORY)
+            self._order_listeners = previous._order_listeners
+            previous._order_listeners = []
+
+    def get_order_changes(self, since: int = 0) -> list[OrderChange]:
+        """
+        Fetches the recent order changes after a sequence number, oldest first.
+        Only the last ORDER_CHANGE_HISTORY changes are kept.
 
-    def load_inventory_from_json(self, file_name: str):
+        :param since (int): The sequence number of the last change already seen.
+        :return: The changes with a higher sequence number.
+        :rtype: list[OrderChange]
+        """
+        with self._order_change_lock:
+            return [change for change in self._order_changes if change.sequence > since]
+
+    def _publish_order_change(self, order_id: str, order_data: Order):
+        with self._order_change_lock:
+            self._order_change_sequence += 1
+            change = OrderChange(sequence=self._order_change_sequence, order_id=order_id,
+                                 new_order_id=order_data.order_id, order_status=order_data.order_status)
+            self._order_changes.append(change)
+        for listener in self._order_listeners:
+            try:
+                listener(change)
+            except Exception as e:
+                print(f"Error in order listener: {e}")
+
+    def load_inventory_from_json(self, file_name: str, progress: ProgressCallback = None):
         """
         Loads inventory data from a JSON file.
         :param file_name (str): The name of the file to load the data from.
+        :param progress (ProgressCallback): Optional callback reporting (records_loaded, bytes_read, total_bytes).
         """
         try:
-            with open(file_name, 'r') as f:
-                data = json.load(f)
-                self.inventory = [ProductInventory(**product) for product in data["inventory"]]
+            self.inventory = self._stream_collection(file_name, "inventory", ProductInventory, progress)
+            self._index_inventory()
             print("Loaded inventory:", len(self.inventory))            
         except IOError as e:
             raise ValueError(f"Error loading file: {e}")
@@ -379,9 +1738,32 @@ class DataLayer(BaseModel):
         :return: The inventory object.
         :rtype: ProductInventory
         """
-        inventory = []
-        for item in self.inventory:
-            if item.product_id == product_id:
-                inventory.append(item)
-        return inventory
+        return [self.inventory[pos] for pos in self._inventory_pos_by_product_id.get(product_id, [])]
+
+    def get_inventory_rows_by_product_id(self, product_id: str) -> list[tuple[int, ProductInventory]]:
+        """
+        Fetches all inventory items for a given product ID with their positions. A location can
+        hold several items of the same product; the position identifies one of them.
+
+        :param product_id (str): The ID of the product to fetch inventory for.
+        :return: (position, inventory item) pairs in stored order.
+        :rtype: list[tuple[int, ProductInventory]]
+        """
+        return [(pos, self.inventory[pos]) for pos in self._inventory_pos_by_product_id.get(product_id, [])]
+
+    def set_inventory_volume(self, position: int, volume: int) -> bool:
+        """
+        Sets the stock of one inventory item. Callers that read the volume first must
+        serialize writes per product themselves (see InventoryReservations).
+
+        :param position (int): The position of the inventory item, see get_inventory_rows_by_product_id.
+        :param volume (int): The new volume.
+        :return: True if the inventory item was updated, False if it does not exist.
+        :rtype: bool
+        """
+        if not 0 <= position < len(self.inventory or []):
+            return False
+        self.inventory[position] = self.inventory[position].model_copy(update={"volume": volume})
+        self._changed("inventory")
+        return True
 
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+from typing import Iterable
+
+# A delta save of `file.json` appends to `file.json.patch`.
+PATCH_SUFFIX = ".patch"
+
+# Patch layout, one JSON object per line:
+#   {"base":[size,mtime_ns]}          the stats of the base file the positions refer to
+#   {"pos":N,"record":{...}}          the record at list position N; later lines win
+# A patch whose base stats no longer match its base file is stale and ignored, e.g. after the
+# base was rewritten by a full save. A torn trailing line left by a crash is ignored as well.
+
+_locks: dict[str, threading.RLock] = {}
+_locks_lock = threading.Lock()
+
+def patch_path(file_name: str) -> str:
+    return file_name + PATCH_SUFFIX
+
+def patch_lock(file_name: str) -> threading.RLock:
+    """
+    Returns the lock serializing saves, patch appends, merges and loads of a base file, shared
+    by every DataLayer in the process so that it holds across reloads.
+    :param file_name (str): The base file name.
+    :return: The lock of the base file.
+    :rtype: threading.RLock
+    """
+    key = os.path.realpath(file_name)
+    with _locks_lock:
+        return _locks.setdefault(key, threading.RLock())
+
+def base_stats(file_name: str) -> list[int]:
+    st = os.stat(file_name)
+    return [st.st_size, st.st_mtime_ns]
+
+def _header(file_name: str) -> bytes:
+    return json.dumps({"base": base_stats(file_name)}, separators=(",", ":")).encode() + b"\n"
+
+def _read_lines(file_name: str) -> list[bytes]:
+    # The complete lines of a current patch, header first, or [] if there is none.
+    try:
+        with open(patch_path(file_name), 'rb') as f:
+            header = f.readline()
+            if not header.endswith(b"\n") or header != _header(file_name):
+                return []
+            lines = [header]
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                lines.append(line)
+            return lines
+    except FileNotFoundError:
+        return []
+
+def patch_stats(file_name: str) -> list[int]:
+    """
+    Returns the size and modification time of the patch of a base file, or [] if it has none.
+    """
+    try:
+        st = os.stat(patch_path(file_name))
+    except FileNotFoundError:
+        return []
+    return [st.st_size, st.st_mtime_ns]
+
+def patch_size(file_name: str) -> int:
+    stats = patch_stats(file_name)
+    return stats[0] if stats else 0
+
+def read_patch(file_name: str) -> tuple[dict[int, dict], int]:
+    """
+    Reads the records of the current patch of a base file. The caller holds patch_lock.
+    :param file_name (str): The base file name.
+    :return: List position -> latest patched record, empty if the patch is missing or stale,
+        and the number of patch lines read, header included.
+    :rtype: tuple[dict[int, dict], int]
+    """
+    lines = _read_lines(file_name)
+    records = {}
+    for i, line in enumerate(lines[1:], 1):
+        try:
+            entry = json.loads(line)
+            pos, record = entry["pos"], entry["record"]
+        except (ValueError, KeyError, TypeError):
+            return records, i
+        records[pos] = record
+    return records, len(lines)
+
+def append_patch(file_name: str, entries: Iterable[tuple[int, bytes]]) -> int:
+    """
+    Appends records to the patch of a base file and fsyncs it. A missing or stale patch is
+    started over. The caller holds patch_lock.
+    :param file_name (str): The base file name.
+    :param entries (Iterable[tuple[int, bytes]]): (list position, serialized record) pairs.
+    :return: The number of appended records.
+    :rtype: int
+    """
+    lines = [b'{"pos":%d,"record":%s}\n' % (pos, data) for pos, data in entries]
+    if not lines:
+        return 0
+    current = _read_lines(file_name)
+    with open(patch_path(file_name), 'ab' if current else 'wb') as f:
+        if current:
+            # Drop a torn trailing line before appending after it.
+            f.truncate(sum(len(line) for line in current))
+        else:
+            f.write(_header(file_name))
+        f.write(b"".join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+    return len(lines)
+
+def remove_patch(file_name: str):
+    """
+    Deletes the patch of a base file, e.g. after the base was rewritten in full.
+    """
+    try:
+        os.remove(patch_path(file_name))
+    except FileNotFoundError:
+        pass
+
+def replace_base(file_name: str, new_base: str, merged_stats: list[int], since: int) -> bool:
+    """
+    Atomically replaces a base file with a merged version of it and keeps only the patch lines
+    appended after the merge started. The caller holds patch_lock.
+    :param file_name (str): The base file name.
+    :param new_base (str): The merged file that replaces the base.
+    :param merged_stats (list[int]): The stats of the base file new_base was merged from.
+    :param since (int): The number of patch lines, header included, folded into new_base.
+    :return: True if the base was replaced, False if it changed since the merge started.
+    :rtype: bool
+    """
+    if base_stats(file_name) != merged_stats:
+        os.remove(new_base)
+        return False
+    tail = _read_lines(file_name)[since:]
+    os.replace(new_base, file_name)
+    if not tail:
+        remove_patch(file_name)
+        return True
+    tmp_path = patch_path(file_name) + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_header(file_name))
+        f.write(b"".join(tail))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, patch_path(file_name))
+    return True
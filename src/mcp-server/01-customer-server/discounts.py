@@ -0,0 +1,74 @@
+from bisect import bisect_right
+from typing import Iterable
+
+# (discount_volume, discount_price, discount_id, discount_name, source)
+Offer = tuple[int, float, str, str, str]
+
+# Price tiers of one product for one customer: the ascending volumes at which the best price
+# improves, and the offer that gives it.
+Tiers = tuple[list[int], list[Offer]]
+
+def _tiers(offers: Iterable[Offer], list_price: float | None) -> Tiers:
+    # Keeps only the offers that beat every offer with a lower or equal volume, so a lookup is a
+    # single binary search. At equal volume and price, customer discounts win over supplier ones.
+    volumes, best = [], []
+    for offer in sorted(offers, key=lambda offer: (offer[0], offer[1], offer[4] != "customer")):
+        if list_price is not None and offer[1] >= list_price:
+            continue
+        if best and offer[1] >= best[-1][1]:
+            continue
+        volumes.append(offer[0])
+        best.append(offer)
+    return volumes, best
+
+class DiscountResolver:
+    """
+    Precomputed best applicable discount per (customer, product) and order quantity.
+
+    Supplier discounts apply to every customer, customer discounts to their customer only, and a
+    discount applies once the ordered quantity reaches its discount_volume. For every product
+    with supplier discounts, and for every (customer, product) pair with customer discounts, the
+    offers are reduced to price tiers at build time, so resolving a discount is a dict lookup and
+    a binary search.
+    """
+
+    def __init__(self, suppliers: Iterable, customers: Iterable):
+        self._list_prices: dict[str, float] = {}
+        supplier_offers: dict[str, list[Offer]] = {}
+        for supplier in suppliers:
+            for product in supplier.products or []:
+                self._list_prices.setdefault(product.product_id, product.list_price)
+            for discount in supplier.discounts or []:
+                supplier_offers.setdefault(discount.product_id, []).append(
+                    (discount.discount_volume, discount.discount_price, discount.discount_id, discount.discount_name, "supplier"))
+        self._product_tiers: dict[str, Tiers] = {
+            product_id: _tiers(offers, self._list_prices.get(product_id)) for product_id, offers in supplier_offers.items()}
+        self._customer_tiers: dict[tuple[str, str], Tiers] = {}
+        for customer in customers:
+            customer_offers: dict[str, list[Offer]] = {}
+            for discount in customer.customer_discount or []:
+                customer_offers.setdefault(discount.product_id, []).append(
+                    (discount.discount_volume, discount.discount_price, discount.discount_id, discount.discount_name, "customer"))
+            for product_id, offers in customer_offers.items():
+                offers.extend(supplier_offers.get(product_id, []))
+                self._customer_tiers[(customer.customer_id, product_id)] = _tiers(offers, self._list_prices.get(product_id))
+
+    def __len__(self) -> int:
+        return len(self._product_tiers) + len(self._customer_tiers)
+
+    def list_price(self, product_id: str) -> float | None:
+        return self._list_prices.get(product_id)
+
+    def resolve(self, customer_id: str, product_id: str, quantity: int) -> tuple[Offer | None, Offer | None]:
+        """
+        Finds the best discount for a customer ordering a quantity of a product.
+        :return: The best applicable offer, or None, and the next better offer at a higher
+            volume, or None.
+        :rtype: tuple[Offer, Offer]
+        """
+        tiers = self._customer_tiers.get((customer_id, product_id)) or self._product_tiers.get(product_id)
+        if tiers is None:
+            return None, None
+        volumes, offers = tiers
+        i = bisect_right(volumes, quantity)
+        return (offers[i - 1] if i else None), (offers[i] if i < len(offers) else None)
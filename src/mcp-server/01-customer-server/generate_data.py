@@ -0,0 +1,267 @@
+import argparse
+import json
+import os
+from datetime import date, timedelta
+
+import numpy as np
+
+from regions import US_STATE_COORDINATES, WAREHOUSE_COORDINATES
+
+# Records are generated and written in chunks of this size. It is fixed so that a seed always
+# produces byte-identical files.
+CHUNK_SIZE = 50_000
+
+FIRST_NAMES = ["Alice", "Bob", "Carla", "David", "Emma", "Felix", "Grace", "Hannah", "Ivan", "Julia",
+               "Karl", "Lena", "Marco", "Nina", "Oliver", "Paula", "Quentin", "Rosa", "Stefan", "Tara",
+               "Uwe", "Vera", "Walter", "Xenia", "Yusuf", "Zoe"]
+LAST_NAMES = ["Johnson", "Smith", "Schmidt", "Müller", "Garcia", "Brown", "Rossi", "Dubois", "Novak",
+              "Jensen", "Kowalski", "Silva", "Meyer", "Wilson", "Fischer", "Moreau", "Lopez", "Weber"]
+STREETS = ["Maple Street", "Main Street", "BerlinSt", "Oak Avenue", "Hauptstraße", "Station Road",
+           "Market Square", "Lake Drive", "Church Lane", "Park Avenue"]
+CITIES_BY_REGION = {
+    "US": ["Springfield", "Franklin", "Greenville", "Madison", "Clinton", "Salem"],
+    "EU": ["Munich", "Paris", "Amsterdam", "Vienna", "Milan", "Madrid", "Dublin", "Warsaw"],
+}
+# The country of each EU city, so that addresses name the country the city is in.
+COUNTRY_BY_CITY = {
+    "Munich": "Germany", "Paris": "France", "Amsterdam": "Netherlands", "Vienna": "Austria",
+    "Milan": "Italy", "Madrid": "Spain", "Dublin": "Ireland", "Warsaw": "Poland",
+}
+PRODUCT_TYPES = [
+    ("Shampoo", "Nourishing shampoo for soft and smooth hair.", ["Moisturizing formula", "Paraben-free"]),
+    ("Bar Soap", "Gentle cleansing soap for sensitive skin.", ["1/4 moisturizing cream", "Dermatologist recommended"]),
+    ("Toothpaste", "Fresh breath and whitening toothpaste.", ["Mint flavor", "Fluoride protection"]),
+    ("Mayonnaise", "Creamy mayonnaise made with real eggs.", ["Gluten-free", "No artificial flavors"]),
+    ("Bouillon Cubes", "Flavorful bouillon cubes for soups and stews.", ["Low sodium", "Vegetarian"]),
+    ("Laundry Detergent", "Powerful stain removal for everyday laundry.", ["Concentrated", "Color safe"]),
+    ("Dish Soap", "Cuts through grease on dishes and pans.", ["Lemon scent", "Biodegradable"]),
+    ("Deodorant", "Long-lasting protection against odor.", ["48h protection", "Aluminium-free"]),
+    ("Ice Cream", "Creamy ice cream in classic flavors.", ["Real vanilla", "Family size"]),
+    ("Tea", "Refreshing black tea blend.", ["Rainforest Alliance", "100 bags"]),
+]
+BRANDS = ["Dove", "Close-Up", "Hellmann's", "Knorr", "Persil", "Sunlight", "Rexona", "Ben & Jerry's",
+          "Lipton", "Axe", "Signal", "Omo"]
+SIZES = ["Travel", "Small", "Regular", "Large", "Family", "Bulk"]
+ORDER_STATUSES = np.array(["Pending", "Processing", "Shipped", "Delivered", "Cancelled"])
+ORDER_STATUS_WEIGHTS = np.array([0.15, 0.10, 0.20, 0.50, 0.05])
+FILL_STRATEGIES = np.array(["Standard", "Express", "Split", "Backorder"])
+FILL_STRATEGY_WEIGHTS = np.array([0.70, 0.15, 0.10, 0.05])
+
+def zipf_weights(n: int, exponent: float) -> np.ndarray:
+    """
+    Returns normalized Zipf weights 1 / rank^exponent for ranks 1..n.
+    """
+    weights = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** exponent
+    return weights / weights.sum()
+
+def _chunks(total: int):
+    for start in range(0, total, CHUNK_SIZE):
+        yield start, min(start + CHUNK_SIZE, total)
+
+def _write_collection(output_dir: str, key: str, total: int, make_chunk):
+    # Streams {"key": [...]} to disk one chunk at a time; make_chunk(start, stop) returns dicts.
+    path = os.path.join(output_dir, f"{key}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'{{"{key}": [')
+        for start, stop in _chunks(total):
+            if start:
+                f.write(",")
+            f.write(json.dumps(make_chunk(start, stop), ensure_ascii=False)[1:-1])
+            print(f"Generated {key}: {stop}/{total}")
+        f.write("]}\n")
+
+def _rng(seed: int, stream: str, chunk: int = 0) -> np.random.Generator:
+    # Independent, reproducible streams per collection and chunk.
+    return np.random.default_rng([seed, sum(map(ord, stream)), chunk])
+
+def build_products(seed: int, suppliers: int, products_per_supplier: int) -> list[dict]:
+    """
+    Builds the product catalog: products_per_supplier products for each supplier, PROD0 upwards.
+    """
+    rng = _rng(seed, "products")
+    total = suppliers * products_per_supplier
+    types = rng.integers(0, len(PRODUCT_TYPES), total)
+    brands = rng.integers(0, len(BRANDS), total)
+    sizes = rng.integers(0, len(SIZES), total)
+    prices = np.round(rng.lognormal(1.3, 0.6, total), 2) + 0.49
+    products = []
+    for i in range(total):
+        name, description, features = PRODUCT_TYPES[types[i]]
+        products.append({
+            "product_id": f"PROD{i}",
+            "product_name": f"{BRANDS[brands[i]]} {name} {SIZES[sizes[i]]}",
+            "list_price": float(prices[i]),
+            "description": description,
+            "features": features,
+        })
+    return products
+
+def build_discounts(seed: int, products: list[dict], discount_share: float) -> list[dict]:
+    """
+    Builds volume discounts for a random share of the products, DISCOUNT0 upwards.
+    """
+    rng = _rng(seed, "discounts")
+    selected = np.flatnonzero(rng.random(len(products)) < discount_share)
+    rates = rng.uniform(0.05, 0.30, len(selected))
+    volumes = rng.choice([2, 5, 10, 25, 50, 100], len(selected))
+    discounts = []
+    for n, (i, rate, volume) in enumerate(zip(selected, rates, volumes)):
+        product = products[i]
+        discounts.append({
+            "discount_id": f"DISCOUNT{n}",
+            "discount_name": f"{product['product_name']} Bulk Discount",
+            "discount_price": round(product["list_price"] * (1 - float(rate)), 2),
+            "product_id": product["product_id"],
+            "discount_volume": int(volume),
+        })
+    return discounts
+
+def generate_dataset(output_dir: str, customers: int, orders: int, suppliers: int,
+                     products_per_supplier: int = 50, seed: int = 42, customer_skew: float = 1.1,
+                     product_skew: float = 1.2, discount_share: float = 0.3):
+    """
+    Generates a reproducible customer-domain dataset and streams it to orders.json,
+    customers.json, suppliers.json and inventory.json in output_dir.
+
+    Orders are assigned to customers with Zipf weights, so a few heavy-hitter customers place
+    most orders, and order items follow a Zipfian product popularity. Inventory volumes follow
+    the same popularity.
+    :param output_dir (str): The directory to write the files to.
+    :param customers (int): The number of customers.
+    :param orders (int): The number of orders.
+    :param suppliers (int): The number of suppliers.
+    :param products_per_supplier (int): The number of products each supplier offers.
+    :param seed (int): The random seed; the same seed and sizes give identical files.
+    :param customer_skew (float): Zipf exponent of orders per customer.
+    :param product_skew (float): Zipf exponent of product popularity.
+    :param discount_share (float): Share of products with a volume discount.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    products = build_products(seed, suppliers, products_per_supplier)
+    discounts = build_discounts(seed, products, discount_share)
+    discounts_by_supplier = {}
+    for discount in discounts:
+        supplier = int(discount["product_id"][4:]) // products_per_supplier
+        discounts_by_supplier.setdefault(supplier, []).append(discount)
+    # Popularity ranks are shuffled so that popular products are spread over suppliers.
+    popularity = _rng(seed, "popularity").permutation(zipf_weights(len(products), product_skew))
+
+    def supplier_chunk(start, stop):
+        return [{
+            "supplier_id": f"SUPP{i}",
+            "supplier_name": f"{BRANDS[i % len(BRANDS)]} Wholesale Partner {i}",
+            "contract_id": f"CONTRACT{i}",
+            "contract_name": f"Supply Contract {i}",
+            "products": products[i * products_per_supplier:(i + 1) * products_per_supplier],
+            "discounts": discounts_by_supplier.get(i, []),
+        } for i in range(start, stop)]
+
+    def customer_chunk(start, stop):
+        rng = _rng(seed, "customers", start // CHUNK_SIZE)
+        n = stop - start
+        first = rng.integers(0, len(FIRST_NAMES), n)
+        last = rng.integers(0, len(LAST_NAMES), n)
+        numbers = rng.integers(1, 999, n)
+        streets = rng.integers(0, len(STREETS), n)
+        in_us = rng.random(n) < 0.5
+        us_states = list(US_STATE_COORDINATES)
+        eu_cities = CITIES_BY_REGION["EU"]
+        states = rng.integers(0, len(us_states), n)
+        eu_city_picks = rng.integers(0, len(eu_cities), n)
+        city_picks = rng.integers(0, 6, n)
+        discount_counts = rng.poisson(1.0, n)
+        # From a stream of their own, so the customer draws of a seed are unchanged. A ZIP code
+        # makes state codes that are also country codes (DE, CA, IN) read as states.
+        zip_codes = _rng(seed, "zip_codes", start // CHUNK_SIZE).integers(501, 99951, n)
+        rows = []
+        for k in range(n):
+            i = start + k
+            if in_us[k]:
+                city = CITIES_BY_REGION["US"][city_picks[k] % len(CITIES_BY_REGION["US"])]
+                address = f"{numbers[k]} {STREETS[streets[k]]}, {city}, {us_states[states[k]]} {zip_codes[k]:05d}"
+            else:
+                city = eu_cities[eu_city_picks[k]]
+                address = f"{numbers[k]} {STREETS[streets[k]]}, {city}, {COUNTRY_BY_CITY[city]}"
+            customer_discounts = []
+            if discounts and discount_counts[k]:
+                for j in rng.choice(len(discounts), min(int(discount_counts[k]), len(discounts)), replace=False):
+                    customer_discounts.append({"customer_id": f"CUST{i}", **discounts[j]})
+            name = f"{FIRST_NAMES[first[k]]} {LAST_NAMES[last[k]]}"
+            rows.append({
+                "customer_id": f"CUST{i}",
+                "customer_name": f"{name} {i}" if i >= len(FIRST_NAMES) * len(LAST_NAMES) else name,
+                "customer_address": address,
+                "customer_phone": f"555-{i // 10000 % 1000:03d}-{i % 10000:04d}",
+                "customer_email": f"{FIRST_NAMES[first[k]].lower()}.{i}@example.com",
+                "customer_discount": customer_discounts,
+            })
+        return rows
+
+    customer_weights = zipf_weights(customers, customer_skew)
+    start_date = date(2023, 1, 1)
+
+    def order_chunk(start, stop):
+        rng = _rng(seed, "orders", start // CHUNK_SIZE)
+        n = stop - start
+        customer_ids = rng.choice(customers, n, p=customer_weights)
+        day_offsets = rng.integers(0, 730, n)
+        fill_offsets = rng.integers(0, 10, n)
+        statuses = rng.choice(ORDER_STATUSES, n, p=ORDER_STATUS_WEIGHTS)
+        strategies = rng.choice(FILL_STRATEGIES, n, p=FILL_STRATEGY_WEIGHTS)
+        item_counts = 1 + rng.poisson(1.5, n)
+        items = rng.choice(len(products), int(item_counts.sum()), p=popularity)
+        bounds = np.concatenate(([0], np.cumsum(item_counts)))
+        rows = []
+        for k in range(n):
+            order_date = start_date + timedelta(days=int(day_offsets[k]))
+            rows.append({
+                "customer_id": f"CUST{customer_ids[k]}",
+                "order_id": f"ORD-{start + k}",
+                "order_date": order_date.isoformat(),
+                "order_status": str(statuses[k]),
+                "fill_date": (order_date + timedelta(days=int(fill_offsets[k]))).isoformat(),
+                "fill_strategy": str(strategies[k]),
+                "order_items": [products[j] for j in items[bounds[k]:bounds[k + 1]]],
+            })
+        return rows
+
+    locations = list(WAREHOUSE_COORDINATES)
+    # Each product is stocked in one to three warehouses, more units for more popular products.
+    inventory_rng = _rng(seed, "inventory")
+    location_counts = inventory_rng.integers(1, min(3, len(locations)) + 1, len(products))
+    inventory_bounds = np.concatenate(([0], np.cumsum(location_counts)))
+    volumes = inventory_rng.poisson(np.repeat(popularity * len(products) * 20 + 1, location_counts))
+    # A random permutation of the warehouses per product; the first location_counts[i] are used.
+    location_picks = inventory_rng.random((len(products), len(locations))).argsort(axis=1)
+
+    def inventory_chunk(start, stop):
+        rows = []
+        for i in range(start, stop):
+            product = products[i]
+            for offset, location in enumerate(location_picks[i, :location_counts[i]]):
+                rows.append({
+                    "product_id": product["product_id"],
+                    "product_name": product["product_name"],
+                    "volume": int(volumes[inventory_bounds[i] + offset]),
+                    "location": locations[location],
+                })
+        return rows
+
+    _write_collection(output_dir, "suppliers", suppliers, supplier_chunk)
+    _write_collection(output_dir, "customers", customers, customer_chunk)
+    _write_collection(output_dir, "orders", orders, order_chunk)
+    _write_collection(output_dir, "inventory", len(products), inventory_chunk)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a reproducible, production-scale customer-server dataset.")
+    parser.add_argument("output_dir", help="Directory to write orders.json, customers.json, suppliers.json and inventory.json to")
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--suppliers", type=int, default=200)
+    parser.add_argument("--products-per-supplier", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--customer-skew", type=float, default=1.1, help="Zipf exponent of orders per customer")
+    parser.add_argument("--product-skew", type=float, default=1.2, help="Zipf exponent of product popularity")
+    args = parser.parse_args()
+    generate_dataset(args.output_dir, args.customers, args.orders, args.suppliers, args.products_per_supplier,
+                     args.seed, args.customer_skew, args.product_skew)
@@ -0,0 +1,126 @@
+import os
+import threading
+from typing import Callable
+
+from analytics import OrderAnalytics
+from data_functions import DataLayer, OrderChange
+from order_log import OrderLog
+from snapshot import COLLECTIONS, load_data_layer
+
+# How often the data files are checked for changes, in seconds.
+RELOAD_POLL_SECONDS = 2.0
+
+class DataReloader:
+    """
+    Watches the JSON data files and reloads the DataLayer in the background when one changes.
+
+    A change is picked up once the file stats are stable for one poll interval, so files that
+    are still being written are not loaded half-way. The new DataLayer is loaded, indexed and
+    analysed while the current one keeps serving. Order updates logged since the last compaction
+    are re-applied, and orders updated during the reload are copied over. The swap pauses order
+    writers only while those updates are copied. Requests that already hold the old DataLayer
+    finish against it.
+    """
+
+    def __init__(self, data_path: str, data_layer: DataLayer, order_log: OrderLog, analytics: OrderAnalytics,
+                 on_swap: Callable[[DataLayer], None], interval: float = RELOAD_POLL_SECONDS, compact: bool = False):
+        self.data_path = data_path
+        self.data_layer = data_layer
+        self.order_log = order_log
+        self.analytics = analytics
+        self.on_swap = on_swap
+        self.interval = interval
+        self.compact = compact
+        self._reload_lock = threading.Lock()
+        self._stats = self._file_stats()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def _file_stats(self) -> dict[str, tuple[int, int]]:
+        stats = {}
+        for file_name, _ in COLLECTIONS.values():
+            try:
+                st = os.stat(os.path.join(self.data_path, file_name))
+                stats[file_name] = (st.st_size, st.st_mtime_ns)
+            except FileNotFoundError:
+                stats[file_name] = None
+        return stats
+
+    def acknowledge(self):
+        """
+        Accepts the current file stats as loaded, e.g. after the server rewrote orders.json itself.
+        """
+        self._stats = self._file_stats()
+
+    def start(self):
+        """
+        Starts the file watcher thread.
+        """
+        self._watcher = threading.Thread(target=self._watch, name="data-reloader", daemon=True)
+        self._watcher.start()
+
+    def close(self):
+        """
+        Stops the file watcher thread.
+        """
+        self._stop.set()
+        if self._watcher:
+            self._watcher.join()
+
+    def _watch(self):
+        seen = self._stats
+        while not self._stop.wait(self.interval):
+            current = self._file_stats()
+            if current != self._stats and current == seen and None not in current.values():
+                changed = [name for name in current if current[name] != self._stats[name]]
+                print("Data files changed, reloading:", ", ".join(changed))
+                try:
+                    self.reload()
+                except ValueError as e:
+                    # Keep serving the current data; the next change triggers another attempt.
+                    print(f"Error reloading data files: {e}")
+                    self._stats = current
+            seen = current
+
+    def reload(self) -> DataLayer:
+        """
+        Loads the data files into a new DataLayer and swaps it in.
+        :return: The new data layer.
+        :rtype: DataLayer
+        """
+        with self._reload_lock, self.order_log.pause_compaction():
+            old = self.data_layer
+            stats = self._file_stats()
+            # Orders updated from now on are copied from the old DataLayer at the swap: current
+            # order id -> the id the order had before its first update during the reload.
+            changed: dict[str, str] = {}
+            changed_lock = threading.Lock()
+            def track(change: OrderChange):
+                with changed_lock:
+                    changed[change.new_order_id] = changed.pop(change.order_id, change.order_id)
+            old.add_order_listener(track)
+            try:
+                new = load_data_layer(self.data_path, compact=self.compact)
+                # Updates logged before the reload started are not in the files yet.
+                self.order_log.replay_into(new)
+                new.warm_up()
+                columns = self.analytics.prepare(new)
+
+                with old.lock_all_orders():
+                    old.remove_order_listener(track)
+                    new.adopt_order_feed(old)
+                    self.analytics.attach(new, columns)
+                    for order_id, previous_id in changed.items():
+                        order = old.get_order_by_id(order_id)
+                        # A rekey made after the log replay is not in the new DataLayer yet; one
+                        # made before it already is.
+                        if order is not None and not new.update_order(previous_id, order):
+                            new.update_order(order_id, order)
+                    self.order_log.swap_data_layer(new)
+                    self.data_layer = new
+                    self.on_swap(new)
+            finally:
+                old.remove_order_listener(track)
+            self._stats = stats
+            print("Reloaded data files")
+            return new
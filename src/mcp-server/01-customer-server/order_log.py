@@ -0,0 +1,241 @@
+import json
+import os
+import threading
+from concurrent.futures import Future
+
+from data_functions import DataLayer, Order, OrderUpdate, OrderUpdateResult
+
+ORDER_LOG_FILE_NAME = "orders.log"
+
+class OrderLog:
+    """
+    Durable append-only log of order mutations.
+
+    Updates are applied to the DataLayer and queued while holding the orders' striped write
+    locks, so the log order matches the in-memory order of every order while writers to
+    different orders proceed in parallel. A writer thread appends everything queued since its last
+    flush and fsyncs once for the whole batch (group commit). Every compact_every entries
+    the updated orders are saved as a delta of orders.json, and the log is trimmed. A PatchMerger
+    folds the deltas into orders.json.
+    """
+
+    def __init__(self, data_layer: DataLayer, data_path: str, log_path: str = None, compact_every: int = 10_000):
+        self.data_layer = data_layer
+        self.data_path = data_path
+        self.log_path = log_path or os.path.join(data_path, ORDER_LOG_FILE_NAME)
+        self.compact_every = compact_every
+        self._lock = threading.Lock()      # guards the pending queue
+        self._io_lock = threading.Lock()   # guards the log file handle
+        self._has_pending = threading.Condition(self._lock)
+        self._pending: list[tuple[bytes, Future]] = []
+        self._since_compaction = 0
+        self._compacting = threading.Lock()
+        self._file = None
+        self._writer = None
+        self._closed = False
+        # Called after a compaction saved the updated orders.
+        self.after_compaction = None
+
+    def replay(self) -> int:
+        """
+        Re-applies the logged order mutations to the DataLayer. A torn trailing entry left by a
+        crash during a write is dropped and truncated from the file.
+        :return: The number of replayed entries.
+        :rtype: int
+        """
+        try:
+            replayed, good_size = self.replay_into(self.data_layer)
+        except FileNotFoundError:
+            return 0
+        if good_size < os.path.getsize(self.log_path):
+            os.truncate(self.log_path, good_size)
+        self._since_compaction = replayed
+        print("Replayed order log entries:", replayed)
+        return replayed
+
+    def replay_into(self, data_layer: DataLayer) -> tuple[int, int]:
+        """
+        Applies the complete entries of the log to a DataLayer, stopping at a torn entry.
+        :param data_layer (DataLayer): The data layer to apply the entries to.
+        :return: The number of applied entries and the size of the log they span.
+        :rtype: tuple[int, int]
+        """
+        replayed = 0
+        good_size = 0
+        with open(self.log_path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete entry")
+                    entry = json.loads(line)
+                    if "updates" in entry:
+                        updates = [OrderUpdate.model_validate(update) for update in entry["updates"]]
+                    else:
+                        order = Order.model_validate(entry["order"])
+                except ValueError as e:
+                    print(f"Dropping torn order log entry at byte {good_size}: {e}")
+                    break
+                if "updates" in entry:
+                    data_layer.update_orders(updates)
+                else:
+                    data_layer.update_order(entry["order_id"], order)
+                good_size += len(line)
+                replayed += 1
+        return replayed, good_size
+
+    def start(self):
+        """
+        Opens the log for appending and starts the group commit writer thread.
+        """
+        self._file = open(self.log_path, 'ab')
+        self._writer = threading.Thread(target=self._write_loop, name="order-log-writer", daemon=True)
+        self._writer.start()
+
+    def update_order(self, order_id: str, order_data: Order) -> tuple[bool, Future]:
+        """
+        Updates an order in the DataLayer and queues the change for the log.
+
+        :param order_id (str): The ID of the order to update.
+        :param order_data (Order): The new order data.
+        :return: Whether the order was updated, and a future resolved once the change is durable
+            (None if nothing was updated).
+        :rtype: tuple[bool, Future]
+        """
+        entry = json.dumps({"order_id": order_id, "order": order_data.model_dump(exclude_none=True)},
+                           separators=(",", ":")).encode() + b"\n"
+        while True:
+            data_layer = self.data_layer
+            with data_layer.lock_orders((order_id, order_data.order_id)):
+                if data_layer is not self.data_layer:
+                    continue  # swapped by a reload while waiting for the lock
+                if self._closed:
+                    raise ValueError("Order log is closed")
+                if not data_layer.update_order(order_id, order_data):
+                    return False, None
+                return True, self._enqueue(entry)
+
+    def update_orders(self, updates: list[OrderUpdate]) -> tuple[list[OrderUpdateResult], Future]:
+        """
+        Updates a batch of orders atomically in the DataLayer and queues the batch as a single
+        log entry, so a crash can never leave part of it durable.
+
+        :param updates (list[OrderUpdate]): The order updates to apply.
+        :return: The per-update results, and a future resolved once the batch is durable
+            (None if the batch was rejected).
+        :rtype: tuple[list[OrderUpdateResult], Future]
+        """
+        entry = json.dumps({"updates": [update.model_dump(exclude_none=True) for update in updates]},
+                           separators=(",", ":")).encode() + b"\n"
+        order_ids = [update.order_id for update in updates] + [update.order.order_id for update in updates]
+        while True:
+            data_layer = self.data_layer
+            with data_layer.lock_orders(order_ids):
+                if data_layer is not self.data_layer:
+                    continue  # swapped by a reload while waiting for the lock
+                if self._closed:
+                    raise ValueError("Order log is closed")
+                results = data_layer.update_orders(updates)
+                if not updates or not all(result.success for result in results):
+                    return results, None
+                return results, self._enqueue(entry)
+
+    def swap_data_layer(self, data_layer: DataLayer):
+        """
+        Points the log at a reloaded DataLayer. The caller holds all order locks of the current
+        one and has paused compaction, so no update is applied to the old DataLayer afterwards.
+        :param data_layer (DataLayer): The data layer that replaces the current one.
+        """
+        self.data_layer = data_layer
+
+    def pause_compaction(self):
+        """
+        Returns a context manager that holds off compaction, e.g. while the data files are reloaded.
+        """
+        return self._compacting
+
+    def _enqueue(self, entry: bytes) -> Future:
+        committed = Future()
+        with self._lock:
+            self._pending.append((entry, committed))
+            self._has_pending.notify()
+        return committed
+
+    def _write_loop(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._has_pending.wait()
+                batch, self._pending = self._pending, []
+                if not batch and self._closed:
+                    return
+            try:
+                with self._io_lock:
+                    self._file.write(b"".join(entry for entry, _ in batch))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+            except OSError as e:
+                for _, committed in batch:
+                    committed.set_exception(ValueError(f"Error writing order log: {e}"))
+                continue
+            for _, committed in batch:
+                committed.set_result(True)
+            self._since_compaction += len(batch)
+            if self.compact_every and self._since_compaction >= self.compact_every and not self._compacting.locked():
+                # Compact in the background so commits keep flowing while the delta is written.
+                threading.Thread(target=self._compact_in_background, name="order-log-compaction", daemon=True).start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except ValueError as e:
+            print(e)
+
+    def compact(self):
+        """
+        Saves the orders updated since the last compaction as a delta of orders.json, then drops
+        the compacted prefix of the log. Writers are only paused while the log position is taken,
+        and the cost is proportional to the number of updated orders, not to all orders.
+        """
+        with self._compacting:
+            with self.data_layer.lock_all_orders(), self._io_lock:
+                # Everything written to the log so far is already applied in memory and marked
+                # dirty, so the delta saved next covers the log up to this position. It may also
+                # hold later updates, which are replayed on top; that is harmless because each
+                # entry carries the full order.
+                position = self._file.tell() if self._file else os.path.getsize(self.log_path)
+                data_layer = self.data_layer
+                self._since_compaction = 0
+
+            data_layer.save_order_to_json(os.path.join(self.data_path, "orders.json"), delta=True)
+
+            with self._io_lock:
+                try:
+                    with open(self.log_path, 'rb') as f:
+                        f.seek(position)
+                        tail = f.read()
+                    with open(self.log_path + ".tmp", 'wb') as f:
+                        f.write(tail)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(self.log_path + ".tmp", self.log_path)
+                    if self._file:
+                        self._file.close()
+                        self._file = open(self.log_path, 'ab')
+                except IOError as e:
+                    raise ValueError(f"Error compacting order log: {e}")
+                print("Compacted order log at byte", position)
+            if self.after_compaction:
+                self.after_compaction()
+
+    def close(self):
+        """
+        Flushes pending entries and stops the writer thread.
+        """
+        with self._lock:
+            self._closed = True
+            self._has_pending.notify()
+        if self._writer:
+            self._writer.join()
+        if self._file:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import re
+import weakref
+
+from mcp.server.lowlevel import Server
+from pydantic import AnyUrl
+
+from data_functions import DataLayer, OrderChange
+
+# Changes to the same order within this window are coalesced into a single notification.
+NOTIFY_COALESCE_SECONDS = 0.2
+
+ORDER_URI_PATTERN = re.compile(r"^resource://orders/(?P<order_id>[^/]+)/order$")
+
+logger = logging.getLogger("EcommerceAPIs")
+
+def order_uri(order_id: str) -> str:
+    return f"resource://orders/{order_id}/order"
+
+class OrderNotifier:
+    """
+    Turns the DataLayer order change feed into MCP resource subscriptions.
+
+    Clients subscribe to resource://orders/{order_id}/order and receive a resources/updated
+    notification when that order changes, and for no other order. Changes mark the order URI
+    dirty; dirty URIs are flushed once per coalescing window, so a burst of updates to one order
+    results in one notification per subscriber, which then re-reads the order.
+    """
+
+    def __init__(self, data_layer: DataLayer, coalesce_seconds: float = NOTIFY_COALESCE_SECONDS):
+        self.coalesce_seconds = coalesce_seconds
+        # URI -> subscribed sessions; sessions drop out once the client disconnects.
+        self._subscribers: dict[str, weakref.WeakSet] = {}
+        self._dirty: set[str] = set()
+        self._flush_scheduled = False
+        self._flush_task: asyncio.Task = None
+        self._loop: asyncio.AbstractEventLoop = None
+        self._server: Server = None
+        data_layer.add_order_listener(self._on_order_change)
+
+    def install(self, server: Server):
+        """
+        Registers the subscribe and unsubscribe handlers on the low-level MCP server and
+        advertises resource subscriptions in its capabilities.
+        :param server (Server): The low-level server, e.g. FastMCP._mcp_server.
+        """
+        self._server = server
+        server.subscribe_resource()(self.subscribe)
+        server.unsubscribe_resource()(self.unsubscribe)
+        get_capabilities = server.get_capabilities
+
+        def get_capabilities_with_subscribe(*args, **kwargs):
+            capabilities = get_capabilities(*args, **kwargs)
+            if capabilities.resources is not None:
+                capabilities.resources.subscribe = True
+            return capabilities
+        server.get_capabilities = get_capabilities_with_subscribe
+
+    async def subscribe(self, uri: AnyUrl):
+        uri = str(uri)
+        if not ORDER_URI_PATTERN.match(uri):
+            raise ValueError(f"Subscriptions are only supported for {order_uri('{order_id}')}")
+        self._loop = asyncio.get_running_loop()
+        session = self._server.request_context.session
+        self._subscribers.setdefault(uri, weakref.WeakSet()).add(session)
+        logger.info(f"Subscribed to {uri}")
+
+    async def unsubscribe(self, uri: AnyUrl):
+        uri = str(uri)
+        sessions = self._subscribers.get(uri)
+        if sessions is not None:
+            sessions.discard(self._server.request_context.session)
+            if not sessions:
+                del self._subscribers[uri]
+
+    def notify_all(self):
+        """
+        Notifies every subscriber, e.g. after the data files were reloaded. Thread-safe.
+        """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._mark_dirty, list(self._subscribers))
+
+    def _on_order_change(self, change: OrderChange):
+        # Called on the writer's thread; only hands watched URIs over to the event loop.
+        uris = [uri for uri in {order_uri(change.order_id), order_uri(change.new_order_id)} if uri in self._subscribers]
+        if uris and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._mark_dirty, uris)
+
+    def _mark_dirty(self, uris: list[str]):
+        self._dirty.update(uris)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._flush_task = self._loop.create_task(self._flush())
+
+    async def _flush(self):
+        await asyncio.sleep(self.coalesce_seconds)
+        dirty, self._dirty = self._dirty, set()
+        self._flush_scheduled = False
+        for uri in dirty:
+            for session in list(self._subscribers.get(uri, ())):
+                try:
+                    await session.send_resource_updated(AnyUrl(uri))
+                except Exception as e:
+                    # The client went away without unsubscribing.
+                    logger.warning(f"Dropping subscription to {uri}: {e}")
+                    self._subscribers.get(uri, weakref.WeakSet()).discard(session)
+            if not self._subscribers.get(uri, True):
+                del self._subscribers[uri]
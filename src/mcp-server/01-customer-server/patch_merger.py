@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+from typing import Callable
+
+from data_functions import iter_json_array
+from delta_patches import base_stats, patch_lock, patch_size, read_patch, replace_base
+
+# How often the patch files are checked, in seconds, and the patch size that triggers a merge.
+MERGE_POLL_SECONDS = 30.0
+MERGE_PATCH_BYTES = 8 << 20
+
+def merge_patch(file_name: str, key: str) -> int:
+    """
+    Folds the patch of a file shaped like {"key": [...]} into the file. The base is streamed
+    into a temporary file with the patched records swapped in and atomically renamed into
+    place, so loads and delta saves only wait for the rename. Patch lines appended during the
+    merge are kept for the next one.
+    :param file_name (str): The base file name.
+    :param key (str): The top-level key holding the array.
+    :return: The number of merged records, 0 if there was nothing to merge or the base
+        was rewritten meanwhile.
+    :rtype: int
+    """
+    with patch_lock(file_name):
+        records, since = read_patch(file_name)
+        if not records:
+            return 0
+        merged_stats = base_stats(file_name)
+
+    tmp_path = file_name + ".merge.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(b'{"' + key.encode() + b'": [')
+            for pos, record in enumerate(iter_json_array(file_name, key)):
+                if pos:
+                    f.write(b",")
+                f.write(json.dumps(records.get(pos, record), separators=(",", ":")).encode())
+            f.write(b"]}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        with patch_lock(file_name):
+            if not replace_base(file_name, tmp_path, merged_stats, since):
+                return 0
+    except (IOError, ValueError) as e:
+        # E.g. a base file that is not valid JSON.
+        raise ValueError(f"Error merging patch of {file_name}: {e}")
+    finally:
+        # Left behind if the merge failed; renamed or removed otherwise.
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(records)
+
+class PatchMerger:
+    """
+    Folds the patches written by delta saves into their base files in the background.
+
+    A file is merged once its patch reaches merge_bytes, so delta saves stay proportional to the
+    change volume while the patches, and the time to apply them on load, stay bounded.
+    """
+
+    def __init__(self, files: dict[str, str], after_merge: Callable[[], None] = None,
+                 interval: float = MERGE_POLL_SECONDS, merge_bytes: int = MERGE_PATCH_BYTES):
+        # Base file name -> top-level key of its array.
+        self.files = files
+        # Called after a base file was rewritten, e.g. so a file watcher can ignore it.
+        self.after_merge = after_merge
+        self.interval = interval
+        self.merge_bytes = merge_bytes
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Starts the merger thread.
+        """
+        self._thread = threading.Thread(target=self._run, name="patch-merger", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """
+        Stops the merger thread.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def merge(self, force: bool = False) -> int:
+        """
+        Merges the patches that reached merge_bytes, or every patch if force is set.
+        :param force (bool): Whether to merge patches of any size.
+        :return: The number of merged records.
+        :rtype: int
+        """
+        merged = 0
+        for file_name, key in self.files.items():
+            if patch_size(file_name) < (1 if force else self.merge_bytes):
+                continue
+            try:
+                count = merge_patch(file_name, key)
+            except ValueError as e:
+                print(e)
+                continue
+            if count:
+                print(f"Merged patch of {os.path.basename(file_name)}:", count)
+                merged += count
+        if merged and self.after_merge:
+            self.after_merge()
+        return merged
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.merge()
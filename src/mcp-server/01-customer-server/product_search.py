@@ -0,0 +1,125 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+
+# BM25 parameters: term frequency saturation and document length normalization.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Term frequency weight per product field, so that a match in the name counts more than one in
+# the description (a simplified BM25F).
+FIELD_WEIGHTS = {"product_name": 3, "features": 2, "description": 1}
+
+STOP_WORDS = frozenset({"a", "an", "and", "for", "in", "of", "on", "or", "the", "to", "with"})
+
+_TOKEN = re.compile(r"\w+")
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits text into lower-case search terms, dropping stop words and a plural "s".
+    """
+    terms = []
+    for token in _TOKEN.findall(text.casefold()):
+        if token in STOP_WORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+class ProductSearchIndex:
+    """
+    In-memory inverted index over the products of all suppliers, ranked with BM25.
+
+    Products are added per supplier as suppliers are loaded, and a supplier's products can be
+    replaced without rebuilding the index. Suppliers are identified by their list position.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # term -> {doc id: weighted term frequency}
+        self._postings: dict[str, dict[int, int]] = {}
+        # doc id -> (product, supplier_id, weighted length); None once removed
+        self._docs: list[tuple] = []
+        self._docs_by_supplier: dict[int, list[int]] = {}
+        self._total_length = 0
+        self._doc_count = 0
+
+    def __len__(self) -> int:
+        return self._doc_count
+
+    def add_supplier(self, pos: int, supplier):
+        """
+        Indexes the products of a supplier, replacing any products indexed for its position.
+        :param pos (int): The position of the supplier in the suppliers list.
+        :param supplier (Supplier): The supplier whose products to index.
+        """
+        with self._lock:
+            self._remove_supplier(pos)
+            doc_ids = []
+            for product in supplier.products or []:
+                terms = Counter()
+                for field, weight in FIELD_WEIGHTS.items():
+                    value = getattr(product, field)
+                    text = " ".join(value) if isinstance(value, list) else value or ""
+                    for term in tokenize(text):
+                        terms[term] += weight
+                doc_id = len(self._docs)
+                length = sum(terms.values())
+                self._docs.append((product, supplier.supplier_id, length))
+                for term, frequency in terms.items():
+                    self._postings.setdefault(term, {})[doc_id] = frequency
+                self._total_length += length
+                self._doc_count += 1
+                doc_ids.append(doc_id)
+            self._docs_by_supplier[pos] = doc_ids
+
+    def remove_supplier(self, pos: int):
+        """
+        Removes the products indexed for a supplier position.
+        """
+        with self._lock:
+            self._remove_supplier(pos)
+
+    def _remove_supplier(self, pos: int):
+        for doc_id in self._docs_by_supplier.pop(pos, []):
+            product, _, length = self._docs[doc_id]
+            for field in FIELD_WEIGHTS:
+                value = getattr(product, field)
+                for term in tokenize(" ".join(value) if isinstance(value, list) else value or ""):
+                    postings = self._postings.get(term)
+                    if postings is not None:
+                        postings.pop(doc_id, None)
+                        if not postings:
+                            del self._postings[term]
+            self._docs[doc_id] = None
+            self._total_length -= length
+            self._doc_count -= 1
+
+    def search(self, query: str, top_k: int = 10) -> list[tuple]:
+        """
+        Ranks the indexed products against a free-text query with BM25.
+        :param query (str): The search text.
+        :param top_k (int): The maximum number of results.
+        :return: (product, supplier_id, score) tuples, best match first.
+        :rtype: list[tuple]
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self._doc_count:
+                return []
+            average_length = self._total_length / self._doc_count
+            scores = Counter()
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (self._doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    length = self._docs[doc_id][2]
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                    scores[doc_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+            best = heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+            return [(self._docs[doc_id][0], self._docs[doc_id][1], score) for doc_id, score in best]
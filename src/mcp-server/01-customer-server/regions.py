@@ -0,0 +1,101 @@
+import math
+import re
+
+# Approximate coordinates (latitude, longitude) of the warehouse locations used in inventory data.
+WAREHOUSE_COORDINATES = {
+    "USEast": (37.4, -79.4),
+    "USCentral": (41.6, -93.6),
+    "USWest": (37.8, -122.4),
+    "EuropeWest": (52.4, 4.9),
+    "EuropeNorth": (53.3, -6.3),
+    "AsiaEast": (22.3, 114.2),
+    "AsiaSoutheast": (1.3, 103.8),
+    "AustraliaEast": (-33.9, 151.2),
+}
+
+# Used when a customer's address cannot be placed on the map.
+DEFAULT_WAREHOUSE = "EuropeWest"
+
+# Approximate centroids of US states, keyed by postal code.
+US_STATE_COORDINATES = {
+    "AL": (32.8, -86.8), "AK": (64.0, -150.0), "AZ": (34.3, -111.7), "AR": (34.9, -92.4),
+    "CA": (37.2, -119.5), "CO": (39.0, -105.5), "CT": (41.6, -72.7), "DE": (39.0, -75.5),
+    "DC": (38.9, -77.0), "FL": (28.6, -82.4), "GA": (32.7, -83.4), "HI": (20.8, -156.3),
+    "ID": (44.4, -114.6), "IL": (40.0, -89.2), "IN": (39.9, -86.3), "IA": (42.1, -93.5),
+    "KS": (38.5, -98.4), "KY": (37.5, -85.3), "LA": (31.1, -92.0), "ME": (45.4, -69.2),
+    "MD": (39.0, -76.8), "MA": (42.3, -71.8), "MI": (44.3, -85.4), "MN": (46.3, -94.3),
+    "MS": (32.7, -89.7), "MO": (38.4, -92.5), "MT": (47.0, -109.6), "NE": (41.5, -99.8),
+    "NV": (39.3, -116.6), "NH": (43.7, -71.6), "NJ": (40.2, -74.7), "NM": (34.4, -106.1),
+    "NY": (42.9, -75.5), "NC": (35.6, -79.4), "ND": (47.5, -100.5), "OH": (40.3, -82.8),
+    "OK": (35.6, -97.5), "OR": (43.9, -120.6), "PA": (40.9, -77.8), "RI": (41.7, -71.5),
+    "SC": (33.9, -80.9), "SD": (44.4, -100.2), "TN": (35.9, -86.4), "TX": (31.5, -99.3),
+    "UT": (39.3, -111.7), "VT": (44.1, -72.7), "VA": (37.5, -78.9), "WA": (47.4, -120.5),
+    "WV": (38.6, -80.6), "WI": (44.6, -89.9), "WY": (43.0, -107.6),
+}
+
+# Approximate centroids of countries, keyed by lower-case name and ISO 3166 alpha-2 code.
+COUNTRY_COORDINATES = {
+    "germany": (51.2, 10.4), "deutschland": (51.2, 10.4), "france": (46.6, 2.4),
+    "united kingdom": (54.0, -2.5), "uk": (54.0, -2.5), "ireland": (53.2, -8.2),
+    "netherlands": (52.2, 5.3), "belgium": (50.6, 4.6), "luxembourg": (49.8, 6.1),
+    "switzerland": (46.8, 8.2), "austria": (47.6, 14.1), "italy": (42.8, 12.6),
+    "spain": (40.2, -3.6), "portugal": (39.6, -8.0), "denmark": (56.0, 10.0),
+    "sweden": (62.0, 15.0), "norway": (61.0, 9.0), "finland": (64.0, 26.0),
+    "poland": (52.0, 19.4), "czech republic": (49.8, 15.5), "czechia": (49.8, 15.5),
+    "hungary": (47.2, 19.5), "greece": (39.1, 22.0),
+    "usa": (39.8, -98.6), "us": (39.8, -98.6), "united states": (39.8, -98.6),
+    "canada": (56.1, -106.3), "mexico": (23.6, -102.5), "brazil": (-14.2, -51.9),
+    "japan": (36.2, 138.3), "china": (35.9, 104.2), "india": (22.0, 79.0),
+    "singapore": (1.35, 103.8), "australia": (-25.3, 133.8), "south africa": (-30.6, 22.9),
+    "de": (51.2, 10.4), "fr": (46.6, 2.4), "gb": (54.0, -2.5), "ie": (53.2, -8.2),
+    "nl": (52.2, 5.3), "be": (50.6, 4.6), "lu": (49.8, 6.1), "ch": (46.8, 8.2),
+    "at": (47.6, 14.1), "it": (42.8, 12.6), "es": (40.2, -3.6), "pt": (39.6, -8.0),
+    "dk": (56.0, 10.0), "se": (62.0, 15.0), "no": (61.0, 9.0), "fi": (64.0, 26.0),
+    "pl": (52.0, 19.4), "cz": (49.8, 15.5), "hu": (47.2, 19.5), "gr": (39.1, 22.0),
+    "ca": (56.1, -106.3), "mx": (23.6, -102.5), "br": (-14.2, -51.9), "jp": (36.2, 138.3),
+    "cn": (35.9, 104.2), "in": (22.0, 79.0), "sg": (1.35, 103.8), "au": (-25.3, 133.8),
+    "za": (-30.6, 22.9),
+}
+
+US_ZIP_CODE = re.compile(r"\d{5}(-\d{4})?")
+
+def address_region(address: str) -> str:
+    """
+    Derives a region key from the trailing parts of an address: a country name or ISO code
+    (e.g. "Germany", "DE") or a US state code (e.g. "US-IL"). A state code that is also a
+    country code, such as DE, CA or IN, is read as a state only when it is followed by a ZIP
+    code ("CA 94103"). Other state codes are read as states when the address has no country.
+    :param address (str): The customer address.
+    :return: The region key, or None if the address cannot be placed.
+    :rtype: str
+    """
+    parts = [part.strip() for part in (address or "").split(",") if part.strip()]
+    has_country = any(part.casefold() in COUNTRY_COORDINATES for part in parts)
+    for part in reversed(parts):
+        tokens = part.split()
+        state = tokens[0].upper()
+        if state in US_STATE_COORDINATES and len(tokens) == 2 and US_ZIP_CODE.fullmatch(tokens[1]):
+            return f"US-{state}"
+        if part.casefold() in COUNTRY_COORDINATES:
+            return part.casefold()
+        if state in US_STATE_COORDINATES and len(tokens) == 1 and not has_country:
+            return f"US-{state}"
+    return None
+
+def region_coordinates(region: str) -> tuple[float, float]:
+    """
+    Returns the approximate coordinates of a region key produced by address_region.
+    """
+    if region is None:
+        return None
+    if region.startswith("US-"):
+        return US_STATE_COORDINATES.get(region[3:])
+    return COUNTRY_COORDINATES.get(region)
+
+def distance_km(a: tuple[float, float], b: tuple[float, float]) -> float:
+    """
+    Great-circle distance between two (latitude, longitude) points in kilometers.
+    """
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(h))
@@ -0,0 +1,249 @@
+import threading
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Iterable
+
+from data_functions import DataLayer, Reservation, ReservationAllocation, ReservationLine
+
+# Number of striped locks shared by all products and reservations.
+RESERVATION_LOCK_STRIPES = 64
+
+# Supported Order.fill_strategy values:
+#   Express   - the whole order ships from the single closest location that has every item.
+#   Standard  - each item ships from the closest location that has its full quantity.
+#   Split     - each item is taken from the closest locations until its quantity is covered.
+#   Backorder - like Split, but a shortfall is backordered instead of failing the reservation.
+FILL_STRATEGIES = ("Express", "Standard", "Split", "Backorder")
+DEFAULT_FILL_STRATEGY = "Standard"
+
+class InventoryReservations:
+    """
+    Reserves inventory for orders by decrementing stock across warehouse locations.
+
+    A reservation locks its order and every product it touches, reads the current stock,
+    allocates all lines according to the fill strategy, and only then writes the new volumes,
+    so a reservation either applies completely or not at all and stock never goes negative.
+    Products hash onto RESERVATION_LOCK_STRIPES striped locks taken in a fixed order, so
+    reservations of different products run in parallel and never deadlock. Locations are tried
+    closest to the customer first. Stock is taken from and returned to individual inventory
+    rows, since a location can hold several rows of the same product.
+
+    Reservations are kept in memory by order ID and re-applied when the DataLayer is reloaded.
+    """
+
+    def __init__(self, data_layer: DataLayer, on_change: Callable[[DataLayer, dict[int, int]], None] = None):
+        self.data_layer = data_layer
+        # Called with the DataLayer and the new volume per changed inventory row after stock was
+        # reserved or released, e.g. to update inventory aggregates. Called while the products
+        # are locked, so the calls for a row arrive in the order its volume was written.
+        self.on_change = on_change
+        self._locks = [threading.Lock() for _ in range(RESERVATION_LOCK_STRIPES)]
+        self._reservations: dict[str, Reservation] = {}
+
+    @contextmanager
+    def _lock(self, keys: Iterable[str]):
+        stripes = sorted({hash(key) % RESERVATION_LOCK_STRIPES for key in keys})
+        with ExitStack() as stack:
+            for stripe in stripes:
+                stack.enter_context(self._locks[stripe])
+            yield
+
+    def get_reservation(self, order_id: str) -> Reservation:
+        """
+        Fetches the active reservation of an order.
+        :param order_id (str): The ID of the order.
+        :return: The reservation, or None if the order has none.
+        :rtype: Reservation
+        """
+        return self._reservations.get(order_id)
+
+    def reserve_order(self, order_id: str, fill_strategy: str = None) -> Reservation:
+        """
+        Reserves one unit of stock per order item of an existing order, from the locations
+        closest to its customer.
+        :param order_id (str): The ID of the order.
+        :param fill_strategy (str): Overrides the fill strategy of the order.
+        :return: The reservation; success is False if the order cannot be filled.
+        :rtype: Reservation
+        """
+        order = self.data_layer.get_order_by_id(order_id)
+        if order is None:
+            raise ValueError(f"Order not found: {order_id}")
+        lines = [ReservationLine(product_id=item.product_id, quantity=1) for item in order.order_items or []]
+        customer = self.data_layer.get_customer_by_id(order.customer_id)
+        ranking = self.data_layer.get_warehouses_by_distance(customer.customer_name) if customer else None
+        locations = [warehouse.location for warehouse in ranking or []]
+        return self.reserve(order_id, lines, fill_strategy or order.fill_strategy or DEFAULT_FILL_STRATEGY, locations)
+
+    def reserve(self, order_id: str, lines: list[ReservationLine], fill_strategy: str, locations: list[str]) -> Reservation:
+        """
+        Atomically reserves stock for the given lines. An order holds at most one reservation;
+        reserving it again returns the existing one.
+        :param order_id (str): The ID of the order the stock is reserved for.
+        :param lines (list[ReservationLine]): The products and quantities to reserve; lines of the same product are merged.
+        :param fill_strategy (str): One of FILL_STRATEGIES.
+        :param locations (list[str]): Preferred locations, best first. Other locations are used last.
+        :return: The reservation; success is False if the lines cannot be filled.
+        :rtype: Reservation
+        """
+        if fill_strategy not in FILL_STRATEGIES:
+            raise ValueError(f"Unknown fill strategy: {fill_strategy}. Supported: {', '.join(FILL_STRATEGIES)}")
+        if any(line.quantity <= 0 for line in lines):
+            raise ValueError("Reservation quantities must be positive")
+        # One line per product, so that allocations of a product cannot overlap.
+        quantities = Counter()
+        for line in lines:
+            quantities[line.product_id] += line.quantity
+        lines = [ReservationLine(product_id=product_id, quantity=quantity) for product_id, quantity in quantities.items()]
+        with self._lock([order_id, *(line.product_id for line in lines)]):
+            # Read under the locks, so a reload cannot swap the DataLayer mid-reservation.
+            data_layer = self.data_layer
+            existing = self._reservations.get(order_id)
+            if existing is not None:
+                return existing
+            rank = {location: i for i, location in enumerate(locations)}
+            stock = {}
+            for line in lines:
+                rows = data_layer.get_inventory_rows_by_product_id(line.product_id)
+                stock[line.product_id] = sorted(((pos, item.location, item.volume) for pos, item in rows if item.volume > 0),
+                                                key=lambda entry: rank.get(entry[1], len(rank)))
+            reservation = _allocate(order_id, lines, fill_strategy, stock, locations)
+            if not reservation.success:
+                return reservation
+            volumes = {pos: volume for entries in stock.values() for pos, _, volume in entries}
+            changed = {}
+            for allocation in reservation.allocations:
+                volumes[allocation.position] -= allocation.quantity
+                changed[allocation.position] = volumes[allocation.position]
+                data_layer.set_inventory_volume(allocation.position, volumes[allocation.position])
+            self._reservations[order_id] = reservation
+            self._changed(data_layer, changed)
+        return reservation
+
+    def release(self, order_id: str) -> bool:
+        """
+        Releases the reservation of an order and returns its stock to the locations it came from.
+        :param order_id (str): The ID of the order.
+        :return: True if a reservation was released, False if the order had none.
+        :rtype: bool
+        """
+        reservation = self._reservations.get(order_id)
+        if reservation is None:
+            return False
+        with self._lock([order_id, *(allocation.product_id for allocation in reservation.allocations)]):
+            if self._reservations.pop(order_id, None) is None:
+                return False
+            self._changed(self.data_layer, _apply(self.data_layer, reservation.allocations))
+        return True
+
+    def swap_data_layer(self, data_layer: DataLayer):
+        """
+        Switches to a reloaded DataLayer and takes the active reservations out of its stock.
+        """
+        with ExitStack() as stack:
+            for lock in self._locks:
+                stack.enter_context(lock)
+            changed = {}
+            for reservation in self._reservations.values():
+                reservation.allocations = _rebind(data_layer, reservation.allocations, changed)
+            self.data_layer = data_layer
+            self._changed(data_layer, changed)
+
+    def _changed(self, data_layer: DataLayer, volumes: dict[int, int]):
+        if self.on_change is not None and volumes:
+            self.on_change(data_layer, volumes)
+
+def _apply(data_layer: DataLayer, allocations: list[ReservationAllocation]) -> dict[int, int]:
+    # Returns allocated stock to the rows it was taken from and returns their new volumes. The
+    # caller holds the product locks.
+    changed = {}
+    for allocation in allocations:
+        item = dict(data_layer.get_inventory_rows_by_product_id(allocation.product_id)).get(allocation.position)
+        if item is not None:
+            changed[allocation.position] = item.volume + allocation.quantity
+            data_layer.set_inventory_volume(allocation.position, changed[allocation.position])
+    return changed
+
+def _rebind(data_layer: DataLayer, allocations: list[ReservationAllocation],
+            changed: dict[int, int]) -> list[ReservationAllocation]:
+    # Takes allocated stock out of a reloaded DataLayer, whose rows may have moved: from the same
+    # row if it still holds the product at the location, otherwise from the other rows there.
+    # Stock that is no longer there is not taken, so a release returns exactly what was taken.
+    # The new volumes of the rows are recorded in changed.
+    rebound = []
+    for allocation in allocations:
+        rows = [(pos, item) for pos, item in data_layer.get_inventory_rows_by_product_id(allocation.product_id)
+                if item.location == allocation.location]
+        rows.sort(key=lambda row: row[0] != allocation.position)
+        remaining = allocation.quantity
+        for pos, item in rows:
+            taken = min(item.volume, remaining)
+            if taken > 0:
+                changed[pos] = item.volume - taken
+                data_layer.set_inventory_volume(pos, changed[pos])
+                rebound.append(allocation.model_copy(update={"quantity": taken, "position": pos}))
+                remaining -= taken
+    return rebound
+
+def _location_volumes(entries: list[tuple[int, str, int]]) -> dict[str, int]:
+    # Total stock per location, in the order of the entries.
+    volumes = {}
+    for _, location, volume in entries:
+        volumes[location] = volumes.get(location, 0) + volume
+    return volumes
+
+def _take(product_id: str, entries: list[tuple[int, str, int]], quantity: int,
+          location: str = None) -> tuple[list[ReservationAllocation], int]:
+    # Takes a quantity row by row in the order of the entries, optionally from one location only.
+    # Returns the allocations and the quantity that could not be covered.
+    allocations = []
+    for pos, row_location, volume in entries:
+        if quantity == 0:
+            break
+        if location is not None and row_location != location:
+            continue
+        taken = min(volume, quantity)
+        allocations.append(ReservationAllocation(product_id=product_id, location=row_location, quantity=taken, position=pos))
+        quantity -= taken
+    return allocations, quantity
+
+def _allocate(order_id: str, lines: list[ReservationLine], fill_strategy: str,
+              stock: dict[str, list[tuple[int, str, int]]], locations: list[str]) -> Reservation:
+    # Greedy allocation over the available (position, location, volume) inventory rows per
+    # product, preferred locations first. Reads stock only; the caller writes the result.
+    reservation = Reservation(order_id=order_id, fill_strategy=fill_strategy, success=True)
+    if fill_strategy == "Express":
+        available = [_location_volumes(stock[line.product_id]) for line in lines]
+        candidates = list(dict.fromkeys([*locations, *(location for entries in stock.values() for _, location, _ in entries)]))
+        for location in candidates:
+            if all(volumes.get(location, 0) >= line.quantity for line, volumes in zip(lines, available)):
+                reservation.allocations = [allocation for line in lines
+                                           for allocation in _take(line.product_id, stock[line.product_id], line.quantity, location)[0]]
+                return reservation
+        reservation.success = False
+        reservation.error = "No single location has every item in stock"
+        return reservation
+
+    for line in lines:
+        entries = stock[line.product_id]
+        if fill_strategy == "Standard":
+            volumes = _location_volumes(entries)
+            location = next((location for location, volume in volumes.items() if volume >= line.quantity), None)
+            if location is None:
+                reservation.success = False
+                reservation.error = f"No location has {line.quantity} of {line.product_id} in stock"
+                reservation.allocations = []
+                return reservation
+            reservation.allocations.extend(_take(line.product_id, entries, line.quantity, location)[0])
+            continue
+        allocations, remaining = _take(line.product_id, entries, line.quantity)
+        reservation.allocations.extend(allocations)
+        if remaining:
+            if fill_strategy == "Backorder":
+                reservation.backorders.append(ReservationLine(product_id=line.product_id, quantity=remaining))
+            else:
+                reservation.success = False
+                reservation.error = f"Only {line.quantity - remaining} of {line.quantity} {line.product_id} in stock"
+                reservation.allocations = []
+                return reservation
+    return reservation
@@ -0,0 +1,243 @@
+import json
+from typing import Callable, Iterable, Iterator
+
+from fastmcp import FastMCP
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+
+from data_functions import DataLayer, Customer, Discount, Order, Product, ProductInventory, Supplier, dump_json
+
+# Most IDs accepted by one multi-get request.
+MAX_BULK_IDS = 1000
+# Records serialized per chunk of an NDJSON stream.
+NDJSON_CHUNK_RECORDS = 1000
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Streamable collection -> (DataLayer collection it is read from, model).
+STREAMS = {
+    "suppliers": ("suppliers", Supplier),
+    "customers": ("customers", Customer),
+    "orders": ("orders", Order),
+    "inventory": ("inventory", ProductInventory),
+    "products": ("suppliers", Product),
+    "discounts": ("suppliers", Discount),
+}
+
+def _message(status_code: int, message: str) -> Response:
+    # The Message schema of openapi/swagger.json.
+    return Response(json.dumps({"message": message}), status_code=status_code, media_type="application/json")
+
+def _found(value, value_type) -> bytes:
+    # Missing records, and products without inventory, are answered with 404.
+    return dump_json(value, value_type) if value else None
+
+def _bulk(items: list, missing: list[str], value_type) -> bytes:
+    return b'{"items":' + dump_json(items, value_type) + b',"missing":' + dump_json(missing, list[str]) + b"}"
+
+def _iter_records(data_layer: DataLayer, stream: str) -> Iterator[bytes]:
+    name, model = STREAMS[stream]
+    if stream in ("products", "discounts"):
+        items = data_layer.get_all_products() if stream == "products" else data_layer.get_all_discounts()
+        for item in items:
+            yield dump_json(item, model)
+        return
+    # Read once: orders are an immutable version, so the stream is consistent while orders are updated.
+    records = getattr(data_layer, name)
+    raw = getattr(records, "raw", None)
+    if raw is not None:
+        # Snapshot-backed records and order versions hand out their stored bytes.
+        for i in range(len(records)):
+            yield raw(i)
+        return
+    for record in data_layer.iter_collection(name):
+        yield record.model_dump_json(exclude_none=True).encode()
+
+def _ndjson(records: Iterable[bytes]) -> Iterator[bytes]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= NDJSON_CHUNK_RECORDS:
+            yield b"\n".join(chunk) + b"\n"
+            chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
+
+class RestApi:
+    """
+    REST/JSON façade over the DataLayer of the MCP server, for batch consumers that do not speak MCP.
+
+    Serves the read endpoints of openapi/swagger.json, multi-gets by ID list and NDJSON streams of
+    whole collections from the same process and DataLayer. Every GET response carries an ETag
+    made of the versions of the collections it reads (see DataLayer.collection_version) and a
+    Cache-Control header; a request whose If-None-Match still matches is answered with 304 before
+    anything is read or serialized. Order updates stay on the MCP tools, which persist them.
+    """
+
+    def __init__(self, get_data_layer: Callable[[], DataLayer], max_age: int = 0):
+        # Called per request, so requests after a hot reload see the new DataLayer.
+        self.get_data_layer = get_data_layer
+        # Seconds clients may reuse a response without revalidating it.
+        self.max_age = max_age
+
+    def install(self, mcp: FastMCP):
+        """
+        Registers the REST routes on the HTTP app of the MCP server. Call before the app is created.
+        :param mcp (FastMCP): The MCP server.
+        """
+        # Batch routes come before the {product_id} route they would otherwise match.
+        routes = [
+            ("/customers/batch", ["GET", "POST"], self.get_customers),
+            ("/customers/id/{customer_id}", ["GET"], self.get_customer_by_id),
+            ("/customers/name/{customer_name}", ["GET"], self.get_customer_by_name),
+            ("/products/all", ["GET"], self.get_all_products),
+            ("/discounts/all", ["GET"], self.get_all_discounts),
+            ("/orders/batch", ["GET", "POST"], self.get_orders),
+            ("/orders/id/{order_id}", ["GET"], self.get_order_by_id),
+            ("/get_closest_inventory_location/{customer_name}", ["GET"], self.get_closest_inventory_location),
+            ("/inventory/batch", ["GET", "POST"], self.get_inventory),
+            ("/inventory/{product_id}", ["GET"], self.get_inventory_by_product_id),
+            ("/stream/{collection}", ["GET"], self.stream_collection),
+        ]
+        for path, methods, handler in routes:
+            mcp.custom_route(path, methods=methods)(handler)
+
+    def _cache_headers(self, etag: str) -> dict[str, str]:
+        cache_control = f"max-age={self.max_age}, must-revalidate" if self.max_age else "no-cache"
+        return {"ETag": etag, "Cache-Control": cache_control}
+
+    def _etag(self, data_layer: DataLayer, names: Iterable[str]) -> str:
+        return '"' + ".".join(data_layer.collection_version(name) for name in names) + '"'
+
+    def _not_modified(self, request: Request, etag: str) -> bool:
+        if request.method != "GET":
+            return False
+        tags = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+        return etag in tags or "*" in tags
+
+    async def _respond(self, request: Request, names: Iterable[str], read: Callable[[DataLayer], bytes],
+                       not_found: str = None) -> Response:
+        # The ETag is taken before the data is read, so it never claims newer data than it covers.
+        data_layer = self.get_data_layer()
+        etag = self._etag(data_layer, names)
+        if self._not_modified(request, etag):
+            return Response(status_code=304, headers=self._cache_headers(etag))
+        try:
+            body = read(data_layer)
+        except ValueError as e:
+            return _message(400, str(e))
+        if body is None:
+            return _message(404, not_found)
+        return Response(body, media_type="application/json", headers=self._cache_headers(etag))
+
+    async def _ids(self, request: Request, name: str) -> list[str]:
+        # GET takes ?name=a,b or repeated ?name=a&name=b; POST takes {"name": ["a", "b"]}.
+        if request.method == "POST":
+            try:
+                payload = await request.json()
+            except ValueError:
+                raise ValueError("Request body must be JSON")
+            ids = payload.get(name) if isinstance(payload, dict) else None
+            if not isinstance(ids, list) or not all(isinstance(value, str) for value in ids):
+                raise ValueError(f"Request body must be an object with a list of strings in {name}")
+        else:
+            ids = [value for values in request.query_params.getlist(name) for value in values.split(",") if value]
+        if len(ids) > MAX_BULK_IDS:
+            raise ValueError(f"At most {MAX_BULK_IDS} {name} per request")
+        return ids
+
+    async def get_customer_by_id(self, request: Request) -> Response:
+        customer_id = request.path_params["customer_id"]
+        return await self._respond(request, ["customers"], lambda data_layer: _found(
+            data_layer.get_customer_by_id(customer_id), Customer), f"Customer not found: {customer_id}")
+
+    async def get_customer_by_name(self, request: Request) -> Response:
+        customer_name = request.path_params["customer_name"]
+        return await self._respond(request, ["customers"], lambda data_layer: _found(
+            data_layer.get_customer_by_name(customer_name), Customer), f"Customer not found: {customer_name}")
+
+    async def get_order_by_id(self, request: Request) -> Response:
+        order_id = request.path_params["order_id"]
+        return await self._respond(request, ["orders"], lambda data_layer: _found(
+            data_layer.get_order_by_id(order_id), Order), f"Order not found: {order_id}")
+
+    async def get_inventory_by_product_id(self, request: Request) -> Response:
+        product_id = request.path_params["product_id"]
+        return await self._respond(request, ["inventory"], lambda data_layer: _found(
+            data_layer.get_inventory_by_product_id(product_id), list[ProductInventory]), f"No inventory for product: {product_id}")
+
+    async def get_closest_inventory_location(self, request: Request) -> Response:
+        customer_name = request.path_params["customer_name"]
+        return await self._respond(request, ["customers", "inventory"], lambda data_layer: _found(
+            data_layer.get_closest_inventory_location(customer_name), str), f"Customer not found: {customer_name}")
+
+    async def get_all_products(self, request: Request) -> Response:
+        return await self._respond(request, ["suppliers"], lambda data_layer: data_layer.get_all_products_json().encode())
+
+    async def get_all_discounts(self, request: Request) -> Response:
+        return await self._respond(request, ["suppliers"], lambda data_layer: data_layer.get_all_discounts_json().encode())
+
+    async def get_customers(self, request: Request) -> Response:
+        """
+        Multi-get of customers. Returns {"items": [...], "missing": [...]} with the found customers
+        in the order of the IDs and the unknown IDs.
+        """
+        try:
+            customer_ids = await self._ids(request, "customer_ids")
+        except ValueError as e:
+            return _message(400, str(e))
+        def read(data_layer: DataLayer) -> bytes:
+            customers = [data_layer.get_customer_by_id(customer_id) for customer_id in customer_ids]
+            return _bulk([customer for customer in customers if customer is not None],
+                         [customer_id for customer_id, customer in zip(customer_ids, customers) if customer is None], list[Customer])
+        return await self._respond(request, ["customers"], read)
+
+    async def get_orders(self, request: Request) -> Response:
+        """
+        Multi-get of orders, all from the same version of the orders. Returns {"items": [...],
+        "missing": [...]} with the found orders in the order of the IDs and the unknown IDs.
+        """
+        try:
+            order_ids = await self._ids(request, "order_ids")
+        except ValueError as e:
+            return _message(400, str(e))
+        def read(data_layer: DataLayer) -> bytes:
+            orders = data_layer.get_orders_by_ids(order_ids)
+            return _bulk([order for order in orders if order is not None],
+                         [order_id for order_id, order in zip(order_ids, orders) if order is None], list[Order])
+        return await self._respond(request, ["orders"], read)
+
+    async def get_inventory(self, request: Request) -> Response:
+        """
+        Multi-get of inventory by product ID. Returns {"items": [...], "missing": [...]} with the
+        inventory items of the products in the order of the IDs and the products without inventory.
+        """
+        try:
+            product_ids = await self._ids(request, "product_ids")
+        except ValueError as e:
+            return _message(400, str(e))
+        def read(data_layer: DataLayer) -> bytes:
+            items, missing = [], []
+            for product_id in product_ids:
+                found = data_layer.get_inventory_by_product_id(product_id)
+                items.extend(found)
+                if not found:
+                    missing.append(product_id)
+            return _bulk(items, missing, list[ProductInventory])
+        return await self._respond(request, ["inventory"], read)
+
+    async def stream_collection(self, request: Request) -> Response:
+        """
+        Streams a whole collection as NDJSON, one record per line in stored order: suppliers,
+        customers, orders, inventory, products or discounts. Records are serialized while the
+        response is sent, and stored records are passed through without being materialized.
+        """
+        stream = request.path_params["collection"]
+        if stream not in STREAMS:
+            return _message(404, f"Unknown collection: {stream}. Supported: {', '.join(STREAMS)}")
+        data_layer = self.get_data_layer()
+        etag = self._etag(data_layer, [STREAMS[stream][0]])
+        if self._not_modified(request, etag):
+            return Response(status_code=304, headers=self._cache_headers(etag))
+        # A sync iterator, so Starlette serializes the chunks in a worker thread.
+        return StreamingResponse(_ndjson(_iter_records(data_layer, stream)), media_type=NDJSON_MEDIA_TYPE,
+                                 headers=self._cache_headers(etag))
@@ -3,20 +3,25 @@ import uvicorn
 import os
 from dotenv import load_dotenv
 import asyncio
+import threading
 from fastmcp import FastMCP
 from fastmcp.server.dependencies import get_http_request
 from starlette.requests import Request
 
 from data_functions import DataLayer
-from data_functions import Discount, Product, Order, Supplier, Customer, ProductInventory
+from data_functions import Order, Supplier, Customer, ProductInventory, Page, DEFAULT_PAGE_SIZE
+from data_functions import OrderUpdate, OrderUpdateResult, OrderChange, CustomerMatch, ProductMatch, WarehouseDistance, dump_json
+from data_functions import CustomerRevenue, LocationStock, CustomerDiscountExposure, Reservation, ResolvedDiscount
+from snapshot import COLLECTIONS, load_data_layer, write_snapshot
+from order_log import OrderLog
+from sqlite_storage import open_sqlite_data_layer
+from order_notifications import OrderNotifier
+from analytics import OrderAnalytics
+from hot_reload import DataReloader, RELOAD_POLL_SECONDS
+from reservations import InventoryReservations
+from patch_merger import PatchMerger
+from rest_api import RestApi
 
-script_dir = os.path.dirname(os.path.abspath(__file__))
-data_path = os.path.join(script_dir, "data")
-data_layer = DataLayer()
-data_layer.load_order_from_json(os.path.join(data_path, "orders.json"))
-data_layer.load_supplier_from_json(os.path.join(data_path, "suppliers.json"))
-data_layer.load_customer_from_json(os.path.join(data_path, "customers.json"))
-data_layer.load_inventory_from_json(os.path.join(data_path, "inventory.json"))
 load_dotenv()
 
 # Configure logging
@@ -26,8 +31,78 @@ logging.basicConfig(
 )
 logger = logging.getLogger("EcommerceAPIs")
 
+def log_load_progress(collection: str):
+    def report(records: int, bytes_read: int, total_bytes: int):
+        logger.info(f"Loading {collection} | records={records}, progress={100 * bytes_read // max(total_bytes, 1)}%")
+    return report
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+data_path = os.getenv("DATA_PATH") or os.path.join(script_dir, "data")
+compact_records = os.getenv("COMPACT_RECORDS", "false").lower() in ("1", "true", "yes")
+if os.getenv("DATA_BACKEND", "memory") == "sqlite":
+    # Datasets larger than RAM are served from SQLite, which persists order updates itself
+    data_layer = open_sqlite_data_layer(data_path, os.getenv("SQLITE_PATH"), progress=log_load_progress)
+    order_log = None
+else:
+    # Cold start from the binary snapshot next to the JSON files, falling back to JSON when it is stale
+    # COMPACT_RECORDS keeps orders and inventory in columnar form to cut memory for large datasets
+    data_layer = load_data_layer(data_path, progress=log_load_progress, compact=compact_records)
+    # Order updates are persisted through an append-only log that is replayed on top of the loaded data
+    order_log = OrderLog(data_layer, data_path)
+    order_log.replay()
+    order_log.start()
+
 mcp = FastMCP("EcommerceAPIs")
 
+# Clients can subscribe to order resources instead of polling them for changes
+order_notifier = OrderNotifier(data_layer)
+order_notifier.install(mcp._mcp_server)
+
+# Indexes that are otherwise built on first use, such as the discount table, are built up front
+threading.Thread(target=data_layer.warm_up, name="data-warmup", daemon=True).start()
+
+# Aggregates are computed over columnar copies of the data instead of by the model
+analytics = OrderAnalytics(data_layer)
+threading.Thread(target=analytics.warm, name="analytics-warmup", daemon=True).start()
+
+reservations = InventoryReservations(data_layer, on_change=analytics.update_inventory_volumes)
+
+def swap_data_layer(new_data_layer: DataLayer):
+    # Requests read the global per call, so new requests see the reloaded data while
+    # in-flight ones finish against the DataLayer they already hold
+    global data_layer
+    data_layer = new_data_layer
+    reservations.swap_data_layer(new_data_layer)
+    order_notifier.notify_all()
+
+# Changed JSON files are reloaded in the background and swapped in without a restart
+reload_interval = float(os.getenv("RELOAD_INTERVAL", RELOAD_POLL_SECONDS))
+data_reloader = None
+if order_log is not None and reload_interval > 0:
+    data_reloader = DataReloader(data_path, data_layer, order_log, analytics, swap_data_layer, reload_interval, compact_records)
+    data_reloader.start()
+
+def refresh_after_merge():
+    # The merged files were written by the server itself, so they are not reloaded, and the
+    # snapshot is refreshed so the next start does not fall back to JSON and patches
+    if data_reloader is not None:
+        data_reloader.acknowledge()
+    try:
+        write_snapshot(data_layer, data_path)
+    except ValueError as e:
+        print(e)
+
+# Order log compactions save deltas of orders.json, which are folded into it in the background
+patch_merger = None
+if order_log is not None:
+    patch_merger = PatchMerger({os.path.join(data_path, file_name): name for name, (file_name, _) in COLLECTIONS.items()
+                                if name != "inventory"}, after_merge=refresh_after_merge)
+    patch_merger.start()
+
+# Batch consumers read the same DataLayer through a REST/JSON API next to /mcp, see rest_api.py
+rest_api = RestApi(lambda: data_layer, max_age=int(os.getenv("REST_CACHE_MAX_AGE", "0")))
+rest_api.install(mcp)
+
 # Use Streamable HTTP transport (recommended for web deployments)
 streamable_http_app = mcp.http_app(path="/mcp", transport="streamable-http")
 
@@ -39,61 +114,174 @@ def get_version() -> dict:
         "features": ["tools", "resources"],
     }
 
-@mcp.resource("resource://customers/{customer_id}/customer")
-async def get_customer_by_id(customer_id: str) -> Customer:
+def json_response(value, value_type) -> str:
+    # Serialize with the compiled serializer for the declared type instead of the generic fallback.
+    return dump_json(value, value_type).decode()
+
+@mcp.resource("resource://customers/{customer_id}/customer", mime_type="application/json")
+async def get_customer_by_id(customer_id: str) -> str:
     """Gets details of a customer by customer id"""
-    return data_layer.get_customer_by_id(customer_id)
+    return json_response(data_layer.get_customer_by_id(customer_id), Customer | None)
 
-@mcp.resource("resource://customers/{customer_name}/customer")
-async def get_customer_by_name(customer_name: str) -> Customer:
+@mcp.resource("resource://customers/{customer_name}/customer", mime_type="application/json")
+async def get_customer_by_name(customer_name: str) -> str:
     """Gets details of a customer by name"""
-    return data_layer.get_customer_by_name(customer_name)
+    return json_response(data_layer.get_customer_by_name(customer_name), Customer | None)
+
+@mcp.resource("resource://customers/{customer_name}/matches{?top_k}", mime_type="application/json")
+async def search_customers_by_name(customer_name: str, top_k: int = 5) -> str:
+    """Finds the customers whose names best match a possibly misspelled name, best match first"""
+    return json_response(data_layer.search_customers_by_name(customer_name, top_k), list[CustomerMatch])
 
-@mcp.resource("resource://products/products")
-async def get_all_products() -> list[Product]:
+@mcp.resource("resource://products/products", mime_type="application/json")
+async def get_all_products() -> str:
     """Gets all products"""
-    return data_layer.get_all_products()
+    return data_layer.get_all_products_json()
 
-@mcp.resource("resource://discounts/discount")
-async def get_all_discounts() -> list[Discount]:
+@mcp.tool()
+async def search_products(query: str, top_k: int = 10) -> list[ProductMatch]:
+    """Searches products by name, description and features and returns the best matches first, instead of fetching the whole catalog"""
+    logger.info(f"Tool called: search_products | query={query}, top_k={top_k}")
+    return data_layer.search_products(query, top_k)
+
+@mcp.resource("resource://discounts/discount", mime_type="application/json")
+async def get_all_discounts() -> str:
     """Gets all discounts"""
-    return data_layer.get_all_discounts()
+    return data_layer.get_all_discounts_json()
+
+def split_fields(fields: str) -> list[str]:
+    return [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+
+@mcp.resource("resource://products/page{?cursor,limit,fields}", mime_type="application/json")
+async def get_products_page(cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, fields: str = None) -> str:
+    """Gets one page of products. Pass next_cursor to get the following page and a comma-separated fields list to select fields"""
+    return json_response(data_layer.get_products_page(cursor, limit, split_fields(fields)), Page)
+
+@mcp.resource("resource://discounts/{customer_id}/{product_id}/best{?quantity}", mime_type="application/json")
+async def resolve_discount(customer_id: str, product_id: str, quantity: int = 1) -> str:
+    """Gets the best discount and unit price for a customer ordering a quantity of a product, from the supplier and customer discounts, and the volume needed for the next better price"""
+    return json_response(data_layer.resolve_discount(customer_id, product_id, quantity), ResolvedDiscount)
+
+@mcp.resource("resource://discounts/page{?cursor,limit,fields}", mime_type="application/json")
+async def get_discounts_page(cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, fields: str = None) -> str:
+    """Gets one page of discounts. Pass next_cursor to get the following page and a comma-separated fields list to select fields"""
+    return json_response(data_layer.get_discounts_page(cursor, limit, split_fields(fields)), Page)
 
-@mcp.resource("resource://orders/{order_id}/order")
-async def get_order_by_id(order_id: str) -> Order:
+@mcp.resource("resource://orders/{order_id}/order", mime_type="application/json")
+async def get_order_by_id(order_id: str) -> str:
     """Gets details of an order by ID"""
-    return data_layer.get_order_by_id(order_id)
+    return json_response(data_layer.get_order_by_id(order_id), Order | None)
+
+@mcp.resource("resource://orders/range{?date_from,date_to,date_field,status,cursor,limit,fields}", mime_type="application/json")
+async def find_orders_by_date(date_from: str = None, date_to: str = None, date_field: str = "order_date", status: str = None,
+                              cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, fields: str = None) -> str:
+    """Gets one page of orders with an order_date (or fill_date, via date_field) between date_from and date_to (YYYY-MM-DD, inclusive), oldest first. Optionally only orders with the given status"""
+    return json_response(data_layer.find_orders(status, date_from, date_to, date_field, cursor, limit, split_fields(fields)), Page)
+
+@mcp.resource("resource://orders/status/{status}{?cursor,limit,fields}", mime_type="application/json")
+async def find_orders_by_status(status: str, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, fields: str = None) -> str:
+    """Gets one page of orders with the given status, e.g. Pending. See resource://orders/statuses for the statuses in use"""
+    return json_response(data_layer.find_orders(status, cursor=cursor, limit=limit, fields=split_fields(fields)), Page)
+
+@mcp.resource("resource://orders/statuses", mime_type="application/json")
+async def get_order_status_counts() -> str:
+    """Gets the number of orders per order status"""
+    return json_response(data_layer.get_order_status_counts(), dict[str, int])
+
+@mcp.resource("resource://orders/{order_id}/discounts", mime_type="application/json")
+async def resolve_order_discounts(order_id: str) -> str:
+    """Gets the best discount and unit price for every product of an order"""
+    return json_response(data_layer.resolve_order_discounts(order_id), list[ResolvedDiscount] | None)
+
+@mcp.resource("resource://orders/changes{?since}", mime_type="application/json")
+async def get_order_changes(since: int = 0) -> str:
+    """Gets the recent order changes after a sequence number, oldest first. Pass the last sequence seen to get only newer changes"""
+    return json_response(data_layer.get_order_changes(since), list[OrderChange])
 
 @mcp.tool()
 async def update_order(order_id: str, order: Order) -> bool:
     """Updates an existing order by referencing the order ID"""
     logger.info(f"Tool called: update_order | order_id={order_id}, order={order}")
     try:
-        result = data_layer.update_order(order_id, order)
+        if order_log is None:
+            result = data_layer.update_order(order_id, order)
+        else:
+            result, committed = order_log.update_order(order_id, order)
+            if committed is not None:
+                await asyncio.wrap_future(committed)
         logger.info(f"Tool completed: update_order | order_id={order_id}, success={result}")
         return result
     except Exception as e:
         logger.error(f"Tool error: update_order | order_id={order_id}, error={str(e)}")
         raise
 
-@mcp.resource("resource://inventory/{product_id}/productinventory")
-async def get_inventory_by_product_id(product_id: str) -> list[ProductInventory]:
+@mcp.tool()
+async def update_orders(updates: list[OrderUpdate]) -> list[OrderUpdateResult]:
+    """Updates several existing orders in one call. Either all updates are applied or none; the result reports each order"""
+    logger.info(f"Tool called: update_orders | count={len(updates)}")
+    try:
+        if order_log is None:
+            results = data_layer.update_orders(updates)
+        else:
+            results, committed = order_log.update_orders(updates)
+            if committed is not None:
+                await asyncio.wrap_future(committed)
+        applied = sum(result.success for result in results)
+        logger.info(f"Tool completed: update_orders | count={len(updates)}, applied={applied}")
+        return results
+    except Exception as e:
+        logger.error(f"Tool error: update_orders | count={len(updates)}, error={str(e)}")
+        raise
+
+@mcp.tool()
+async def get_revenue_by_customer(top_k: int = 10, customer_id: str = None) -> list[CustomerRevenue]:
+    """Gets the order revenue and order count per customer, highest revenue first. Cancelled orders are not counted. Pass customer_id to get a single customer"""
+    logger.info(f"Tool called: get_revenue_by_customer | top_k={top_k}, customer_id={customer_id}")
+    return analytics.revenue_by_customer(top_k, customer_id)
+
+@mcp.tool()
+async def get_stock_by_location() -> list[LocationStock]:
+    """Gets the total inventory volume and the number of distinct products per inventory location"""
+    logger.info("Tool called: get_stock_by_location")
+    return analytics.stock_by_location()
+
+@mcp.tool()
+async def get_discount_exposure(top_k: int = 10) -> list[CustomerDiscountExposure]:
+    """Gets the customers with the highest discount exposure: the list price minus the discount price, times the discount volume, summed over their discounts"""
+    logger.info(f"Tool called: get_discount_exposure | top_k={top_k}")
+    return analytics.discount_exposure(top_k)
+
+@mcp.tool()
+async def reserve_order_inventory(order_id: str, fill_strategy: str = None) -> Reservation:
+    """Reserves stock for the items of an order from the warehouses closest to its customer, atomically and without overselling. Uses the order's fill_strategy unless one is given: Express (one location for the whole order), Standard (one location per item), Split (items may come from several locations) or Backorder (like Split, shortfalls are backordered). Reserving an order again returns its existing reservation"""
+    logger.info(f"Tool called: reserve_order_inventory | order_id={order_id}, fill_strategy={fill_strategy}")
+    reservation = reservations.reserve_order(order_id, fill_strategy)
+    logger.info(f"Tool completed: reserve_order_inventory | order_id={order_id}, success={reservation.success}")
+    return reservation
+
+@mcp.tool()
+async def release_order_inventory(order_id: str) -> bool:
+    """Releases the stock reserved for an order, e.g. when it is cancelled"""
+    logger.info(f"Tool called: release_order_inventory | order_id={order_id}")
+    return reservations.release(order_id)
+
+@mcp.resource("resource://inventory/{product_id}/productinventory", mime_type="application/json")
+async def get_inventory_by_product_id(product_id: str) -> str:
     """Gets inventory details by product ID"""
-    return data_layer.get_inventory_by_product_id(product_id)
+    return json_response(data_layer.get_inventory_by_product_id(product_id), list[ProductInventory])
 
 @mcp.resource("resource://inventory/{customer_name}/location")
 async def get_closest_inventory_location(customer_name: str) -> str:
     """Gets the closest inventory location based on customer name"""
-    customer_details = data_layer.get_customer_by_name(customer_name)
-    if customer_details is None:
+    location = data_layer.get_closest_inventory_location(customer_name)
+    if location is None:
         return "Customer location unknown"
-    
-    if "Germany" in customer_details.address:
-        return "EuropeWest"
-    elif "IL" in customer_details.address:
-        return "USEast"
-    else:
-        return "EuropeWest"
+    return location
+
+@mcp.resource("resource://inventory/{customer_name}/locations", mime_type="application/json")
+async def get_inventory_locations_by_distance(customer_name: str) -> str:
+    """Gets all inventory locations ranked by distance from the customer, closest first"""
+    return json_response(data_layer.get_warehouses_by_distance(customer_name) or [], list[WarehouseDistance])
 
 async def check_mcp(mcp: FastMCP):
     # List the components that were created
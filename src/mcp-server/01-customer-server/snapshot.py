@@ -0,0 +1,252 @@
+import json
+import mmap
+import os
+import struct
+import threading
+from array import array
+from collections.abc import MutableSequence
+from typing import Callable
+from pydantic import BaseModel
+
+from data_functions import DataLayer, INDEX_KEYS, ProgressCallback, iter_key_rows
+from data_functions import Supplier, Customer, Order, ProductInventory
+from delta_patches import patch_stats
+
+SNAPSHOT_FILE_NAME = "datalayer.snapshot"
+SNAPSHOT_MAGIC = b"DLSNAP03"
+
+# Collection name -> (source JSON file name, model)
+COLLECTIONS = {
+    "suppliers": ("suppliers.json", Supplier),
+    "customers": ("customers.json", Customer),
+    "orders": ("orders.json", Order),
+    "inventory": ("inventory.json", ProductInventory),
+}
+
+# File layout:
+#   magic (8 bytes) | manifest length (u64) | manifest JSON | padding to 8 bytes
+#   per collection: offsets (count + 1 x u64) | record bytes (compact JSON per record)
+# The manifest records the source file stats, including those of their delta save patches, the
+# index key columns and the section positions.
+# Records are dumped with exclude_none because fields like Order.fill_strategy default to None
+# without accepting it, so an explicit null would not validate when read back.
+_HEADER = struct.Struct("<8sQ")
+
+class LazyRecords(MutableSequence):
+    """
+    A list-like view over the records of one snapshot collection.
+    Records are validated from the memory-mapped bytes the first time they are accessed
+    and cached afterwards; assigned records override the snapshot.
+    """
+
+    def __init__(self, buffer: memoryview, offsets: memoryview, model: type[BaseModel], keys: dict[str, list[str]]):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._model = model
+        self._keys = keys
+        self._cache = [None] * (len(offsets) - 1)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        record = self._cache[index]
+        if record is None:
+            record = self._model.model_validate_json(self.raw(index))
+            self._cache[index] = record
+        return record
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            raise TypeError("LazyRecords does not support slice assignment")
+        self._cache[index] = value
+
+    def __delitem__(self, index):
+        raise TypeError("LazyRecords does not support deletion")
+
+    def insert(self, index, value):
+        raise TypeError("LazyRecords does not support insertion")
+
+    def copy(self) -> "LazyRecords":
+        """
+        Returns a copy sharing the mapped buffer; assignments to either copy do not affect the other.
+        """
+        records = LazyRecords(self._buffer, self._offsets, self._model, self._keys)
+        records._cache = list(self._cache)
+        return records
+
+    def raw(self, index: int) -> bytes:
+        """
+        Returns the serialized JSON bytes of a record, without materializing it.
+        :param index (int): The position of the record.
+        """
+        record = self._cache[index]
+        if record is not None:
+            return record.model_dump_json(exclude_none=True).encode()
+        if index < 0:
+            index += len(self)
+        return bytes(self._buffer[self._offsets[index]:self._offsets[index + 1]])
+
+    def iter_uncached(self):
+        """
+        Iterates over the records without caching the ones it materializes, for one-off scans.
+        """
+        for i, record in enumerate(self._cache):
+            yield record if record is not None else self._model.model_validate_json(self.raw(i))
+
+    def key_rows(self, *fields):
+        """
+        Yields the requested index key fields per record, using the snapshot key columns
+        for records that have not been materialized.
+        """
+        columns = [self._keys[field] for field in fields]
+        for i, record in enumerate(self._cache):
+            if record is None:
+                yield tuple(column[i] for column in columns)
+            else:
+                yield tuple(getattr(record, field) for field in fields)
+
+def _source_stats(data_path: str) -> dict[str, list[int]]:
+    stats = {}
+    for name, (file_name, _) in COLLECTIONS.items():
+        st = os.stat(os.path.join(data_path, file_name))
+        stats[name] = [st.st_size, st.st_mtime_ns, *patch_stats(os.path.join(data_path, file_name))]
+    return stats
+
+def _record_bytes(records, index: int) -> bytes:
+    # Snapshot-backed collections, and order versions over them, hand out their stored bytes.
+    raw = getattr(records, "raw", None)
+    if raw is not None:
+        return raw(index)
+    return records[index].model_dump_json(exclude_none=True).encode()
+
+def write_snapshot(data_layer: DataLayer, data_path: str, snapshot_path: str = None):
+    """
+    Writes a binary snapshot of a loaded DataLayer next to its JSON source files.
+    The snapshot is written to a temporary file and atomically renamed into place.
+    :param data_layer (DataLayer): The loaded data layer to snapshot.
+    :param data_path (str): The directory holding the JSON source files.
+    :param snapshot_path (str): Optional snapshot file path, defaults to SNAPSHOT_FILE_NAME in data_path.
+    """
+    snapshot_path = snapshot_path or os.path.join(data_path, SNAPSHOT_FILE_NAME)
+    sections = {}
+    bodies = []
+    for name in COLLECTIONS:
+        records = getattr(data_layer, name) or []
+        offsets = array("Q", [0])
+        chunks = []
+        for i in range(len(records)):
+            data = _record_bytes(records, i)
+            chunks.append(data)
+            offsets.append(offsets[-1] + len(data))
+        keys = {field: [] for field in INDEX_KEYS[name]}
+        for row in iter_key_rows(records, *INDEX_KEYS[name]):
+            for field, value in zip(INDEX_KEYS[name], row):
+                keys[field].append(value)
+        sections[name] = {"count": len(records), "size": offsets[-1], "keys": keys}
+        bodies.append((offsets, chunks))
+
+    # Section positions depend on the manifest length, so lay out relative to the data start.
+    position = 0
+    for name, (offsets, _) in zip(COLLECTIONS, bodies):
+        sections[name]["offsets_at"] = position
+        position += len(offsets) * offsets.itemsize
+        sections[name]["data_at"] = position
+        position += sections[name]["size"]
+        position += -position % 8
+
+    # Per-thread temporary file, so that concurrent writers (e.g. a reload and a patch merge) do not interleave.
+    tmp_path = f"{snapshot_path}.{threading.get_ident()}.tmp"
+    try:
+        manifest = json.dumps({"sources": _source_stats(data_path), "collections": sections},
+                              separators=(",", ":")).encode()
+        data_start = _HEADER.size + len(manifest)
+        data_start += -data_start % 8
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(SNAPSHOT_MAGIC, len(manifest)))
+            f.write(manifest)
+            f.write(b"\0" * (data_start - f.tell()))
+            for name, (offsets, chunks) in zip(COLLECTIONS, bodies):
+                offsets.tofile(f)
+                for data in chunks:
+                    f.write(data)
+                f.write(b"\0" * (-(f.tell() - data_start) % 8))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, snapshot_path)
+    except IOError as e:
+        raise ValueError(f"Error saving snapshot: {e}")
+
+def load_snapshot(data_path: str, snapshot_path: str = None) -> DataLayer:
+    """
+    Loads a DataLayer from a binary snapshot by memory-mapping it. Records are materialized
+    lazily on first access; indexes are built from the stored key columns.
+    :param data_path (str): The directory holding the JSON source files.
+    :param snapshot_path (str): Optional snapshot file path, defaults to SNAPSHOT_FILE_NAME in data_path.
+    :return: The loaded data layer, or None if the snapshot is missing, unreadable or stale.
+    :rtype: DataLayer
+    """
+    snapshot_path = snapshot_path or os.path.join(data_path, SNAPSHOT_FILE_NAME)
+    try:
+        with open(snapshot_path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (IOError, ValueError):
+        return None
+    try:
+        magic, manifest_len = _HEADER.unpack_from(mm, 0)
+        if magic != SNAPSHOT_MAGIC:
+            return None
+        manifest = json.loads(mm[_HEADER.size:_HEADER.size + manifest_len])
+        if manifest["sources"] != _source_stats(data_path):
+            return None
+    except (struct.error, ValueError, KeyError, OSError):
+        return None
+
+    data_start = _HEADER.size + manifest_len
+    data_start += -data_start % 8
+    view = memoryview(mm)
+    data_layer = DataLayer()
+    for name, (_, model) in COLLECTIONS.items():
+        section = manifest["collections"][name]
+        offsets_at = data_start + section["offsets_at"]
+        data_at = data_start + section["data_at"]
+        offsets = view[offsets_at:data_at].cast("Q")
+        buffer = view[data_at:data_at + section["size"]]
+        setattr(data_layer, name, LazyRecords(buffer, offsets, model, section["keys"]))
+    data_layer.build_indexes()
+    return data_layer
+
+def load_data_layer(data_path: str, snapshot_path: str = None,
+                    progress: Callable[[str], ProgressCallback] = None, compact: bool = False) -> DataLayer:
+    """
+    Loads the DataLayer from its snapshot when it is current, otherwise from the JSON files,
+    and then refreshes the snapshot for the next start.
+    :param data_path (str): The directory holding the JSON source files.
+    :param snapshot_path (str): Optional snapshot file path, defaults to SNAPSHOT_FILE_NAME in data_path.
+    :param progress (Callable[[str], ProgressCallback]): Optional factory returning a JSON load
+        progress callback for a collection name.
+    :param compact (bool): Whether to keep orders and inventory as CompactRecords.
+    :return: The loaded data layer.
+    :rtype: DataLayer
+    """
+    data_layer = load_snapshot(data_path, snapshot_path)
+    if data_layer is not None:
+        print("Loaded snapshot:", snapshot_path or os.path.join(data_path, SNAPSHOT_FILE_NAME))
+        if compact:
+            data_layer.use_compact_records()
+        return data_layer
+
+    data_layer = DataLayer()
+    if compact:
+        data_layer.use_compact_records()
+    data_layer.load_order_from_json(os.path.join(data_path, "orders.json"), progress=progress and progress("orders"))
+    data_layer.load_supplier_from_json(os.path.join(data_path, "suppliers.json"), progress=progress and progress("suppliers"))
+    data_layer.load_customer_from_json(os.path.join(data_path, "customers.json"), progress=progress and progress("customers"))
+    data_layer.load_inventory_from_json(os.path.join(data_path, "inventory.json"), progress=progress and progress("inventory"))
+    try:
+        write_snapshot(data_layer, data_path, snapshot_path)
+    except ValueError as e:
+        print(e)
+    return data_layer
@@ -0,0 +1,351 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Any
+from pydantic import BaseModel, PrivateAttr
+
+from data_functions import DataLayer, ProgressCallback, stream_models_from_json, encode_cursor, decode_cursor, _projection
+from data_functions import ORDER_DATE_FIELDS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, Page
+from delta_patches import patch_lock, read_patch, remove_patch
+from product_search import ProductSearchIndex
+from data_functions import Order, OrderUpdate, OrderUpdateResult, Supplier, Customer, ProductInventory
+
+SQLITE_FILE_NAME = "datalayer.sqlite"
+
+# Collection name -> model stored in its table. Each table keeps the record as JSON in `body`,
+# its list position in `pos`, and the lookup keys in INDEXED_COLUMNS as indexed columns.
+TABLES = {
+    "suppliers": Supplier,
+    "customers": Customer,
+    "orders": Order,
+    "inventory": ProductInventory,
+}
+
+INDEXED_COLUMNS = {
+    "suppliers": ("supplier_id",),
+    "customers": ("customer_id", "customer_name"),
+    "orders": ("order_id", "customer_id"),
+    "inventory": ("product_id",),
+}
+
+# Order fields that find_orders filters on, indexed as expressions over the JSON body so that
+# existing databases get the indexes without a schema change.
+ORDER_FILTER_COLUMNS = ("order_status", *ORDER_DATE_FIELDS)
+
+def _json_field(field: str) -> str:
+    return f"json_extract(body, '$.{field}')"
+
+class SqliteDataLayer(DataLayer):
+    """
+    DataLayer backed by an embedded SQLite database, for datasets larger than RAM.
+    It keeps the DataLayer method signatures; the in-memory collection fields stay empty
+    and every lookup is answered from an indexed table instead.
+    """
+
+    _db_path: str = PrivateAttr(None)
+    _db_lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _db: Any = PrivateAttr(None)
+
+    def __init__(self, db_path: str, **data):
+        super().__init__(**data)
+        self._db_path = db_path
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for name in TABLES:
+            keys = INDEXED_COLUMNS[name]
+            columns = ", ".join(f"{key} TEXT NOT NULL" for key in keys)
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS {name} (pos INTEGER PRIMARY KEY, {columns}, body TEXT NOT NULL)")
+            for key in keys:
+                self._db.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_{key} ON {name} ({key}, pos)")
+        for field in ORDER_FILTER_COLUMNS:
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS idx_orders_{field} ON orders ({_json_field(field)}, pos)")
+        self._db.commit()
+        # Customer names, regions and warehouse locations are small enough to index in memory.
+        self._index_customer_lookups()
+        self._index_warehouses_from_db()
+
+    def _index_customer_lookups(self):
+        self.invalidate_discounts()
+        rows = self._query("SELECT customer_id, customer_name, json_extract(body, '$.customer_address') FROM customers ORDER BY pos")
+        self._index_customer_names((customer_id, customer_name) for customer_id, customer_name, _ in rows)
+        self._index_customer_regions((customer_name, address) for _, customer_name, address in rows)
+
+    def _index_warehouses_from_db(self):
+        self._index_warehouses(location for (location,) in self._query("SELECT json_extract(body, '$.location') FROM inventory ORDER BY pos"))
+
+    def build_indexes(self):
+        # The SQLite indexes are maintained by the database itself.
+        pass
+
+    def _replace_collection(self, name: str, batches) -> int:
+        keys = INDEXED_COLUMNS[name]
+        sql = f"INSERT INTO {name} (pos, {', '.join(keys)}, body) VALUES (?, {', '.join('?' for _ in keys)}, ?)"
+        count = 0
+        product_index = ProductSearchIndex() if name == "suppliers" else None
+        with self._db_lock, self._db:
+            self._db.execute(f"DELETE FROM {name}")
+            for batch in batches:
+                rows = []
+                for record in batch:
+                    rows.append((count, *(getattr(record, key) for key in keys), record.model_dump_json(exclude_none=True)))
+                    if product_index is not None:
+                        product_index.add_supplier(count, record)
+                    count += 1
+                self._db.executemany(sql, rows)
+        self._changed(name)
+        if name == "suppliers":
+            self.invalidate_catalog()
+            self._product_index = product_index
+        elif name == "customers":
+            self._index_customer_lookups()
+        elif name == "inventory":
+            self._index_warehouses_from_db()
+        return count
+
+    def _import_json(self, name: str, file_name: str, progress: ProgressCallback = None):
+        try:
+            with patch_lock(file_name):
+                patched, _ = read_patch(file_name)
+                count = self._replace_collection(name, stream_models_from_json(file_name, name, TABLES[name], progress=progress, patched=patched))
+            print(f"Loaded {name}:", count)
+        except IOError as e:
+            raise ValueError(f"Error loading file: {e}")
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Error decoding JSON: {e}")
+
+    def import_json(self, data_path: str, progress=None):
+        """
+        Bulk-imports the orders, suppliers, customers and inventory JSON files into the database.
+        :param data_path (str): The directory holding the JSON files.
+        :param progress (Callable[[str], ProgressCallback]): Optional factory returning a progress
+            callback for a collection name.
+        """
+        for name in TABLES:
+            self._import_json(name, os.path.join(data_path, f"{name}.json"), progress and progress(name))
+
+    def fill_data(self):
+        self._replace_collection("suppliers", [self.generate_supplier_data()])
+        self._replace_collection("customers", [self.generate_customer_data()])
+        self._replace_collection("orders", [self.generate_order_data()])
+        self._replace_collection("inventory", [self.generate_inventory_data()])
+
+    def load_supplier_from_json(self, file_name: str, progress: ProgressCallback = None):
+        self._import_json("suppliers", file_name, progress)
+
+    def load_customer_from_json(self, file_name: str, progress: ProgressCallback = None):
+        self._import_json("customers", file_name, progress)
+
+    def load_order_from_json(self, file_name: str, progress: ProgressCallback = None):
+        self._import_json("orders", file_name, progress)
+
+    def load_inventory_from_json(self, file_name: str, progress: ProgressCallback = None):
+        self._import_json("inventory", file_name, progress)
+
+    def _export_json(self, name: str, file_name: str) -> int:
+        # Rows keep no dirty positions, so a delta save exports the whole collection as well.
+        try:
+            # A separate read connection streams rows without holding the lock; WAL mode keeps it consistent.
+            reader = sqlite3.connect(self._db_path)
+            try:
+                count = 0
+                with patch_lock(file_name), open(file_name, 'w') as f:
+                    f.write(f'{{"{name}": [')
+                    for body, in reader.execute(f"SELECT body FROM {name} ORDER BY pos"):
+                        f.write(",\n" if count else "\n")
+                        f.write(body)
+                        count += 1
+                    f.write("\n]}\n")
+                    remove_patch(file_name)
+                return count
+            finally:
+                reader.close()
+        except (IOError, sqlite3.Error) as e:
+            raise ValueError(f"Error saving to file: {e}")
+
+    def save_supplier_to_json(self, file_name: str, delta: bool = False) -> int:
+        return self._export_json("suppliers", file_name)
+
+    def save_customer_to_json(self, file_name: str, delta: bool = False) -> int:
+        return self._export_json("customers", file_name)
+
+    def save_order_to_json(self, file_name: str, delta: bool = False) -> int:
+        return self._export_json("orders", file_name)
+
+    def _query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _first(self, name: str, key: str, value: str) -> BaseModel:
+        rows = self._query(f"SELECT body FROM {name} WHERE {key} = ? ORDER BY pos LIMIT 1", (value,))
+        return TABLES[name].model_validate_json(rows[0][0]) if rows else None
+
+    def _all(self, name: str, key: str, value: str) -> list[BaseModel]:
+        rows = self._query(f"SELECT body FROM {name} WHERE {key} = ? ORDER BY pos", (value,))
+        return [TABLES[name].model_validate_json(body) for (body,) in rows]
+
+    def get_supplier_by_id(self, supplier_id: str) -> Supplier:
+        return self._first("suppliers", "supplier_id", supplier_id)
+
+    def get_customer_by_id(self, customer_id: str) -> Customer:
+        return self._first("customers", "customer_id", customer_id)
+
+    def get_customer_by_name(self, customer_name: str) -> Customer:
+        return self._first("customers", "customer_name", customer_name)
+
+    def get_order_by_id(self, order_id: str) -> Order:
+        return self._first("orders", "order_id", order_id)
+
+    def get_orders_by_ids(self, order_ids: list[str]) -> list[Order]:
+        # Holding the connection lock keeps writers out, so the orders come from the same state of the table.
+        with self._db_lock:
+            rows = [self._db.execute("SELECT body FROM orders WHERE order_id = ? ORDER BY pos LIMIT 1", (order_id,)).fetchone()
+                    for order_id in order_ids]
+        return [Order.model_validate_json(row[0]) if row else None for row in rows]
+
+    def get_orders_by_customer_id(self, customer_id: str) -> list[Order]:
+        return self._all("orders", "customer_id", customer_id)
+
+    def get_inventory_by_product_id(self, product_id: str) -> list[ProductInventory]:
+        return self._all("inventory", "product_id", product_id)
+
+    def get_inventory_rows_by_product_id(self, product_id: str) -> list[tuple[int, ProductInventory]]:
+        rows = self._query("SELECT pos, body FROM inventory WHERE product_id = ? ORDER BY pos", (product_id,))
+        return [(pos, ProductInventory.model_validate_json(body)) for pos, body in rows]
+
+    def set_inventory_volume(self, position: int, volume: int) -> bool:
+        with self._db_lock, self._db:
+            updated = self._db.execute("UPDATE inventory SET body = json_set(body, '$.volume', ?) WHERE pos = ?",
+                                       (volume, position)).rowcount
+        if not updated:
+            return False
+        self._changed("inventory")
+        return True
+
+    def find_orders(self, status: str = None, date_from: str = None, date_to: str = None, date_field: str = "order_date",
+                    cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, fields: list[str] = None) -> Page:
+        if date_field not in ORDER_DATE_FIELDS:
+            raise ValueError(f"Unknown date field: {date_field}")
+        start = decode_cursor("orders", cursor)
+        limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+        include = _projection(Order, fields)
+        conditions, params = [], []
+        if status is not None:
+            conditions.append(f"{_json_field('order_status')} = ?")
+            params.append(status)
+        if date_from is not None:
+            conditions.append(f"{_json_field(date_field)} >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            conditions.append(f"{_json_field(date_field)} <= ?")
+            params.append(date_to)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        order_by = f"{_json_field(date_field)}, pos" if date_from is not None or date_to is not None else "pos"
+        with self._db_lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM orders{where}", params).fetchone()[0]
+            rows = self._db.execute(f"SELECT body FROM orders{where} ORDER BY {order_by} LIMIT ? OFFSET ?",
+                                    (*params, limit, start)).fetchall()
+        items = [Order.model_validate_json(body).model_dump(include=include) for (body,) in rows]
+        end = start + len(items)
+        return Page(items=items, next_cursor=encode_cursor("orders", end) if end < total else None, total=total)
+
+    def get_order_status_counts(self) -> dict[str, int]:
+        status = _json_field("order_status")
+        return dict(self._query(f"SELECT {status}, COUNT(*) FROM orders GROUP BY {status}"))
+
+    def iter_collection(self, name: str):
+        # Streams through a separate read connection like _export_json, so large tables are not
+        # fetched into memory at once.
+        reader = sqlite3.connect(self._db_path)
+        try:
+            for (body,) in reader.execute(f"SELECT body FROM {name} ORDER BY pos"):
+                yield TABLES[name].model_validate_json(body)
+        finally:
+            reader.close()
+
+
+    def update_supplier(self, supplier_id: str, supplier_data: Supplier) -> bool:
+        with self._db_lock, self._db:
+            row = self._db.execute("SELECT pos FROM suppliers WHERE supplier_id = ? ORDER BY pos LIMIT 1", (supplier_id,)).fetchone()
+            if row is None:
+                return False
+            self._db.execute("UPDATE suppliers SET supplier_id = ?, body = ? WHERE pos = ?",
+                             (supplier_data.supplier_id, supplier_data.model_dump_json(exclude_none=True), row[0]))
+        self._changed("suppliers")
+        self.invalidate_catalog()
+        self._reindex_supplier_products(row[0], supplier_data)
+        return True
+
+    def update_order(self, order_id: str, order_data: Order) -> bool:
+        with self._db_lock, self._db:
+            row = self._db.execute("SELECT pos FROM orders WHERE order_id = ? ORDER BY pos LIMIT 1", (order_id,)).fetchone()
+            if row is None:
+                return False
+            self._db.execute("UPDATE orders SET order_id = ?, customer_id = ?, body = ? WHERE pos = ?",
+                             (order_data.order_id, order_data.customer_id, order_data.model_dump_json(exclude_none=True), row[0]))
+        self._changed("orders")
+        self._publish_order_change(order_id, order_data)
+        return True
+
+    def validate_order_updates(self, updates: list[OrderUpdate]) -> list[OrderUpdateResult]:
+        with self._db_lock:
+            return self._validate_order_updates(updates)
+
+    def _validate_order_updates(self, updates: list[OrderUpdate]) -> list[OrderUpdateResult]:
+        results = []
+        seen = set()
+        for update in updates:
+            if update.order_id in seen:
+                results.append(OrderUpdateResult(order_id=update.order_id, success=False, error="Duplicate order in batch"))
+            elif self._db.execute("SELECT 1 FROM orders WHERE order_id = ? LIMIT 1", (update.order_id,)).fetchone() is None:
+                results.append(OrderUpdateResult(order_id=update.order_id, success=False, error="Order not found"))
+            else:
+                results.append(OrderUpdateResult(order_id=update.order_id, success=True))
+            seen.add(update.order_id)
+        return results
+
+    def update_orders(self, updates: list[OrderUpdate]) -> list[OrderUpdateResult]:
+        with self._db_lock, self._db:
+            results = self._validate_order_updates(updates)
+            if not all(result.success for result in results):
+                for result in results:
+                    if result.success:
+                        result.success = False
+                        result.error = "Not applied: batch rejected"
+                return results
+            # Resolve every target before writing so re-keyed orders cannot shadow later updates.
+            positions = [self._db.execute("SELECT pos FROM orders WHERE order_id = ? ORDER BY pos LIMIT 1",
+                                          (update.order_id,)).fetchone()[0] for update in updates]
+            self._db.executemany("UPDATE orders SET order_id = ?, customer_id = ?, body = ? WHERE pos = ?",
+                                 [(update.order.order_id, update.order.customer_id,
+                                   update.order.model_dump_json(exclude_none=True), pos)
+                                  for update, pos in zip(updates, positions)])
+        self._changed("orders")
+        for update in updates:
+            self._publish_order_change(update.order_id, update.order)
+        return results
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+        with self._db_lock:
+            self._db.close()
+
+def open_sqlite_data_layer(data_path: str, db_path: str = None, progress=None) -> SqliteDataLayer:
+    """
+    Opens the SQLite-backed DataLayer, bulk-importing the JSON files when the database is new.
+    :param data_path (str): The directory holding the JSON files.
+    :param db_path (str): Optional database path, defaults to SQLITE_FILE_NAME in data_path.
+    :param progress (Callable[[str], ProgressCallback]): Optional factory returning a progress
+        callback for a collection name.
+    :return: The SQLite-backed data layer.
+    :rtype: SqliteDataLayer
+    """
+    db_path = db_path or os.path.join(data_path, SQLITE_FILE_NAME)
+    is_new = not os.path.exists(db_path)
+    data_layer = SqliteDataLayer(db_path)
+    if is_new:
+        data_layer.import_json(data_path, progress)
+    return data_layer
@@ -0,0 +1,28 @@
+import hashlib
+import json
+import os
+
+from generate_data import generate_dataset
+
+# SHA-256 of the files generated for seed 42 with the sizes below. A change to the generator that
+# alters them breaks the reproducible datasets of existing seeds.
+EXPECTED_DIGESTS = {
+    "suppliers.json": "36d31e467785efd313bcee4ef26634624c0802a38810ba7023f3f82f1c49f92f",
+    "customers.json": "cbc16c849be64d03d517c15ce0e7b20b17e5417f6e1f5f03ef020d9b8ea2cf9d",
+    "orders.json": "fe2ddcab568f688c1f199823a846444e500cb931dc84af42e9fa2056b2779b40",
+    "inventory.json": "4b8c61d51a762a6e7ea519173ea31ff63b130ae4bd9621d06bd84c0f9ff14229",
+}
+
+def test_output_is_pinned_for_a_seed(tmp_path):
+    generate_dataset(str(tmp_path), customers=200, orders=300, suppliers=4, products_per_supplier=10, seed=42)
+    digests = {}
+    for file_name in EXPECTED_DIGESTS:
+        with open(os.path.join(tmp_path, file_name), 'rb') as f:
+            digests[file_name] = hashlib.sha256(f.read()).hexdigest()
+    assert digests == EXPECTED_DIGESTS
+
+    with open(os.path.join(tmp_path, "customers.json"), encoding='utf-8') as f:
+        customer = json.load(f)["customers"][0]
+    assert customer["customer_address"] == "91 Maple Street, Salem, CO 81314"
+    assert [discount["discount_id"] for discount in customer["customer_discount"]] == \
+        ["DISCOUNT10", "DISCOUNT7", "DISCOUNT9", "DISCOUNT0"]
@@ -0,0 +1,37 @@
+import os
+import shutil
+
+from analytics import OrderAnalytics
+from hot_reload import DataReloader
+from order_log import OrderLog
+from snapshot import load_data_layer
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+def test_orders_rekeyed_during_a_reload_are_copied(tmp_path):
+    # A copy, since loading writes a snapshot next to the JSON files.
+    shutil.copytree(DATA_PATH, tmp_path, dirs_exist_ok=True)
+    data_layer = load_data_layer(str(tmp_path))
+    order_log = OrderLog(data_layer, str(tmp_path))
+    swapped = []
+    reloader = DataReloader(str(tmp_path), data_layer, order_log, OrderAnalytics(data_layer), swapped.append)
+
+    replay_into = order_log.replay_into
+    def replay_then_update(new):
+        # Updates made after the log replay reach the new DataLayer only through the swap.
+        result = replay_into(new)
+        order = data_layer.get_order_by_id("ORD-122")
+        data_layer.update_order("ORD-122", order.model_copy(update={"order_id": "REKEYED"}))
+        order = data_layer.get_order_by_id("ORD-124")
+        data_layer.update_order("ORD-124", order.model_copy(update={"order_id": "REKEYED-1"}))
+        data_layer.update_order("REKEYED-1", order.model_copy(update={"order_id": "REKEYED-2", "order_status": "Shipped"}))
+        return result
+    order_log.replay_into = replay_then_update
+
+    new = reloader.reload()
+    assert swapped == [new]
+    assert new.get_order_by_id("ORD-122") is None
+    assert new.get_order_by_id("REKEYED") == data_layer.get_order_by_id("REKEYED")
+    assert new.get_order_by_id("ORD-124") is None
+    assert new.get_order_by_id("REKEYED-1") is None
+    assert new.get_order_by_id("REKEYED-2").order_status == "Shipped"
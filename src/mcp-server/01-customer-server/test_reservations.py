@@ -0,0 +1,63 @@
+import os
+import shutil
+
+import pytest
+
+from analytics import OrderAnalytics
+from data_functions import ReservationLine
+from reservations import InventoryReservations
+from snapshot import load_data_layer
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+@pytest.fixture
+def data_layer(tmp_path):
+    # A copy, since loading writes a snapshot next to the JSON files.
+    shutil.copytree(DATA_PATH, tmp_path, dirs_exist_ok=True)
+    return load_data_layer(str(tmp_path))
+
+def _stock(data_layer, product_id):
+    return sum(item.volume for item in data_layer.get_inventory_by_product_id(product_id))
+
+@pytest.mark.parametrize("fill_strategy,locations", [
+    ("Split", ["USEast"]),
+    ("Standard", ["USEast"]),
+    ("Express", ["EuropeWest"]),
+    ("Backorder", ["EuropeWest"]),
+])
+@pytest.mark.parametrize("product_id,quantity", [("PROD2", 9), ("PROD4", 8)])
+def test_reserve_and_release_conserve_stock(data_layer, fill_strategy, locations, product_id, quantity):
+    # PROD2 has three USEast rows and PROD4 four EuropeWest rows in the sample inventory.
+    reservations = InventoryReservations(data_layer)
+    total = _stock(data_layer, product_id)
+    reservation = reservations.reserve("ORDER1", [ReservationLine(product_id=product_id, quantity=quantity)],
+                                       fill_strategy, locations)
+    reserved = sum(allocation.quantity for allocation in reservation.allocations)
+    assert _stock(data_layer, product_id) + reserved == total
+    assert all(item.volume >= 0 for item in data_layer.get_inventory_by_product_id(product_id))
+
+    if reservation.success:
+        assert reservations.release("ORDER1")
+    assert _stock(data_layer, product_id) == total
+
+def test_reservations_survive_a_reload(data_layer, tmp_path):
+    reservations = InventoryReservations(data_layer)
+    total = _stock(data_layer, "PROD2")
+    reservations.reserve("ORDER1", [ReservationLine(product_id="PROD2", quantity=7)], "Split", ["USEast"])
+
+    reloaded = load_data_layer(str(tmp_path))
+    reservations.swap_data_layer(reloaded)
+    assert _stock(reloaded, "PROD2") == total - 7
+
+    assert reservations.release("ORDER1")
+    assert _stock(reloaded, "PROD2") == total
+
+def test_stock_aggregates_follow_reservations(data_layer):
+    analytics = OrderAnalytics(data_layer)
+    analytics.warm()
+    reservations = InventoryReservations(data_layer, on_change=analytics.update_inventory_volumes)
+    reservations.reserve("ORDER1", [ReservationLine(product_id="PROD2", quantity=9)], "Split", ["USEast"])
+    assert analytics.stock_by_location() == OrderAnalytics(data_layer).stock_by_location()
+
+    assert reservations.release("ORDER1")
+    assert analytics.stock_by_location() == OrderAnalytics(data_layer).stock_by_location()